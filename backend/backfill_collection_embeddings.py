@@ -10,7 +10,7 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.db import SessionLocal, engine
+from app.db import SessionLocal, engine, vector_param
 from app.models import Collection
 from app.embeddings import embed_text
 from sqlalchemy import text
@@ -33,8 +33,11 @@ def backfill_embeddings():
                 # Generate embedding
                 embedding = embed_text(collection.query)
                 
-                # Update collection
-                collection.query_embedding = embedding
+                # Update collection (binary vector parameter, see app.db.vector_param)
+                db.execute(
+                    text("UPDATE collections SET query_embedding = :embedding WHERE id = :id"),
+                    {"embedding": vector_param(embedding), "id": collection.id},
+                )
                 db.commit()
                 
                 updated_count += 1
@@ -9,7 +9,9 @@ from pathlib import Path
 # Add parent directory to path so we can import app modules
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.db import SessionLocal
+from sqlalchemy import text
+
+from app.db import SessionLocal, vector_param
 from app.models import Video, Transcript
 from app.embeddings import embed_text, combine_text_for_embedding
 
@@ -52,8 +54,11 @@ def migrate_embeddings():
                 combined_text = combine_text_for_embedding(transcript_text, desc_str)
                 embedding = embed_text(combined_text)
                 
-                # Update transcript
-                setattr(transcript, 'embedding', embedding)
+                # Update transcript (binary vector parameter, see app.db.vector_param)
+                db.execute(
+                    text("UPDATE transcripts SET embedding = :embedding WHERE video_id = :video_id"),
+                    {"embedding": vector_param(embedding), "video_id": transcript.video_id},
+                )
                 
                 # Get video title for display
                 title_val = getattr(video, 'title', None)
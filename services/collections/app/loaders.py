@@ -0,0 +1,65 @@
+"""
+Request-scoped batch loaders (sync counterpart of the search service's
+app/loaders.py).
+
+Handlers prime() every id they will need, then load_many()/get() resolve
+all pending ids with a single `WHERE key = ANY(:ids)` query per entity type.
+"""
+from __future__ import annotations
+
+from typing import Dict, Generic, Hashable, Iterable, Optional, Type, TypeVar
+
+from sqlalchemy import String, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from .models import Collection, Video
+
+T = TypeVar("T")
+
+
+class BatchLoader(Generic[T]):
+    """Batch loader for one ORM model keyed by a string column."""
+
+    def __init__(self, db: Session, model: Type[T], key_column):
+        self.db = db
+        self.model = model
+        self.key_column = key_column
+        self._loaded: Dict[Hashable, Optional[T]] = {}
+        self._pending: set = set()
+
+    def prime(self, ids: Iterable[Hashable]):
+        """Register ids to be fetched with the next load."""
+        self._pending.update(i for i in ids if i is not None and i not in self._loaded)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        ids = list(self._pending)
+        self._pending.clear()
+        stmt = select(self.model).where(
+            self.key_column == any_(bindparam("ids", ids, type_=ARRAY(String)))
+        )
+        rows = self.db.execute(stmt).scalars().all()
+        for i in ids:
+            self._loaded[i] = None
+        for row in rows:
+            self._loaded[getattr(row, self.key_column.key)] = row
+
+    def load_many(self, ids: Iterable[Hashable]) -> Dict[Hashable, Optional[T]]:
+        """{id: object or None} for ids, fetching everything pending in one query."""
+        ids = list(ids)
+        self.prime(ids)
+        self._flush()
+        return {i: self._loaded.get(i) for i in ids}
+
+    def get(self, id_: Hashable) -> Optional[T]:
+        return self.load_many([id_])[id_]
+
+
+class RequestLoaders:
+    """Loaders for the entities collection handlers resolve by id."""
+
+    def __init__(self, db: Session):
+        self.videos: BatchLoader[Video] = BatchLoader(db, Video, Video.id)
+        self.collections: BatchLoader[Collection] = BatchLoader(db, Collection, Collection.id)
@@ -6,6 +6,7 @@ from typing import List, Optional
 
 from .db import get_db
 from .models import Collection, Video
+from .loaders import RequestLoaders
 
 router = APIRouter(prefix="/collections", tags=["collections"])
 
@@ -96,10 +97,8 @@ def get_collection(collection_id: str, db: Session = Depends(get_db)):
     
     # Fetch all videos for this collection
     video_ids = collection.video_ids or []
-    videos = db.query(Video).filter(Video.id.in_(video_ids)).all() if video_ids else []
-    
-    # Create a mapping of video_id to video object
-    video_map = {v.id: v for v in videos}
+    loaders = RequestLoaders(db)
+    video_map = {vid: v for vid, v in loaders.videos.load_many(video_ids).items() if v is not None}
     
     # Get source data from metadata if available
     sources_data = collection.metadata_json.get('sources', []) if collection.metadata_json else []
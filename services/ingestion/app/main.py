@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routes_ingest import router as ingest_router
+from .llm_gateway import get_llm_stats
 
 app = FastAPI(title="VidSense Ingestion Service", version="1.0.0")
 
@@ -19,3 +20,8 @@ app.include_router(ingest_router)
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "ingestion"}
+
+@app.get("/metrics")
+def metrics():
+    """LLM gateway call, token and latency counters."""
+    return {"service": "ingestion", "llm": get_llm_stats()}
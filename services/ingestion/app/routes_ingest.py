@@ -296,25 +296,35 @@ def generate_transcript(
         clip_label = f"[Clip {clip or 1}]"
         header = f"\n\n--- {clip_label} ---\n"
 
+    # Parsed "Integrated Summary" section (used by RAG context assembly)
+    summary = (result.get("summary") or "").strip()
+
     t = db.get(Transcript, video_id)
     new_text = ""
     if t:
         old_text = getattr(t, 'text', None) or ""
         new_text = old_text + header + text
         setattr(t, 'text', new_text)
+        if summary:
+            old_summary = getattr(t, 'summary', None) or ""
+            setattr(t, 'summary', (old_summary + header + summary).lstrip())
     else:
         new_text = (header + text).lstrip()
         t = Transcript(video_id=video_id)
         setattr(t, 'text', new_text)
+        setattr(t, 'summary', (header + summary).lstrip() if summary else None)
         db.add(t)
+    print(f"[transcribe] summary {'stored' if summary else 'missing'} ({len(summary)} chars)")
     
     db.commit()
     
     # Trigger async embedding generation via Celery worker
     try:
-        from .celery_client import celery_app
-        celery_app.send_task('generate_embeddings', args=[video_id])
-        print(f"[transcribe] triggered embedding generation task for video {video_id}")
+        from .celery_client import enqueue_embeddings
+        if enqueue_embeddings(video_id):
+            print(f"[transcribe] triggered embedding generation task for video {video_id}")
+        else:
+            print(f"[transcribe] embedding task already pending for video {video_id}")
     except Exception as e:
         print(f"[transcribe] warning: failed to trigger embedding task: {e}")
 
@@ -383,9 +393,11 @@ def put_transcript(video_id: str, payload: TranscriptUpdate, db: Session = Depen
         
         # Trigger async embedding generation via Celery worker
         try:
-            from .celery_client import celery_app
-            celery_app.send_task('generate_embeddings', args=[video_id])
-            _log(f"[put_transcript] triggered embedding generation task for video {video_id}")
+            from .celery_client import enqueue_embeddings
+            if enqueue_embeddings(video_id):
+                _log(f"[put_transcript] triggered embedding generation task for video {video_id}")
+            else:
+                _log(f"[put_transcript] embedding task already pending for video {video_id}")
         except Exception as e:
             _log(f"[put_transcript] warning: failed to trigger embedding task: {e}")
         
@@ -0,0 +1,136 @@
+"""
+Semantic answer cache for RAG, backed by saved collections.
+
+A collection stores the query embedding, the AI answer and its cited
+videos (video_ids, in citation order, plus metadata_json["sources"]). When
+a new RAG query is within RAG_ANSWER_CACHE_MIN_SIMILARITY (cosine) of a
+saved query, the stored answer and sources are returned without calling
+the LLM, unless
+- one of the cited transcripts changed after the collection was saved,
+- a cited video was marked 'bad' for the collection's query since
+  (query_feedback_profile) or is disliked in one of the request's similar
+  collections, or
+- the collection cites fewer videos than the request's k_final.
+
+Opt-in: RAG_ANSWER_CACHE=1 enables it by default, RAGRequest.use_answer_cache
+overrides per request.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import vector_param
+from .knn import thresholded_knn
+
+RAG_ANSWER_CACHE_ENABLED = os.getenv("RAG_ANSWER_CACHE", "0").lower() in ("1", "true", "yes")
+RAG_ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv("RAG_ANSWER_CACHE_MIN_SIMILARITY", "0.97"))
+RAG_ANSWER_CACHE_CANDIDATES = int(os.getenv("RAG_ANSWER_CACHE_CANDIDATES", "3"))
+
+# Cited transcripts that still exist and haven't been edited/re-embedded
+# since the collection was saved
+_UNCHANGED_TRANSCRIPTS_SQL = sql_text("""
+    SELECT COUNT(*)
+    FROM transcripts t
+    WHERE t.video_id = ANY(:video_ids)
+      AND (t.updated_at IS NULL OR t.updated_at <= :saved_at)
+""")
+
+# Videos whose latest feedback for the saved queries is 'bad'
+_BAD_FEEDBACK_SQL = sql_text("""
+    SELECT query, bad_video_ids
+    FROM query_feedback_profile
+    WHERE query = ANY(:queries)
+""")
+
+_stats = {"hits": 0, "misses": 0, "stale": 0}
+
+
+async def _sources_unchanged(db: AsyncSession, video_ids: List[str], saved_at) -> bool:
+    video_ids = list(dict.fromkeys(video_ids))
+    if not video_ids or saved_at is None:
+        return False
+    unchanged = (await db.execute(
+        _UNCHANGED_TRANSCRIPTS_SQL, {"video_ids": video_ids, "saved_at": saved_at}
+    )).scalar()
+    return unchanged == len(video_ids)
+
+
+async def _bad_feedback(db: AsyncSession, queries: List[str]) -> Dict[str, Set[str]]:
+    rows = (await db.execute(_BAD_FEEDBACK_SQL, {"queries": list(dict.fromkeys(queries))})).all()
+    return {query: set(bad_video_ids or []) for query, bad_video_ids in rows}
+
+
+async def find_cached_answer(
+    db: AsyncSession,
+    query_embedding: List[float],
+    min_sources: int = 1,
+    disliked_video_ids: Iterable[str] = (),
+) -> Optional[Dict[str, Any]]:
+    """
+    Most similar saved collection whose answer can be reused.
+
+    Args:
+        db: Async session
+        query_embedding: Embedding of the new RAG query
+        min_sources: Fewest cited videos acceptable (the request's k_final)
+        disliked_video_ids: Videos the request must not cite (dislikes in
+                            its similar collections)
+
+    Returns:
+        {"collection_id", "query", "similarity", "answer", "video_ids",
+        "sources" (metadata_json["sources"], may be empty), "created_at"}
+        or None
+    """
+    rows = await thresholded_knn(
+        db,
+        table="collections",
+        embedding_column="query_embedding",
+        columns=["id", "query", "ai_answer", "video_ids", "metadata_json", "created_at"],
+        query_vec=vector_param(query_embedding),
+        min_similarity=RAG_ANSWER_CACHE_MIN_SIMILARITY,
+        limit=RAG_ANSWER_CACHE_CANDIDATES,
+        where="ai_answer IS NOT NULL AND jsonb_array_length(video_ids) > 0",
+    )
+    if not rows:
+        _stats["misses"] += 1
+        return None
+
+    disliked = set(disliked_video_ids)
+    bad_by_query = await _bad_feedback(db, [row["query"] for row in rows])
+    for row in rows:
+        video_ids = list(row["video_ids"] or [])  # citation order
+        if len(video_ids) < min_sources:
+            print(f"[answer-cache] Skipping collection {row['id'][:8]}: {len(video_ids)} sources < k_final={min_sources}")
+            continue
+        rejected = (bad_by_query.get(row["query"], set()) | disliked).intersection(video_ids)
+        if rejected:
+            print(f"[answer-cache] Skipping collection {row['id'][:8]}: {len(rejected)} cited videos have bad feedback")
+            continue
+        if await _sources_unchanged(db, video_ids, row["created_at"]):
+            _stats["hits"] += 1
+            print(f"[answer-cache] Hit: collection {row['id'][:8]} '{row['query']}' (similarity={row['similarity']:.4f})")
+            return {
+                "collection_id": row["id"],
+                "query": row["query"],
+                "similarity": row["similarity"],
+                "answer": row["ai_answer"],
+                "video_ids": video_ids,
+                "sources": (row["metadata_json"] or {}).get("sources", []),
+                "created_at": row["created_at"],
+            }
+        print(f"[answer-cache] Skipping collection {row['id'][:8]}: cited transcripts changed since it was saved")
+
+    _stats["stale"] += 1  # candidates found, none reusable
+    return None
+
+
+def get_answer_cache_stats() -> Dict[str, Any]:
+    return {
+        "enabled": RAG_ANSWER_CACHE_ENABLED,
+        "min_similarity": RAG_ANSWER_CACHE_MIN_SIMILARITY,
+        **_stats,
+    }
@@ -0,0 +1,311 @@
+"""
+Caches used by the search service.
+
+- TTLCache:    in-process LRU with per-entry TTL
+- RedisCache:  optional shared tier (JSON values, namespaced keys)
+- TieredCache: in-process tier in front of an optional Redis tier
+
+RedisCache uses the blocking redis client; async routes go through the
+TieredCache a* methods, which run the Redis tier in a worker thread.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry time-to-live.
+
+    Entries are evicted when they are older than ttl_sec or when the cache
+    grows past max_size (least recently used first). Hit/miss counters are
+    kept for the /metrics endpoint.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_sec: float = 600.0, name: str = "cache"):
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.ttl_sec = ttl_sec
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None):
+        ttl = self.ttl_sec if ttl_sec is None else ttl_sec
+        expires_at = time.monotonic() + ttl if ttl and ttl > 0 else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Return {key: value} for the keys that are present."""
+        found = {}
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def set_many(self, mapping: Dict[Hashable, Any], ttl_sec: Optional[float] = None):
+        for key, value in mapping.items():
+            self.set(key, value, ttl_sec)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> int:
+        with self._lock:
+            n = len(self._data)
+            self._data.clear()
+            return n
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_sec": self.ttl_sec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def get_redis_client():
+    """Shared Redis client, or None when REDIS_URL isn't configured."""
+    global _redis_client
+    if not REDIS_URL:
+        return None
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                import redis
+                _redis_client = redis.Redis.from_url(
+                    REDIS_URL, socket_timeout=0.25, socket_connect_timeout=0.25
+                )
+    return _redis_client
+
+
+class RedisCache:
+    """
+    Shared cache tier backed by Redis.
+
+    Values must be JSON-serializable. Any Redis error is counted and treated
+    as a miss so the cache can never fail a request.
+    """
+
+    def __init__(self, client, prefix: str, ttl_sec: float = 600.0, name: str = "redis"):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_sec = ttl_sec
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _k(self, key: Hashable) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            raw = self.client.mget([self._k(k) for k in keys])
+        except Exception:
+            self.errors += 1
+            self.misses += len(keys)
+            return {}
+        found = {}
+        for key, value in zip(keys, raw):
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                found[key] = json.loads(value)
+        return found
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, mapping: Dict[Hashable, Any], ttl_sec: Optional[float] = None):
+        if not mapping:
+            return
+        ttl = int(self.ttl_sec if ttl_sec is None else ttl_sec) or None
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(self._k(key), json.dumps(value), ex=ttl)
+            pipe.execute()
+        except Exception:
+            self.errors += 1
+
+    def set(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None):
+        self.set_many({key: value}, ttl_sec)
+
+    def delete(self, key: Hashable):
+        try:
+            self.client.delete(self._k(key))
+        except Exception:
+            self.errors += 1
+
+    def clear(self) -> int:
+        n = 0
+        try:
+            for key in self.client.scan_iter(match=f"{self.prefix}:*", count=500):
+                n += self.client.delete(key)
+        except Exception:
+            self.errors += 1
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "prefix": self.prefix,
+            "ttl_sec": self.ttl_sec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+class TieredCache:
+    """In-process TTLCache in front of an optional RedisCache."""
+
+    def __init__(self, memory: TTLCache, remote: Optional[RedisCache] = None):
+        self.memory = memory
+        self.remote = remote
+
+    @classmethod
+    def create(
+        cls,
+        name: str,
+        max_size: int,
+        ttl_sec: float,
+        use_redis: bool = False,
+        remote_ttl_sec: Optional[float] = None,
+    ) -> "TieredCache":
+        remote = None
+        client = get_redis_client() if use_redis else None
+        if client is not None:
+            remote = RedisCache(
+                client,
+                prefix=f"vidsense:{name}",
+                ttl_sec=remote_ttl_sec if remote_ttl_sec is not None else ttl_sec,
+                name=name,
+            )
+        return cls(TTLCache(max_size=max_size, ttl_sec=ttl_sec, name=name), remote)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        keys = list(keys)
+        found = self.memory.get_many(keys)
+        if self.remote is not None:
+            missing = [k for k in keys if k not in found]
+            if missing:
+                remote_found = self.remote.get_many(missing)
+                self.memory.set_many(remote_found)
+                found.update(remote_found)
+        return found
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, mapping: Dict[Hashable, Any], ttl_sec: Optional[float] = None):
+        self.memory.set_many(mapping, ttl_sec)
+        if self.remote is not None:
+            self.remote.set_many(mapping, ttl_sec)
+
+    def set(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None):
+        self.set_many({key: value}, ttl_sec)
+
+    def delete(self, key: Hashable):
+        self.memory.delete(key)
+        if self.remote is not None:
+            self.remote.delete(key)
+
+    def clear(self) -> int:
+        n = self.memory.clear()
+        if self.remote is not None:
+            n += self.remote.clear()
+        return n
+
+    # Async variants for event-loop callers: the in-process tier is used
+    # inline, the Redis tier runs in a worker thread so a slow or unreachable
+    # Redis never blocks the loop.
+
+    async def aget_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        keys = list(keys)
+        found = self.memory.get_many(keys)
+        if self.remote is not None:
+            missing = [k for k in keys if k not in found]
+            if missing:
+                remote_found = await asyncio.to_thread(self.remote.get_many, missing)
+                self.memory.set_many(remote_found)
+                found.update(remote_found)
+        return found
+
+    async def aget(self, key: Hashable, default: Any = None) -> Any:
+        return (await self.aget_many([key])).get(key, default)
+
+    async def aset_many(self, mapping: Dict[Hashable, Any], ttl_sec: Optional[float] = None):
+        self.memory.set_many(mapping, ttl_sec)
+        if self.remote is not None:
+            await asyncio.to_thread(self.remote.set_many, mapping, ttl_sec)
+
+    async def aset(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None):
+        await self.aset_many({key: value}, ttl_sec)
+
+    async def aclear(self) -> int:
+        n = self.memory.clear()
+        if self.remote is not None:
+            n += await asyncio.to_thread(self.remote.clear)
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "redis": self.remote.stats() if self.remote is not None else None,
+        }
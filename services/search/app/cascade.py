@@ -0,0 +1,132 @@
+"""
+Cascade prefilter between ANN retrieval and the cross-encoder.
+
+Cheap signals decide how many ANN candidates are worth sending to the
+expensive reranker:
+- ANN distance gap detection: when the distance curve has a clear cliff
+  after the first few candidates, everything past the cliff is dropped
+- Vectorized lexical overlap: candidates containing most query terms are
+  always kept, so exact-term matches with mediocre vectors keep their shot
+
+Easy queries (clear cliff) send a handful of candidates to the model; hard
+queries (flat distances) keep everything.
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "1").lower() in ("1", "true", "yes")
+# Never cut below this many candidates (or k, whichever is larger)
+CASCADE_MIN_KEEP = int(os.getenv("CASCADE_MIN_KEEP", "10"))
+# A gap counts as a cliff if it is this many times the median gap ...
+CASCADE_GAP_RATIO = float(os.getenv("CASCADE_GAP_RATIO", "4.0"))
+# ... and at least this large in cosine distance
+CASCADE_MIN_GAP = float(os.getenv("CASCADE_MIN_GAP", "0.03"))
+# Candidates further than this from the best distance are dropped
+CASCADE_MAX_DISTANCE_DELTA = float(os.getenv("CASCADE_MAX_DISTANCE_DELTA", "0.35"))
+# Fraction of query terms a candidate must contain to be kept regardless
+CASCADE_LEXICAL_KEEP = float(os.getenv("CASCADE_LEXICAL_KEEP", "0.5"))
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def _query_terms(query: str) -> List[str]:
+    seen = []
+    for term in _TERM_RE.findall(query.lower()):
+        if len(term) > 2 and term not in seen:
+            seen.append(term)
+    return seen
+
+
+def lexical_overlap(query: str, texts: List[str]) -> np.ndarray:
+    """Fraction of distinct query terms (len > 2) found in each text."""
+    terms = _query_terms(query)
+    if not terms or not texts:
+        return np.zeros(len(texts))
+    # Plain substring checks per text: a fixed-width numpy string array would
+    # pad every text to the longest transcript
+    return np.array([
+        sum(term in lowered for term in terms) / len(terms)
+        for lowered in (t.lower() for t in texts)
+    ])
+
+
+def _gap_cut(distances: np.ndarray, min_keep: int) -> int:
+    """Number of leading candidates to keep based on the distance curve."""
+    n = len(distances)
+    if n <= min_keep:
+        return n
+
+    # Relative distance ceiling
+    within = int(np.searchsorted(distances, distances[0] + CASCADE_MAX_DISTANCE_DELTA, side="right"))
+    cut = max(min_keep, within)
+
+    # Largest cliff after the protected head
+    gaps = np.diff(distances)
+    tail = gaps[min_keep - 1:]
+    if len(tail):
+        idx = int(np.argmax(tail))
+        median_gap = float(np.median(gaps)) if len(gaps) else 0.0
+        biggest = float(tail[idx])
+        if biggest >= CASCADE_MIN_GAP and biggest >= CASCADE_GAP_RATIO * max(median_gap, 1e-6):
+            cut = min(cut, min_keep + idx)
+
+    return max(min_keep, min(cut, n))
+
+
+def cascade_prefilter(
+    query: str,
+    docs: List[Dict[str, Any]],
+    k: int,
+    text_key: str = "text",
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Select which ANN candidates go on to the cross-encoder.
+
+    Args:
+        query: User query
+        docs: Candidates (ANN or RRF order), each with "ann_distance"
+        k: Number of final results requested (never keep fewer)
+
+    Returns:
+        (kept docs in input order, stats dict)
+    """
+    started = time.perf_counter()
+    n = len(docs)
+    min_keep = max(k, CASCADE_MIN_KEEP)
+
+    if n <= min_keep:
+        return docs, {"input": n, "kept": n, "gap_cut": n, "lexical_rescued": 0,
+                      "ms": (time.perf_counter() - started) * 1000.0}
+
+    distances = np.array([d.get("ann_distance", 0.0) for d in docs], dtype=float)
+    overlap = lexical_overlap(query, [d.get(text_key, "") for d in docs])
+
+    # Hybrid (RRF-fused) candidates aren't in distance order: find the cut on
+    # the sorted curve and keep everything at or below that distance
+    order = np.argsort(distances, kind="stable")
+    cut = _gap_cut(distances[order], min_keep)
+    keep = np.zeros(n, dtype=bool)
+    keep[order[:cut]] = True
+    # The head of the full-text leg always goes on to the reranker
+    lexical_head = np.array([d.get("lexical_rank", n + 1) <= min_keep for d in docs])
+    rescued = (~keep) & ((overlap >= CASCADE_LEXICAL_KEEP) | lexical_head)
+    keep |= rescued
+
+    for doc, score in zip(docs, overlap):
+        doc["lexical_overlap"] = float(score)
+
+    kept = [doc for doc, flag in zip(docs, keep) if flag]
+    stats = {
+        "input": n,
+        "kept": len(kept),
+        "gap_cut": cut,
+        "lexical_rescued": int(rescued.sum()),
+        "ms": (time.perf_counter() - started) * 1000.0,
+    }
+    return kept, stats
@@ -0,0 +1,161 @@
+"""
+Token-budgeted context assembly for RAG prompts.
+
+Each source gets a block
+
+    [Source N] Title
+    Summary: <Transcript.summary>
+    Excerpts:
+    <query-relevant transcript passages, in transcript order>
+
+packed against RAG_CONTEXT_TOKEN_BUDGET. The budget is shared fairly:
+every source may use (remaining budget / remaining sources), so tokens a
+short source doesn't need carry over to the ones after it. Within a
+source the summary goes first, then passages by query-term overlap.
+Tokens are estimated at ~4 characters each (Gemini's tokenizer isn't
+available locally); the estimate only has to keep prompts bounded.
+"""
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cascade import lexical_overlap
+
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))
+RAG_PASSAGE_CHARS = int(os.getenv("RAG_PASSAGE_CHARS", "600"))
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+@dataclass
+class ContextSource:
+    title: Optional[str]
+    summary: Optional[str]
+    transcript: Optional[str]
+    fallback: str = ""  # used when there is neither summary nor transcript (e.g. search snippet)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars - 3)
+    return text[:cut if cut > 0 else max_chars - 3].rstrip() + "..."
+
+
+def split_passages(text: str, max_chars: int = RAG_PASSAGE_CHARS) -> List[Tuple[int, str]]:
+    """Split text into ~max_chars passages on sentence/line boundaries: [(start_char, passage)]."""
+    passages: List[Tuple[int, str]] = []
+    start, current = 0, ""
+    pos = 0
+    for piece in _SENTENCE_END_RE.split(text):
+        piece_start = text.find(piece, pos) if piece else pos
+        pos = piece_start + len(piece)
+        if not piece.strip():
+            continue
+        # Hard-split sentences longer than a passage
+        while len(piece) > max_chars:
+            if current:
+                passages.append((start, current))
+                current = ""
+            passages.append((piece_start, piece[:max_chars]))
+            piece, piece_start = piece[max_chars:], piece_start + max_chars
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append((start, current))
+            current = ""
+        if not current:
+            start, current = piece_start, piece
+        else:
+            current += " " + piece
+    if current:
+        passages.append((start, current))
+    return passages
+
+
+def _select_passages(query: str, transcript: str, max_tokens: int) -> List[str]:
+    """Most query-relevant passages that fit in max_tokens, returned in transcript order."""
+    if max_tokens <= 0:
+        return []
+    # Tight budgets get shorter passages so at least two can compete
+    passages = split_passages(transcript, min(RAG_PASSAGE_CHARS, max(120, max_tokens * CHARS_PER_TOKEN // 2)))
+    if not passages:
+        return []
+    overlap = lexical_overlap(query, [p for _, p in passages])
+    # Best overlap first; ties (and no overlap at all) favour the start of the video
+    order = sorted(range(len(passages)), key=lambda i: (-overlap[i], i))
+
+    chosen, used = [], 0
+    for i in order:
+        cost = estimate_tokens(passages[i][1]) + 1
+        if used + cost > max_tokens:
+            if not chosen:  # always give the source something
+                chosen.append((passages[i][0], _truncate(passages[i][1], max_tokens)))
+            continue
+        chosen.append(passages[i])
+        used += cost
+    return [p for _, p in sorted(chosen)]
+
+
+def _source_block(idx: int, query: str, source: ContextSource, max_tokens: int) -> Tuple[str, Dict[str, Any]]:
+    header = f"[Source {idx}] {source.title or 'Untitled'}"
+    remaining = max_tokens - estimate_tokens(header)
+    lines = [header]
+    info = {"summary": False, "passages": 0}
+
+    summary = (source.summary or "").strip()
+    if summary and remaining > 0:
+        summary_text = _truncate(summary, max(remaining // 2, remaining - estimate_tokens(source.transcript or "")))
+        lines.append(f"Summary: {summary_text}")
+        remaining -= estimate_tokens(lines[-1])
+        info["summary"] = True
+
+    transcript = (source.transcript or "").strip()
+    if transcript and remaining > 0:
+        passages = _select_passages(query, transcript, remaining - 3)
+        if passages:
+            lines.append("Excerpts:")
+            lines.extend(passages)
+            info["passages"] = len(passages)
+    elif not summary and source.fallback:
+        lines.append(_truncate(source.fallback, max(remaining, 1)))
+
+    return "\n".join(lines) + "\n", info
+
+
+def build_context(
+    query: str,
+    sources: List[ContextSource],
+    token_budget: int = RAG_CONTEXT_TOKEN_BUDGET,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Pack sources into a context string within token_budget.
+
+    Args:
+        query: User question (drives passage selection)
+        sources: In citation order; source i becomes "[Source i+1]"
+        token_budget: Estimated token cap for the whole context
+
+    Returns:
+        (context, stats with "tokens", "summaries" and "passages")
+    """
+    blocks = []
+    stats = {"tokens": 0, "summaries": 0, "passages": 0}
+    remaining = token_budget
+    for idx, source in enumerate(sources, 1):
+        share = remaining // (len(sources) - idx + 1)
+        block, info = _source_block(idx, query, source, share)
+        blocks.append(block)
+        used = estimate_tokens(block)
+        remaining -= used
+        stats["tokens"] += used
+        stats["summaries"] += 1 if info["summary"] else 0
+        stats["passages"] += info["passages"]
+    return "\n".join(blocks), stats
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+import numpy as np
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 import os
 from sqlalchemy import text
@@ -10,6 +11,29 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 class Base(DeclarativeBase):
     pass
 
+
+def register_pgvector(dbapi_connection, connection_record=None):
+    """Register pgvector's psycopg adapters on a new DBAPI connection.
+
+    numpy arrays passed as parameters are then sent as binary vectors (no
+    float -> text -> parse round trip) and vector columns load as numpy arrays.
+    """
+    try:
+        from pgvector.psycopg import register_vector
+        register_vector(dbapi_connection)
+    except Exception as e:
+        # Extension not created yet; the engine is disposed once it is
+        print(f"[db] pgvector adapter not registered: {e}")
+
+
+event.listen(engine, "connect", register_pgvector)
+
+
+def vector_param(embedding) -> np.ndarray:
+    """Bind value for a vector parameter in raw SQL (float32, sent in binary)."""
+    return np.asarray(embedding, dtype=np.float32)
+
+
 # Ensure the pgvector extension is available. This runs at import time and is
 # safe to call repeatedly because of IF NOT EXISTS. If the DB isn't ready or
 # lacks permissions this will fail silently and table creation may error later.
@@ -17,6 +41,9 @@ try:
     with engine.connect() as conn:
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         conn.commit()
+    # Drop connections opened before the extension existed so every pooled
+    # connection has the vector adapter registered
+    engine.dispose()
 except Exception:
     # Defer handling to the part of the app that creates tables; keep import-time
     # errors non-fatal so container can retry if DB becomes ready later.
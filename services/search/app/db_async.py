@@ -0,0 +1,44 @@
+"""
+Async database access for the search routes.
+
+Uses the same DATABASE_URL as the sync engine; SQLAlchemy picks psycopg's
+async driver for postgresql+psycopg URLs. The sync engine in db.py is still
+used for startup migrations and index creation.
+"""
+import os
+from typing import AsyncGenerator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .db import DATABASE_URL
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+async_engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+)
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_pgvector_async(dbapi_connection, connection_record):
+    """Async counterpart of db.register_pgvector (numpy <-> binary vectors)."""
+    try:
+        from pgvector.psycopg import register_vector_async
+        dbapi_connection.run_async(register_vector_async)
+    except Exception as e:
+        print(f"[db] pgvector adapter not registered: {e}")
+
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency that yields an AsyncSession and closes it after the request."""
+    async with AsyncSessionLocal() as db:
+        yield db
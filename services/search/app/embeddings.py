@@ -3,35 +3,220 @@
 Embedding service using sentence-transformers for semantic search.
 Uses 384-dim model to match the Vector(384) column in the database.
 """
+import asyncio
 import os
-from typing import List, Optional
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Optional, Dict, Any
 import numpy as np
 
+from .cache import TTLCache
+from .inference import run_in_inference_pool
+from .encoder_backends import EMBEDDING_BACKEND, load_sentence_encoder, check_parity
+
 # Lazy import to avoid loading model at import time
 _model = None
 _MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"  # 384 dimensions
+_model_lock = threading.Lock()
+_active_backend: Optional[str] = None
+
+# Verify non-torch backends against the torch output before serving with them
+EMBEDDING_PARITY_CHECK = os.getenv("EMBEDDING_PARITY_CHECK", "1").lower() in ("1", "true", "yes")
+
+# Micro-batching: concurrent embed_text calls are collected for up to
+# EMBED_BATCH_WINDOW_MS (or until EMBED_MAX_BATCH_SIZE requests are queued)
+# and encoded in a single forward pass. A window of 0 disables batching.
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+
+# Query embedding cache (normalized query text -> vector)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL_SEC = float(os.getenv("QUERY_EMBED_CACHE_TTL_SEC", "3600"))
+_query_cache = TTLCache(max_size=QUERY_CACHE_SIZE, ttl_sec=QUERY_CACHE_TTL_SEC, name="query_embeddings")
 
 
 def get_embedding_model():
-    """Lazy-load the embedding model."""
-    global _model
+    """Lazy-load the embedding model with the configured backend (EMBEDDING_BACKEND)."""
+    global _model, _active_backend
     if _model is None:
-        try:
-            from sentence_transformers import SentenceTransformer
-            print(f"[embeddings] Loading model: {_MODEL_NAME}")
-            _model = SentenceTransformer(_MODEL_NAME)
-            print(f"[embeddings] Model loaded successfully")
-        except ImportError:
-            raise RuntimeError(
-                "sentence-transformers not installed. "
-                "Run: pip install sentence-transformers"
-            )
+        with _model_lock:
+            if _model is None:
+                print(f"[embeddings] Loading model: {_MODEL_NAME} (backend={EMBEDDING_BACKEND})")
+                model = load_sentence_encoder(_MODEL_NAME, EMBEDDING_BACKEND)
+                _active_backend = EMBEDDING_BACKEND
+                if EMBEDDING_BACKEND != "torch" and EMBEDDING_PARITY_CHECK:
+                    report = check_parity(_MODEL_NAME, model)
+                    print(f"[embeddings] Parity check vs torch: {report}")
+                    if not report["passed"]:
+                        print("[embeddings][WARNING] Parity check failed; falling back to torch backend")
+                        model = load_sentence_encoder(_MODEL_NAME, "torch")
+                        _active_backend = "torch"
+                _model = model
+                print(f"[embeddings] Model loaded successfully")
     return _model
 
 
+class EmbeddingBatcher:
+    """
+    In-process micro-batcher in front of the embedding model.
+
+    Callers block on submit() while a single background thread drains the
+    queue, encodes everything that arrived within the batch window in one
+    model.encode call, and hands each caller its own vector.
+    """
+
+    def __init__(self, max_batch_size: int, window_ms: float, history: int = 2048):
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_sec = max(0.0, window_ms) / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        # Metrics
+        self._batches = 0
+        self._items = 0
+        self._max_batch_seen = 0
+        self._batch_sizes: deque = deque(maxlen=history)
+        self._queue_waits_ms: deque = deque(maxlen=history)
+        self._encode_ms: deque = deque(maxlen=history)
+
+    def enqueue(self, text: str) -> Future:
+        """Queue text for the next batch; the future resolves to its embedding."""
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def submit(self, text: str) -> np.ndarray:
+        """Queue text for the next batch and wait for its embedding."""
+        return self.enqueue(text).result()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_sec
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Window closed; still take anything that is already waiting
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            texts = [item[0] for item in batch]
+            try:
+                model = get_embedding_model()
+                vectors = model.encode(
+                    texts,
+                    batch_size=len(texts),
+                    normalize_embeddings=True,
+                    show_progress_bar=False,
+                )
+                for (_, fut, _), vec in zip(batch, vectors):
+                    fut.set_result(vec)
+            except Exception as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            finished = time.perf_counter()
+            self._record(batch, started, finished)
+
+    def _record(self, batch: list, started: float, finished: float):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._batch_sizes.append(len(batch))
+            self._encode_ms.append((finished - started) * 1000.0)
+            for _, _, enqueued in batch:
+                self._queue_waits_ms.append((started - enqueued) * 1000.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch size and queue wait metrics (recent window percentiles)."""
+        with self._stats_lock:
+            sizes = list(self._batch_sizes)
+            waits = list(self._queue_waits_ms)
+            encodes = list(self._encode_ms)
+            batches, items, max_seen = self._batches, self._items, self._max_batch_seen
+
+        def pct(values: list, q: float) -> float:
+            return float(np.percentile(values, q)) if values else 0.0
+
+        return {
+            "window_ms": self.window_sec * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": (items / batches) if batches else 0.0,
+            "max_batch_size_seen": max_seen,
+            "batch_size_p50": pct(sizes, 50),
+            "queue_depth": self._queue.qsize(),
+            "queue_wait_ms_p50": pct(waits, 50),
+            "queue_wait_ms_p99": pct(waits, 99),
+            "encode_ms_p50": pct(encodes, 50),
+            "encode_ms_p99": pct(encodes, 99),
+        }
+
+
+_batcher: Optional[EmbeddingBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_embedding_batcher() -> Optional[EmbeddingBatcher]:
+    """Return the shared micro-batcher, or None when batching is disabled."""
+    global _batcher
+    if EMBED_BATCH_WINDOW_MS <= 0 or EMBED_MAX_BATCH_SIZE <= 1:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher(EMBED_MAX_BATCH_SIZE, EMBED_BATCH_WINDOW_MS)
+    return _batcher
+
+
+def get_embedding_stats() -> Dict[str, Any]:
+    """Metrics for the embedding path (used by the /metrics endpoint)."""
+    batcher = get_embedding_batcher()
+    return {
+        "model": _MODEL_NAME,
+        "backend": _active_backend or EMBEDDING_BACKEND,
+        "batching_enabled": batcher is not None,
+        "batcher": batcher.stats() if batcher else None,
+        "query_cache": _query_cache.stats(),
+    }
+
+
 def embed_text(text: str) -> List[float]:
     """
     Generate a 384-dim embedding for the given text.
+
+    Concurrent callers are micro-batched into a single encode call
+    (see EmbeddingBatcher).
     
     Args:
         text: The text to embed (query, transcript, or combined text)
@@ -43,13 +228,70 @@ def embed_text(text: str) -> List[float]:
         # Return zero vector for empty text
         return [0.0] * 384
     
-    model = get_embedding_model()
-    embedding = model.encode(text, normalize_embeddings=True)
+    batcher = get_embedding_batcher()
+    if batcher is not None:
+        embedding = batcher.submit(text)
+    else:
+        model = get_embedding_model()
+        embedding = model.encode(text, normalize_embeddings=True)
     
     # Convert to list for JSON serialization and database storage
     return embedding.tolist()
 
 
+def normalize_query(text: str) -> str:
+    """Canonical form used as the query cache key (case/whitespace-insensitive).
+
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so lowercasing does not change
+    the resulting embedding.
+    """
+    return re.sub(r"\s+", " ", (text or "").strip()).lower()
+
+
+def embed_query(text: str) -> List[float]:
+    """
+    Embed a search query, reusing cached vectors for repeated queries.
+
+    All search endpoints go through this so a single /search/rag call (and
+    follow-up feedback / similar-collection lookups) only encodes a given
+    query once. The returned list is shared with the cache; don't mutate it.
+    """
+    key = normalize_query(text)
+    if not key:
+        return [0.0] * 384
+
+    cached = _query_cache.get(key)
+    if cached is not None:
+        return cached
+
+    embedding = embed_text(key)
+    _query_cache.set(key, embedding)
+    return embedding
+
+
+async def embed_query_async(text: str) -> List[float]:
+    """
+    Async embed_query: cache hits return immediately; misses await the
+    micro-batcher's future (no thread is held while waiting) or, with
+    batching disabled, run on the inference executor.
+    """
+    key = normalize_query(text)
+    if not key:
+        return [0.0] * 384
+
+    cached = _query_cache.get(key)
+    if cached is not None:
+        return cached
+
+    batcher = get_embedding_batcher()
+    if batcher is not None:
+        embedding = (await asyncio.wrap_future(batcher.enqueue(key))).tolist()
+    else:
+        embedding = await run_in_inference_pool(embed_text, key)
+    _query_cache.set(key, embedding)
+    return embedding
+
+
 def embed_texts_batch(texts: List[str]) -> List[List[float]]:
     """
     Generate embeddings for multiple texts in a single batch (more efficient).
@@ -0,0 +1,78 @@
+"""
+Dedicated, bounded executor for CPU-bound model inference.
+
+Async routes hand embedding and cross-encoder calls to this pool instead of
+running them on the event loop (or holding a Starlette threadpool slot for
+the whole request). The pool size caps how many forward passes run at once,
+so concurrency is limited by cores rather than by request threads; extra
+work waits in the executor queue while the event loop keeps serving I/O.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_queued = 0
+_running = 0
+_completed = 0
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=INFERENCE_WORKERS, thread_name_prefix="inference"
+                )
+    return _executor
+
+
+def _tracked(fn: Callable[[], Any]) -> Any:
+    global _queued, _running, _completed
+    with _stats_lock:
+        _queued -= 1
+        _running += 1
+    try:
+        return fn()
+    finally:
+        with _stats_lock:
+            _running -= 1
+            _completed += 1
+
+
+async def run_in_inference_pool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run fn(*args, **kwargs) on the inference executor and await the result."""
+    global _queued
+    with _stats_lock:
+        _queued += 1
+    call = functools.partial(fn, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_inference_executor(), _tracked, call)
+
+
+def shutdown_inference_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def get_inference_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            "workers": INFERENCE_WORKERS,
+            "queued": _queued,
+            "running": _running,
+            "completed": _completed,
+        }
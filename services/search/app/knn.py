@@ -0,0 +1,152 @@
+"""
+Index-friendly thresholded kNN over pgvector columns.
+
+`WHERE 1 - (embedding <=> q) > t ORDER BY similarity` can't be served by an
+HNSW index, so Postgres scans the table. thresholded_knn() always issues the
+index-ordered form
+
+    ORDER BY embedding <=> q LIMIT n
+
+and applies the threshold to the returned rows. Because rows come back in
+distance order, the first row below the threshold ends the search; if the
+index returned too few rows (HNSW only yields ef_search candidates, and
+extra WHERE filters are applied after the index scan) n is widened step by
+step, raising hnsw.ef_search with SET LOCAL so the setting never leaks into
+other requests sharing the pooled connection.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+HNSW_MAX_EF_SEARCH = 1000  # pgvector upper bound
+KNN_MIN_EF_SEARCH = int(os.getenv("KNN_MIN_EF_SEARCH", "40"))
+KNN_WIDEN_FACTOR = int(os.getenv("KNN_WIDEN_FACTOR", "4"))
+KNN_MAX_CANDIDATES = int(os.getenv("KNN_MAX_CANDIDATES", "1000"))
+# hnsw.iterative_scan mode for filtered scans (pgvector >= 0.8): "relaxed_order",
+# "strict_order" or "off"
+HNSW_ITERATIVE_SCAN = os.getenv("HNSW_ITERATIVE_SCAN", "relaxed_order").strip().lower()
+
+_iterative_scan_supported: Optional[bool] = None
+
+
+async def set_local_ef_search(db: AsyncSession, ef_search: int):
+    """Set hnsw.ef_search for the current transaction only."""
+    ef = int(max(1, min(ef_search, HNSW_MAX_EF_SEARCH)))
+    try:
+        await db.execute(sql_text(f"SET LOCAL hnsw.ef_search = {ef}"))
+    except Exception:
+        pass  # Ignore if HNSW not configured
+
+
+async def set_local_iterative_scan(db: AsyncSession) -> bool:
+    """
+    Enable hnsw.iterative_scan for the current transaction.
+
+    With iterative scans the HNSW index keeps producing candidates until the
+    LIMIT is filled after WHERE filters, instead of stopping at ef_search
+    rows. With "relaxed_order" rows may come back slightly out of distance
+    order, so callers must re-sort (e.g. a MATERIALIZED CTE).
+
+    Returns:
+        False when disabled or the installed pgvector is older than 0.8
+    """
+    global _iterative_scan_supported
+    if HNSW_ITERATIVE_SCAN not in ("relaxed_order", "strict_order"):
+        return False
+    if _iterative_scan_supported is None:
+        try:
+            version = (await db.execute(
+                sql_text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            )).scalar()
+            parts = tuple(int(p) for p in (version or "0").split(".")[:2])
+            _iterative_scan_supported = parts >= (0, 8)
+        except Exception as e:
+            print(f"[knn][WARN] Could not read pgvector version: {e}")
+            _iterative_scan_supported = False
+        print(f"[knn] hnsw.iterative_scan {'available' if _iterative_scan_supported else 'unavailable (pgvector < 0.8)'}")
+    if _iterative_scan_supported:
+        await db.execute(sql_text(f"SET LOCAL hnsw.iterative_scan = {HNSW_ITERATIVE_SCAN}"))
+    return _iterative_scan_supported
+
+
+def build_knn_sql(
+    table: str,
+    embedding_column: str,
+    columns: Sequence[str],
+    where: Optional[str] = None,
+) -> str:
+    """
+    Index-ordered kNN statement returning `columns` plus "distance".
+
+    Binds :query_vec and :n. table/columns/where are trusted SQL fragments
+    from code, never user input.
+    """
+    conditions = [f"{embedding_column} IS NOT NULL"]
+    if where:
+        conditions.append(f"({where})")
+    return (
+        f"SELECT {', '.join(columns)}, ({embedding_column} <=> :query_vec) AS distance\n"
+        f"FROM {table}\n"
+        f"WHERE {' AND '.join(conditions)}\n"
+        f"ORDER BY {embedding_column} <=> :query_vec\n"
+        f"LIMIT :n"
+    )
+
+
+async def thresholded_knn(
+    db: AsyncSession,
+    table: str,
+    embedding_column: str,
+    columns: Sequence[str],
+    query_vec: Any,
+    min_similarity: float,
+    limit: int,
+    where: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    initial_candidates: Optional[int] = None,
+    max_candidates: int = KNN_MAX_CANDIDATES,
+) -> List[Dict[str, Any]]:
+    """
+    Up to `limit` rows with cosine similarity > min_similarity, most similar first.
+
+    Args:
+        db: Async session (the SET LOCAL applies to its current transaction)
+        table, embedding_column, columns, where: see build_knn_sql
+        query_vec: Query vector parameter (db.vector_param)
+        min_similarity: Cosine similarity threshold (exclusive)
+        limit: Maximum rows to return
+        params: Extra bind parameters used by `where`
+        initial_candidates: First LIMIT (default 2 * limit)
+        max_candidates: Upper bound for widening
+
+    Returns:
+        Row dicts with the requested columns plus "distance" and "similarity"
+    """
+    stmt = sql_text(build_knn_sql(table, embedding_column, columns, where))
+    n = max(limit, initial_candidates or 2 * limit, 1)
+    max_candidates = max(n, max_candidates)
+
+    while True:
+        await set_local_ef_search(db, max(KNN_MIN_EF_SEARCH, n))
+        rows = (await db.execute(stmt, {**(params or {}), "query_vec": query_vec, "n": n})).mappings().all()
+
+        passed = []
+        below_threshold = False
+        for row in rows:
+            similarity = 1 - float(row["distance"])
+            if similarity <= min_similarity:
+                below_threshold = True
+                break
+            passed.append({**row, "similarity": similarity})
+
+        # Done when we have enough, the distance order crossed the threshold,
+        # the table is exhausted (no post-filter could have dropped rows), or
+        # widening is capped
+        exhausted = len(rows) < n and not where
+        if len(passed) >= limit or below_threshold or exhausted or n >= max_candidates:
+            return passed[:limit]
+        n = min(n * KNN_WIDEN_FACTOR, max_candidates)
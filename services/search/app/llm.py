@@ -0,0 +1,82 @@
+"""
+LLM providers for answer generation.
+
+Selected with LLM_BACKEND:
+- "gemini" : Google Gemini through the shared llm_gateway client (default)
+- "fake"   : deterministic local model for tests and offline development;
+             cites every source and streams word by word
+
+Both expose the same interface:
+    await llm.generate(prompt) -> str
+    async for token in llm.stream(prompt): ...
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+from typing import AsyncIterator, Optional
+
+from . import llm_gateway
+from .llm_gateway import GEMINI_MODEL
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").strip().lower()
+FAKE_LLM_TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "0"))
+
+
+class GeminiLLM:
+    """Gemini text generation (full response or token stream) through llm_gateway."""
+
+    def __init__(self, api_key: Optional[str] = None, model: str = GEMINI_MODEL):
+        llm_gateway.get_client(api_key)  # fail fast without GEMINI_API_KEY
+        self.model = model
+
+    async def generate(self, prompt: str) -> str:
+        return await llm_gateway.agenerate(prompt, model=self.model, purpose="rag_answer")
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        async for text in llm_gateway.astream(prompt, model=self.model, purpose="rag_stream"):
+            yield text
+
+
+class FakeLLM:
+    """
+    Offline stand-in for tests: answers with one sentence per source found
+    in the prompt ("[Source N] Title" lines), citing each as [N].
+    """
+
+    _SOURCE_RE = re.compile(r"^\[Source (\d+)\] (.*)$", re.M)
+
+    def __init__(self, token_delay_ms: float = FAKE_LLM_TOKEN_DELAY_MS):
+        self.token_delay_sec = max(0.0, token_delay_ms) / 1000.0
+
+    def _answer(self, prompt: str) -> str:
+        sources = self._SOURCE_RE.findall(prompt)
+        if not sources:
+            return "The sources don't contain enough information to answer."
+        return " ".join(f"{title.strip() or 'Untitled'} is relevant [{n}]." for n, title in sources)
+
+    async def generate(self, prompt: str) -> str:
+        return self._answer(prompt)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        for token in re.findall(r"\S+\s*", self._answer(prompt)):
+            if self.token_delay_sec:
+                await asyncio.sleep(self.token_delay_sec)
+            yield token
+
+
+_llm = None
+
+
+def get_llm():
+    """Shared LLM client for LLM_BACKEND (created on first use)."""
+    global _llm
+    if _llm is None:
+        if LLM_BACKEND == "fake":
+            _llm = FakeLLM()
+        elif LLM_BACKEND == "gemini":
+            _llm = GeminiLLM()
+        else:
+            raise ValueError(f"Unknown LLM_BACKEND '{LLM_BACKEND}', expected 'gemini' or 'fake'")
+    return _llm
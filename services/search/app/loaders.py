@@ -0,0 +1,77 @@
+"""
+Request-scoped batch loaders.
+
+Handlers prime() every id they will need, then load_many()/get() resolve
+all pending ids with a single `WHERE key = ANY(:ids)` query per entity
+type, so the number of round trips per request stays constant instead of
+growing with the number of sources. Results are memoized for the life of
+the loader (one request); ids that don't exist are remembered as missing.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Generic, Hashable, Iterable, Optional, Type, TypeVar
+
+from sqlalchemy import String, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Collection, Transcript, Video
+
+T = TypeVar("T")
+
+
+class BatchLoader(Generic[T]):
+    """Batch loader for one ORM model keyed by a string column."""
+
+    def __init__(self, db: AsyncSession, model: Type[T], key_column):
+        self.db = db
+        self.model = model
+        self.key_column = key_column
+        self._loaded: Dict[Hashable, Optional[T]] = {}
+        self._pending: set = set()
+        self.queries = 0  # round trips issued (for logging)
+
+    def prime(self, ids: Iterable[Hashable]):
+        """Register ids to be fetched with the next load."""
+        self._pending.update(i for i in ids if i is not None and i not in self._loaded)
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        ids = list(self._pending)
+        self._pending.clear()
+        stmt = select(self.model).where(
+            self.key_column == any_(bindparam("ids", ids, type_=ARRAY(String)))
+        )
+        rows = (await self.db.execute(stmt)).scalars().all()
+        self.queries += 1
+        for i in ids:
+            self._loaded[i] = None
+        for row in rows:
+            self._loaded[getattr(row, self.key_column.key)] = row
+
+    async def load_many(self, ids: Iterable[Hashable]) -> Dict[Hashable, Optional[T]]:
+        """{id: object or None} for ids, fetching everything pending in one query."""
+        ids = list(ids)
+        self.prime(ids)
+        await self._flush()
+        return {i: self._loaded.get(i) for i in ids}
+
+    async def get(self, id_: Hashable) -> Optional[T]:
+        return (await self.load_many([id_]))[id_]
+
+
+class RequestLoaders:
+    """Loaders for the entities search handlers resolve by id."""
+
+    def __init__(self, db: AsyncSession):
+        self.videos: BatchLoader[Video] = BatchLoader(db, Video, Video.id)
+        self.transcripts: BatchLoader[Transcript] = BatchLoader(db, Transcript, Transcript.video_id)
+        self.collections: BatchLoader[Collection] = BatchLoader(db, Collection, Collection.id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "videos": self.videos.queries,
+            "transcripts": self.transcripts.queries,
+            "collections": self.collections.queries,
+        }
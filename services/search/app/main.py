@@ -1,33 +1,76 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routes_search import router as search_router
-from .db import engine
+from .db import engine, ensure_vector_indexes
+from .embeddings import get_embedding_stats
+from .reranker import get_score_cache_stats
+from .result_cache import get_result_cache_stats
+from .pagination import get_page_cache_stats
+from .answer_cache import get_answer_cache_stats
+from .llm_gateway import get_llm_stats
+from .db_async import async_engine
+from .inference import get_inference_stats, shutdown_inference_executor
 from sqlalchemy import text
 import os
+import re
 
 app = FastAPI(title="VidSense Search Service", version="1.0.0")
 
+# SQL migrations, applied in order on startup
+MIGRATIONS = [
+    "add_retrieval_feedback.sql",
+    "add_transcript_chunks.sql",
+    "add_embedding_hash.sql",
+    "add_search_tsv.sql",
+    "add_corpus_versions.sql",
+    "add_query_feedback_profile.sql",
+]
+
+
+def _split_sql_statements(sql_content: str):
+    """Split a migration file on ';', keeping $$-quoted function bodies intact."""
+    statements, current, in_dollar = [], [], False
+    for part in re.split(r"(\$\$|;)", sql_content):
+        if part == "$$":
+            in_dollar = not in_dollar
+        if part == ";" and not in_dollar:
+            statements.append("".join(current))
+            current = []
+        else:
+            current.append(part)
+    statements.append("".join(current))
+    return [s for s in statements if s.strip()]
+
 # Run database migrations on startup
 @app.on_event("startup")
 def run_migrations():
     print("[startup] Running database migrations...")
     with engine.connect() as conn:
-        # Read and execute migration SQL
-        sql_file = os.path.join(os.path.dirname(__file__), "sql", "add_retrieval_feedback.sql")
-        if os.path.exists(sql_file):
+        for name in MIGRATIONS:
+            # Read and execute migration SQL
+            sql_file = os.path.join(os.path.dirname(__file__), "sql", name)
+            if not os.path.exists(sql_file):
+                print(f"[startup] Migration file not found: {name}")
+                continue
             with open(sql_file, 'r') as f:
                 sql_content = f.read()
                 # Execute each statement separately
-                for statement in sql_content.split(';'):
-                    if statement.strip():
-                        try:
-                            conn.execute(text(statement))
-                            conn.commit()
-                        except Exception as e:
-                            print(f"[startup] Migration statement skipped (may already exist): {e}")
-            print("[startup] Database migrations completed")
-        else:
-            print("[startup] No migration file found")
+                for statement in _split_sql_statements(sql_content):
+                    try:
+                        conn.execute(text(statement))
+                        conn.commit()
+                    except Exception as e:
+                        conn.rollback()
+                        print(f"[startup] Migration statement skipped (may already exist): {e}")
+            print(f"[startup] Applied {name}")
+    # ANN index on transcripts.embedding (HNSW when pgvector supports it)
+    ensure_vector_indexes()
+    print("[startup] Database migrations completed")
+
+@app.on_event("shutdown")
+async def close_pools():
+    await async_engine.dispose()
+    shutdown_inference_executor()
 
 # CORS
 app.add_middleware(
@@ -45,3 +88,17 @@ app.include_router(search_router)
 def health_check():
     return {"status": "healthy", "service": "search"}
 
+@app.get("/metrics")
+def metrics():
+    """In-process performance counters for tuning throughput vs. latency."""
+    return {
+        "service": "search",
+        "embeddings": get_embedding_stats(),
+        "inference": get_inference_stats(),
+        "rerank_score_cache": get_score_cache_stats(),
+        "result_cache": get_result_cache_stats(),
+        "page_cache": get_page_cache_stats(),
+        "answer_cache": get_answer_cache_stats(),
+        "llm": get_llm_stats(),
+    }
+
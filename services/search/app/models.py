@@ -1,5 +1,5 @@
 from sqlalchemy import Column, String, Integer, Text, DateTime, func
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from pgvector.sqlalchemy import Vector
 from .db import Base
 
@@ -27,8 +27,21 @@ class Transcript(Base):
     ocr_json = Column(JSONB, default=list)
     summary = Column(Text, nullable=True)
     embedding = Column(Vector(384))
+    embedding_hash = Column(String(64), nullable=True)  # sha256 of the text last embedded
+    embedding_model = Column(String, nullable=True)  # model id used for that embedding
     updated_at = Column(DateTime, onupdate=func.now(), server_default=func.now())
 
+class TranscriptChunk(Base):
+    __tablename__ = 'transcript_chunks'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    video_id = Column(String, nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    start_char = Column(Integer, nullable=False)  # Offsets into transcripts.text
+    end_char = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    embedding = Column(Vector(384))
+    created_at = Column(DateTime, server_default=func.now())
+
 class Collection(Base):
     __tablename__ = 'collections'
     id = Column(String, primary_key=True)
@@ -48,3 +61,10 @@ class RetrievalFeedback(Base):
     feedback = Column(String, nullable=False)  # 'good' or 'bad'
     created_at = Column(DateTime, server_default=func.now())
 
+class QueryFeedbackProfile(Base):
+    __tablename__ = 'query_feedback_profile'
+    query = Column(Text, primary_key=True)  # Distinct feedback query
+    query_embedding = Column(Vector(384))
+    good_video_ids = Column(ARRAY(String), nullable=False, default=list)  # Latest feedback per video
+    bad_video_ids = Column(ARRAY(String), nullable=False, default=list)
+    updated_at = Column(DateTime, onupdate=func.now(), server_default=func.now())
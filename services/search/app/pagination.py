@@ -0,0 +1,95 @@
+"""
+Cursor pagination for /search/query.
+
+The first page stores a short-lived page session: the query embedding and
+the full reranked candidate list (hit fields, score and snippet span, no
+transcript text; snippets are built per page). Its response carries
+an opaque cursor {session id, offset}; follow-up requests with that cursor
+are served from the session without embedding, ANN or cross-encoder work.
+When a cursor runs past the reranked list, the caller fetches the next ANN
+page, reranks only the unseen candidates (including ones the first page's
+cascade skipped) and appends them, so pages already served never move.
+
+Session ids are derived from the request and corpus version, so a cached
+first page and a rebuilt session (after expiry) agree on the same id.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from .cache import TieredCache
+from .result_cache import RESULT_CACHE_REDIS
+
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "256"))
+PAGE_CACHE_TTL_SEC = float(os.getenv("PAGE_CACHE_TTL_SEC", "600"))
+PAGE_MAX_CANDIDATES = int(os.getenv("PAGE_MAX_CANDIDATES", "1000"))  # ANN depth cap per session
+
+_page_cache = TieredCache.create(
+    "search_pages",
+    max_size=PAGE_CACHE_SIZE,
+    ttl_sec=PAGE_CACHE_TTL_SEC,
+    use_redis=RESULT_CACHE_REDIS,
+)
+
+
+def request_digest(request: Dict[str, Any]) -> str:
+    """Digest of a search request (without cursor/k), stored in its page session."""
+    body = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+
+
+def page_session_id(request: Dict[str, Any], version: Optional[int]) -> str:
+    """Stable id for a search request (without cursor/k) at a corpus version."""
+    body = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{version}|{body}".encode("utf-8")).hexdigest()[:32]
+
+
+def encode_cursor(session_id: str, offset: int) -> str:
+    raw = json.dumps({"s": session_id, "o": offset}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Returns:
+        (session id, offset)
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        session_id, offset = str(data["s"]), int(data["o"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if offset < 0:
+        raise ValueError("Invalid cursor: negative offset")
+    return session_id, offset
+
+
+async def load_page_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Page session or None if it expired.
+
+    Session fields: "query", "request" (request_digest of the request that
+    built it), "embedding", "ranked" (reranked docs in rank order: SearchHit
+    fields without snippet, "score" and "span" for the snippet), "total"
+    (ANN candidates retrieved so far), "score_norm" (softmax denominator of
+    the first rerank batch), "ann_fetched" (ANN depth fetched so far),
+    "exhausted" (every retrieved candidate is ranked and there are no more
+    ANN candidates).
+    """
+    return await _page_cache.aget(session_id)
+
+
+async def save_page_session(session_id: str, session: Dict[str, Any]):
+    await _page_cache.aset(session_id, session)
+
+
+def get_page_cache_stats() -> Dict[str, Any]:
+    return _page_cache.stats()
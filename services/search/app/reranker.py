@@ -1,18 +1,69 @@
 """
 Cross-Encoder Reranker for RAG systems
 Uses ms-marco-MiniLM-L-6-v2 to re-rank documents by relevance to query
+
+Two modes (RERANK_MODE or the `mode` argument):
+- "document": one (query, document) pair per candidate, truncated at 512 tokens
+- "passage":  each candidate is split into token windows, every
+              (query, window) pair is scored and the best window wins (max-pool)
 """
 from __future__ import annotations
 
-from typing import List, Dict
+from typing import List, Dict, Tuple, Optional, Iterator
+import hashlib
+import os
 import threading
 from functools import lru_cache
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 
+from .cache import TieredCache
+from .inference import INFERENCE_WORKERS, run_in_inference_pool
+from .embeddings import normalize_query
+
 _model_name = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 _lock = threading.Lock()
 
+RERANK_MODE = os.getenv("RERANK_MODE", "document").lower()
+# Passage mode: window size/stride in document tokens and a cap on total pairs
+RERANK_WINDOW_TOKENS = int(os.getenv("RERANK_WINDOW_TOKENS", "256"))
+RERANK_WINDOW_STRIDE = int(os.getenv("RERANK_WINDOW_STRIDE", "192"))
+RERANK_MAX_PAIRS = int(os.getenv("RERANK_MAX_PAIRS", "400"))
+# Micro-batching: pairs are length-sorted and packed so that
+# batch_size * longest_sequence <= RERANK_TOKEN_BUDGET (padded tokens per
+# forward pass). RERANK_MAX_PAIRS_IN_FLIGHT bounds how many tokenized pairs
+# are held at once across all concurrent requests, which caps peak RSS.
+RERANK_TOKEN_BUDGET = int(os.getenv("RERANK_TOKEN_BUDGET", "8192"))
+RERANK_MAX_BATCH_SIZE = int(os.getenv("RERANK_MAX_BATCH_SIZE", "64"))
+RERANK_MAX_PAIRS_IN_FLIGHT = int(os.getenv("RERANK_MAX_PAIRS_IN_FLIGHT", "64"))
+
+# Score cache: (mode, normalized query, video_id, scored text digest) ->
+# [score, window_start, window_end]. In-process tier always; Redis tier when
+# RERANK_CACHE_REDIS is enabled.
+_score_cache = TieredCache.create(
+    name="rerank_scores",
+    max_size=int(os.getenv("RERANK_CACHE_SIZE", "20000")),
+    ttl_sec=float(os.getenv("RERANK_CACHE_TTL_SEC", "3600")),
+    use_redis=os.getenv("RERANK_CACHE_REDIS", "0").lower() in ("1", "true", "yes"),
+    remote_ttl_sec=float(os.getenv("RERANK_CACHE_REDIS_TTL_SEC", "86400")),
+)
+
+
+def get_score_cache_stats() -> Dict:
+    return _score_cache.stats()
+
+
+def _score_cache_key(query_key: str, mode: str, doc: Dict, text: str) -> str:
+    """
+    Cache key for one (query, document) pair.
+
+    The document part is video_id plus a digest of the scored text (title,
+    description and transcript), so an edit to any of them never hits a
+    stale score; the transcript version alone misses video metadata edits.
+    """
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"{_model_name}|{mode}|{query_key}|{doc.get('video_id', '')}|{digest}"
+
 
 @lru_cache(maxsize=1)
 def _get_tokenizer():
@@ -31,7 +82,241 @@ def _get_model():
     return model
 
 
-def rerank(query: str, docs: List[Dict], text_key: str = "text") -> List[Dict]:
+class _InFlightLimiter:
+    """Counting limiter: blocks until `n` units are free (n capped at capacity)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n: int) -> int:
+        n = min(max(1, n), self.capacity)
+        with self._cond:
+            while self._used + n > self.capacity:
+                self._cond.wait()
+            self._used += n
+        return n
+
+    def release(self, n: int):
+        with self._cond:
+            self._used -= n
+            self._cond.notify_all()
+
+
+_in_flight = _InFlightLimiter(RERANK_MAX_PAIRS_IN_FLIGHT)
+
+# Pairs one request tokenizes and holds at a time: an equal share of the
+# in-flight budget per inference worker, so concurrent reranks overlap
+# instead of each taking the whole limiter. Never less than one worst-case
+# (512-token) batch, so shares don't shrink batches below the token budget.
+_SLICE_PAIRS = min(
+    _in_flight.capacity,
+    max(1, _in_flight.capacity // INFERENCE_WORKERS, RERANK_TOKEN_BUDGET // 512),
+)
+
+
+def _pack_batches(lengths: List[int]) -> List[List[int]]:
+    """
+    Group indices (already sorted by length, ascending) into micro-batches
+    whose padded size (count * longest) stays within RERANK_TOKEN_BUDGET.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+    for i, length in enumerate(lengths):
+        new_longest = max(longest, length)
+        if current and (
+            (len(current) + 1) * new_longest > RERANK_TOKEN_BUDGET
+            or len(current) >= RERANK_MAX_BATCH_SIZE
+        ):
+            batches.append(current)
+            current, new_longest = [], length
+        current.append(i)
+        longest = new_longest
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _iter_scores(pairs: List[Tuple[str, str]]) -> Iterator[Tuple[int, float]]:
+    """
+    Stream (pair_index, raw_logit) for the given pairs, micro-batch by micro-batch.
+
+    Pairs are pre-sorted by text length, taken _SLICE_PAIRS at a time (a share
+    of RERANK_MAX_PAIRS_IN_FLIGHT), tokenized without padding, re-sorted by exact token length and packed
+    into token-budgeted batches, so each forward pass only pads to its own
+    longest member.
+    """
+    # Thread-safe model loading
+    with _lock:
+        tok = _get_tokenizer()
+        model = _get_model()
+    
+    order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][1]))
+    slice_size = _SLICE_PAIRS
+    
+    for s_start in range(0, len(order), slice_size):
+        slice_idx = order[s_start:s_start + slice_size]
+        held = _in_flight.acquire(len(slice_idx))
+        try:
+            # Tokenize query-doc pairs (max_length=512 for better context)
+            encoded = tok(
+                [pairs[i][0] for i in slice_idx],
+                [pairs[i][1] for i in slice_idx],
+                truncation=True,
+                max_length=512,
+                padding=False,
+            )
+            features = [
+                {key: encoded[key][j] for key in encoded.keys()}
+                for j in range(len(slice_idx))
+            ]
+            by_len = sorted(range(len(features)), key=lambda j: len(features[j]["input_ids"]))
+            lengths = [len(features[j]["input_ids"]) for j in by_len]
+            
+            for batch in _pack_batches(lengths):
+                members = [by_len[b] for b in batch]
+                inputs = tok.pad([features[j] for j in members], padding=True, return_tensors="pt")
+                
+                # Compute relevance scores
+                with torch.no_grad():
+                    logits = model(**inputs).logits
+                    # Handle models that return shape (batch, 1)
+                    batch_scores = logits.squeeze(-1).detach().cpu().tolist()
+                    if isinstance(batch_scores, float):
+                        batch_scores = [batch_scores]
+                
+                for j, score in zip(members, batch_scores):
+                    yield slice_idx[j], float(score)
+        finally:
+            _in_flight.release(held)
+
+
+def _score_pairs(pairs: List[Tuple[str, str]]) -> List[float]:
+    """Run the cross-encoder over (query, text) pairs and return raw logits in input order."""
+    if not pairs:
+        return []
+    
+    print(f"[reranker] Scoring {len(pairs)} query-text pairs "
+          f"(token_budget={RERANK_TOKEN_BUDGET}, max_in_flight={RERANK_MAX_PAIRS_IN_FLIGHT})...")
+    
+    scores: List[float] = [0.0] * len(pairs)
+    for i, score in _iter_scores(pairs):
+        scores[i] = score
+    return scores
+
+
+def _select_document_text(query: str, full_text: str) -> str:
+    """Document mode: text sent to the cross-encoder for one candidate."""
+    # Try to find query terms in the text
+    query_lower = query.lower()
+    text_lower = full_text.lower()
+    
+    # Try each word in the query
+    for word in query_lower.split():
+        if len(word) > 2:  # Skip very short words like "a"
+            pos = text_lower.find(word)
+            if pos >= 0:
+                # The tokenizer truncates at 512 tokens; passage mode covers the rest
+                print(f"[reranker]   Found '{word}' at position {pos}, using full text ({len(full_text)} chars)")
+                return full_text
+    
+    print(f"[reranker]   No query terms found, using first {min(len(full_text), 4000)} chars")
+    return full_text[:4000]
+
+
+def _split_windows(text: str) -> List[Tuple[int, int, str]]:
+    """Split text into overlapping token windows: [(start_char, end_char, window_text)]."""
+    if not text:
+        return [(0, 0, "")]
+    
+    tok = _get_tokenizer()
+    offsets = tok(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        truncation=False,
+        verbose=False,
+    )["offset_mapping"]
+    if not offsets:
+        return [(0, len(text), text)]
+    
+    stride = max(1, min(RERANK_WINDOW_STRIDE, RERANK_WINDOW_TOKENS))
+    windows = []
+    for start_tok in range(0, len(offsets), stride):
+        end_tok = min(start_tok + RERANK_WINDOW_TOKENS, len(offsets))
+        start_char, end_char = offsets[start_tok][0], offsets[end_tok - 1][1]
+        windows.append((start_char, end_char, text[start_char:end_char]))
+        if end_tok >= len(offsets):
+            break
+    return windows
+
+
+def _cap_windows(query: str, windows_per_doc: List[List[Tuple[int, int, str]]]) -> List[List[Tuple[int, int, str]]]:
+    """
+    Enforce RERANK_MAX_PAIRS across all candidates.
+
+    Every doc keeps at least its first window (title/description context);
+    remaining slots go to the windows with the most query-term hits.
+    """
+    total = sum(len(w) for w in windows_per_doc)
+    if total <= RERANK_MAX_PAIRS:
+        return windows_per_doc
+    
+    per_doc = max(1, RERANK_MAX_PAIRS // max(1, len(windows_per_doc)))
+    terms = [t for t in query.lower().split() if len(t) > 2]
+    
+    capped = []
+    for windows in windows_per_doc:
+        if len(windows) <= per_doc:
+            capped.append(windows)
+            continue
+        rest = sorted(
+            windows[1:],
+            key=lambda w: sum(w[2].lower().count(t) for t in terms),
+            reverse=True,
+        )[:per_doc - 1]
+        # Keep document order for readability of logs/offsets
+        capped.append([windows[0]] + sorted(rest, key=lambda w: w[0]))
+    
+    print(f"[reranker] Capped passage pairs from {total} to {sum(len(w) for w in capped)}")
+    return capped
+
+
+def _score_documents(query: str, docs: List[Dict], text_key: str) -> List[List]:
+    """Document mode: one pair per doc -> [[score, None, None], ...]"""
+    pairs = []
+    for i, doc in enumerate(docs):
+        full_text = doc.get(text_key, "")
+        video_id = doc.get("video_id", "unknown")[:16]
+        print(f"[reranker] Doc {i+1}/{len(docs)}: video_id={video_id}, text_length={len(full_text)}")
+        pairs.append((query, _select_document_text(query, full_text)))
+    return [[score, None, None] for score in _score_pairs(pairs)]
+
+
+def _score_passages(query: str, docs: List[Dict], text_key: str) -> List[List]:
+    """Passage mode: max-pool window scores per doc -> [[score, start, end], ...]"""
+    windows_per_doc = [_split_windows(doc.get(text_key, "")) for doc in docs]
+    windows_per_doc = _cap_windows(query, windows_per_doc)
+    
+    pairs, owners = [], []
+    for doc_idx, windows in enumerate(windows_per_doc):
+        for start_char, end_char, window_text in windows:
+            pairs.append((query, window_text))
+            owners.append((doc_idx, start_char, end_char))
+    
+    print(f"[reranker] Passage mode: {len(pairs)} windows across {len(docs)} documents")
+    scores = _score_pairs(pairs)
+    
+    best: List[Optional[List]] = [None] * len(docs)
+    for (doc_idx, start_char, end_char), score in zip(owners, scores):
+        if best[doc_idx] is None or score > best[doc_idx][0]:
+            best[doc_idx] = [score, start_char, end_char]
+    return best
+
+
+def rerank(query: str, docs: List[Dict], text_key: str = "text", mode: Optional[str] = None) -> List[Dict]:
     """
     Re-rank documents using Cross-Encoder.
     
@@ -39,10 +324,12 @@ def rerank(query: str, docs: List[Dict], text_key: str = "text") -> List[Dict]:
         query: User query string
         docs: List of dicts with at least {text_key: str}
         text_key: Key name for document text (default: "text")
+        mode: "document" or "passage" (default: RERANK_MODE)
     
     Returns:
         List of docs sorted by rerank_score (highest first)
-        Adds "rerank_score" field to each doc
+        Adds "rerank_score" field to each doc, and in passage mode
+        "best_window" = (start_char, end_char) into doc[text_key]
     
     Fallback:
         If model fails to load/run, returns docs in original order with score=0.0
@@ -51,75 +338,38 @@ def rerank(query: str, docs: List[Dict], text_key: str = "text") -> List[Dict]:
         print(f"[reranker] No documents to rerank")
         return []
     
-    print(f"[reranker] Reranking {len(docs)} documents for query: '{query[:50]}...'")
+    mode = (mode or RERANK_MODE).lower()
+    print(f"[reranker] Reranking {len(docs)} documents (mode={mode}) for query: '{query[:50]}...'")
     
-    # Smart text extraction: find query terms and send relevant section
-    pairs = []
-    for i, doc in enumerate(docs):
-        full_text = doc.get(text_key, "")
-        video_id = doc.get("video_id", "unknown")[:16]
-        
-        print(f"[reranker] Doc {i+1}/{len(docs)}: video_id={video_id}, text_length={len(full_text)}")
-        
-        # Try to find query terms in the text
-        query_lower = query.lower()
-        text_lower = full_text.lower()
-        
-        # Find best matching section
-        best_section = full_text
-        found_match = False
-        
-        # Try each word in the query
-        for word in query_lower.split():
-            if len(word) > 2:  # Skip very short words like "a"
-                pos = text_lower.find(word)
-                if pos >= 0:
-                    # Extract window around the match (2000 chars before, 2000 after)
-                    start = max(0, pos - 2000)
-                    end = min(len(full_text), pos + 2000)
-                    best_section = full_text#[start:end]
-                    print(f"[reranker]   Found '{word}' at position {pos}, using section [{start}:{end}] ({len(best_section)} chars)")
-                    found_match = True
-                    break
-        
-        if not found_match:
-            print(f"[reranker]   No query terms found, using first {min(len(full_text), 4000)} chars")
-            best_section = full_text[:4000]
-        
-        pairs.append((query, best_section))
+    # Only cache misses go to the model, in one batch
+    query_key = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+    keys = [_score_cache_key(query_key, mode, doc, doc.get(text_key, "")) for doc in docs]
+    cached = _score_cache.get_many(keys)
+    miss_idx = [i for i, key in enumerate(keys) if key not in cached]
+    print(f"[reranker] Score cache: {len(docs) - len(miss_idx)} hits, {len(miss_idx)} misses")
     
     try:
-        # Thread-safe model loading
-        with _lock:
-            tok = _get_tokenizer()
-            model = _get_model()
-        
-        print(f"[reranker] Tokenizing {len(pairs)} query-document pairs...")
+        miss_docs = [docs[i] for i in miss_idx]
+        if not miss_docs:
+            fresh = []
+        elif mode == "passage":
+            fresh = _score_passages(query, miss_docs, text_key)
+        else:
+            fresh = _score_documents(query, miss_docs, text_key)
+        _score_cache.set_many({keys[i]: result for i, result in zip(miss_idx, fresh)})
         
-        # Tokenize query-doc pairs (max_length=512 for better context)
-        inputs = tok.batch_encode_plus(
-            pairs, 
-            padding=True, 
-            truncation=True, 
-            return_tensors="pt", 
-            max_length=512
-        )
-        
-        print(f"[reranker] Computing relevance scores...")
-        
-        # Compute relevance scores
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            # Handle models that return shape (batch, 1)
-            scores = logits.squeeze(-1).detach().cpu().tolist()
-            if isinstance(scores, float):
-                scores = [scores]
+        results = [cached.get(key) for key in keys]
+        for i, result in zip(miss_idx, fresh):
+            results[i] = result
         
+        scores = [r[0] for r in results]
         print(f"[reranker] Raw logit range: [{min(scores):.4f}, {max(scores):.4f}]")
         
-        # Attach scores and sort
-        for d, s in zip(docs, scores):
-            d["rerank_score"] = float(s)
+        # Attach scores (and best passage) and sort
+        for d, (score, start_char, end_char) in zip(docs, results):
+            d["rerank_score"] = float(score)
+            if start_char is not None:
+                d["best_window"] = (int(start_char), int(end_char))
         
         ranked = sorted(docs, key=lambda x: x.get("rerank_score", 0.0), reverse=True)
         
@@ -146,3 +396,8 @@ def rerank(query: str, docs: List[Dict], text_key: str = "text") -> List[Dict]:
         for d in docs:
             d.setdefault("rerank_score", 0.0)
         return docs
+
+
+async def rerank_async(query: str, docs: List[Dict], text_key: str = "text", mode: Optional[str] = None) -> List[Dict]:
+    """rerank() on the bounded inference executor, for async routes."""
+    return await run_in_inference_pool(rerank, query, docs, text_key, mode)
@@ -0,0 +1,109 @@
+"""
+Versioned result cache for search endpoints.
+
+Entries are keyed by (endpoint, request payload, corpus version). The corpus
+version lives in the corpus_versions table and is bumped by statement-level
+triggers whenever transcripts, chunks, videos or collections change, so a
+write to the corpus makes every older entry of the scopes it feeds
+unreachable; nothing stale is ever served and nothing has to be deleted
+eagerly.
+
+Scopes:
+- "search":      transcripts (text, embedding), transcript_chunks, videos
+                 (fields shown in hits or used by filters)
+- "collections": collections, videos
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TieredCache
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "2048"))
+RESULT_CACHE_TTL_SEC = float(os.getenv("RESULT_CACHE_TTL_SEC", "3600"))
+RESULT_CACHE_REDIS = os.getenv("RESULT_CACHE_REDIS", "0").lower() in ("1", "true", "yes")
+
+_result_cache = TieredCache.create(
+    "search_results",
+    max_size=RESULT_CACHE_SIZE,
+    ttl_sec=RESULT_CACHE_TTL_SEC,
+    use_redis=RESULT_CACHE_REDIS,
+)
+
+# Per-endpoint lookup counters (the tier stats above are shared by all endpoints)
+_endpoint_stats: Dict[str, Dict[str, int]] = {}
+
+
+async def get_corpus_version(db: AsyncSession, scope: str) -> Optional[int]:
+    """Current version of a corpus scope, or None if versions aren't available."""
+    try:
+        return (await db.execute(
+            sql_text("SELECT version FROM corpus_versions WHERE scope = :scope"),
+            {"scope": scope},
+        )).scalar()
+    except Exception as e:
+        print(f"[result-cache][WARN] Could not read corpus version '{scope}': {e}")
+        await db.rollback()
+        return None
+
+
+def _cache_key(endpoint: str, payload: Dict[str, Any], version: int) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+    return f"{endpoint}|v{version}|{digest}"
+
+
+def _count(endpoint: str, field: str):
+    stats = _endpoint_stats.setdefault(endpoint, {"hits": 0, "misses": 0, "bypassed": 0})
+    stats[field] += 1
+
+
+async def get_cached_result(endpoint: str, payload: Dict[str, Any], version: Optional[int]) -> Optional[Dict[str, Any]]:
+    """
+    Look up a cached response body.
+
+    Args:
+        endpoint: Endpoint name (part of the key)
+        payload: Request payload as a dict
+        version: Corpus version from get_corpus_version (None bypasses the cache)
+
+    Returns:
+        The cached response dict, or None on a miss
+    """
+    if not RESULT_CACHE_ENABLED or version is None:
+        _count(endpoint, "bypassed")
+        return None
+    cached = await _result_cache.aget(_cache_key(endpoint, payload, version))
+    _count(endpoint, "hits" if cached is not None else "misses")
+    return cached
+
+
+async def store_result(endpoint: str, payload: Dict[str, Any], version: Optional[int], response: Dict[str, Any]):
+    """Cache a response body under the corpus version it was computed against."""
+    if not RESULT_CACHE_ENABLED or version is None:
+        return
+    await _result_cache.aset(_cache_key(endpoint, payload, version), response)
+
+
+async def purge_result_cache() -> int:
+    """Drop every cached result (both tiers). Returns the number of entries removed."""
+    return await _result_cache.aclear()
+
+
+def get_result_cache_stats() -> Dict[str, Any]:
+    endpoints = {}
+    for endpoint, stats in _endpoint_stats.items():
+        lookups = stats["hits"] + stats["misses"]
+        endpoints[endpoint] = dict(stats, hit_rate=(stats["hits"] / lookups) if lookups else 0.0)
+    return {
+        "enabled": RESULT_CACHE_ENABLED,
+        "endpoints": endpoints,
+        **_result_cache.stats(),
+    }
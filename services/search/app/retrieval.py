@@ -0,0 +1,422 @@
+"""
+Stage 1 candidate retrieval for search: pgvector ANN over transcripts.
+
+Two retrieval modes:
+- "document": one vector per transcript (caption + start of transcript)
+- "chunks":   kNN over transcript_chunks, max-sim aggregated per video, so
+              long transcripts are matched anywhere in their text
+
+With hybrid=True a lexical leg (Postgres full-text search over title,
+hashtags, description and transcript) runs concurrently with the vector
+leg on its own session, and the two ranked lists are merged with
+reciprocal rank fusion (RRF), so names, hashtags and exact phrases reach
+the reranker even when the vectors miss.
+
+Filters (source, author, duration, hashtags, created date) are pushed into
+the ANN and lexical SQL, so a filtered query still returns `limit`
+matching candidates and the reranker never sees rows that would be thrown
+away. Excluded video ids (RAG feedback) are pushed down the same way. On
+pgvector >= 0.8 filtered ANN scans use hnsw.iterative_scan; older versions
+fall back to the maximum ef_search.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text as sql_text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import vector_param
+from .db_async import AsyncSessionLocal
+from .knn import HNSW_MAX_EF_SEARCH, set_local_ef_search, set_local_iterative_scan
+
+# Chunk mode fetches this many nearest chunks per requested video before the
+# per-video max-sim aggregation, capped so hour-long transcripts can't blow up
+# the candidate set. When a few long videos take most of those chunks, the
+# chunk window is widened (up to the cap) and any remaining shortfall is
+# topped up from document vectors.
+CHUNKS_PER_VIDEO = int(os.getenv("CHUNKS_PER_VIDEO", "4"))
+MAX_CHUNK_CANDIDATES = int(os.getenv("MAX_CHUNK_CANDIDATES", "800"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "80"))
+
+HYBRID_ENABLED = os.getenv("HYBRID_SEARCH", "1").lower() in ("1", "true", "yes")
+RRF_K = int(os.getenv("RRF_K", "60"))  # RRF damping constant
+
+
+# {filters} is replaced with the clause from build_video_filter(). The
+# nearest CTE is MATERIALIZED and re-sorted because relaxed-order iterative
+# scans may return rows slightly out of distance order.
+_DOCUMENT_SQL = """
+    WITH nearest AS MATERIALIZED (
+        SELECT t.video_id, (t.embedding <=> :query_vec) AS distance
+        FROM transcripts t
+        WHERE t.embedding IS NOT NULL{filters}
+        ORDER BY t.embedding <=> :query_vec
+        LIMIT :limit
+    )
+    SELECT
+        n.video_id,
+        v.title,
+        v.author,
+        v.url,
+        v.source,
+        v.description,
+        v.media_path,
+        t.text,
+        n.distance AS ann_distance,
+        1 - n.distance AS similarity_score,
+        NULL AS start_char,
+        NULL AS end_char
+    FROM nearest n
+    JOIN videos v ON v.id = n.video_id
+    JOIN transcripts t ON t.video_id = n.video_id
+    ORDER BY n.distance
+"""
+
+_CHUNK_SQL = """
+    WITH nearest AS (
+        SELECT c.video_id, c.start_char, c.end_char,
+               (c.embedding <=> :query_vec) AS distance
+        FROM transcript_chunks c
+        WHERE c.embedding IS NOT NULL{filters}
+        ORDER BY c.embedding <=> :query_vec
+        LIMIT :chunk_limit
+    ),
+    best AS (
+        SELECT DISTINCT ON (video_id) video_id, start_char, end_char, distance
+        FROM nearest
+        ORDER BY video_id, distance
+    )
+    SELECT
+        b.video_id,
+        v.title,
+        v.author,
+        v.url,
+        v.source,
+        v.description,
+        v.media_path,
+        t.text,
+        b.distance AS ann_distance,
+        1 - b.distance AS similarity_score,
+        b.start_char,
+        b.end_char,
+        (SELECT COUNT(*) FROM nearest) AS nearest_chunks
+    FROM best b
+    JOIN videos v ON v.id = b.video_id
+    JOIN transcripts t ON t.video_id = b.video_id
+    ORDER BY b.distance
+    LIMIT :limit
+"""
+
+
+# Lexical leg: one GIN index scan per table, ranks summed per video. Returns
+# the same row shape as the vector queries (distance computed for the fused
+# candidates so the cascade and softmax still have a vector signal).
+_LEXICAL_SQL = """
+    WITH q AS (
+        SELECT websearch_to_tsquery('english', :query) AS tsq
+    ),
+    matches AS (
+        SELECT v.id AS video_id, ts_rank_cd(v.search_tsv, q.tsq) AS rank
+        FROM videos v, q
+        WHERE v.search_tsv @@ q.tsq
+        UNION ALL
+        SELECT t.video_id, ts_rank_cd(t.search_tsv, q.tsq, 32) AS rank
+        FROM transcripts t, q
+        WHERE t.search_tsv @@ q.tsq
+    ),
+    ranked AS (
+        SELECT m.video_id, SUM(m.rank) AS lexical_rank
+        FROM matches m
+        WHERE TRUE{filters}
+        GROUP BY m.video_id
+        ORDER BY lexical_rank DESC
+        LIMIT :limit
+    )
+    SELECT
+        r.video_id,
+        v.title,
+        v.author,
+        v.url,
+        v.source,
+        v.description,
+        v.media_path,
+        t.text,
+        COALESCE(t.embedding <=> :query_vec, 1.0) AS ann_distance,
+        1 - COALESCE(t.embedding <=> :query_vec, 1.0) AS similarity_score,
+        NULL AS start_char,
+        NULL AS end_char
+    FROM ranked r
+    JOIN videos v ON v.id = r.video_id
+    JOIN transcripts t ON t.video_id = r.video_id
+    ORDER BY r.lexical_rank DESC
+"""
+
+
+def build_video_filter(filters: Optional[Dict[str, Any]], video_id_column: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    SQL clause restricting `video_id_column` to videos matching `filters`.
+
+    Args:
+        filters: Any of "sources", "authors", "hashtags" (lists, matched
+                 case-insensitively; hashtags with or without '#'),
+                 "min_duration_sec", "max_duration_sec", "created_after",
+                 "created_before"
+        video_id_column: Trusted column reference, e.g. "t.video_id"
+
+    Returns:
+        (" AND EXISTS (...)" or "", bind parameters)
+    """
+    if not filters:
+        return "", {}
+
+    conditions: List[str] = []
+    params: Dict[str, Any] = {}
+    if filters.get("sources"):
+        conditions.append("lower(fv.source) = ANY(:f_sources)")
+        params["f_sources"] = [s.strip().lower() for s in filters["sources"]]
+    if filters.get("authors"):
+        conditions.append("lower(fv.author) = ANY(:f_authors)")
+        params["f_authors"] = [a.strip().lower() for a in filters["authors"]]
+    if filters.get("hashtags"):
+        conditions.append(
+            "EXISTS (SELECT 1 FROM jsonb_array_elements_text(COALESCE(fv.hashtags, '[]'::jsonb)) h "
+            "WHERE lower(ltrim(h, '#')) = ANY(:f_hashtags))"
+        )
+        params["f_hashtags"] = [h.strip().lstrip("#").lower() for h in filters["hashtags"]]
+    if filters.get("min_duration_sec") is not None:
+        conditions.append("fv.duration_sec >= :f_min_duration")
+        params["f_min_duration"] = int(filters["min_duration_sec"])
+    if filters.get("max_duration_sec") is not None:
+        conditions.append("fv.duration_sec <= :f_max_duration")
+        params["f_max_duration"] = int(filters["max_duration_sec"])
+    if filters.get("created_after") is not None:
+        conditions.append("fv.created_at >= :f_created_after")
+        params["f_created_after"] = filters["created_after"]
+    if filters.get("created_before") is not None:
+        conditions.append("fv.created_at < :f_created_before")
+        params["f_created_before"] = filters["created_before"]
+
+    if not conditions:
+        return "", {}
+    clause = (
+        f"\n          AND EXISTS (SELECT 1 FROM videos fv WHERE fv.id = {video_id_column} "
+        f"AND {' AND '.join(conditions)})"
+    )
+    return clause, params
+
+
+def _candidate_filter(
+    filters: Optional[Dict[str, Any]],
+    exclude_video_ids: Optional[List[str]],
+    video_id_column: str,
+) -> Tuple[str, Dict[str, Any]]:
+    """build_video_filter plus `video_id <> ALL(:excluded_ids)` for excluded videos."""
+    clause, params = build_video_filter(filters, video_id_column)
+    if exclude_video_ids:
+        clause += f"\n          AND {video_id_column} <> ALL(:excluded_ids)"
+        params["excluded_ids"] = list(exclude_video_ids)
+    return clause, params
+
+
+def _row_to_doc(row) -> Dict[str, Any]:
+    (video_id, title, author, url, source, description, media_path, text,
+     ann_dist, sim_score, start_char, end_char) = row
+
+    # Combine title, description, and transcript for better reranking
+    combined_text = ""
+    if title:
+        combined_text += f"Title: {title}\n\n"
+    if description:
+        combined_text += f"Description: {description}\n\n"
+    if text:
+        combined_text += "Transcript: "
+    transcript_offset = len(combined_text)  # where transcript_only starts in "text"
+    if text:
+        combined_text += text
+
+    doc = {
+        "video_id": video_id,
+        "title": title,
+        "author": author,
+        "url": url,
+        "source": source,
+        "description": description,
+        "media_path": media_path,
+        "text": combined_text,  # Use combined text for reranking
+        "transcript_only": text or "",  # Keep original transcript for snippets
+        "transcript_offset": transcript_offset,
+        "ann_distance": float(ann_dist),
+        "vector_similarity": float(sim_score),
+    }
+    if start_char is not None and end_char is not None:
+        # Best matching chunk (offsets into transcript_only)
+        doc["chunk_span"] = (int(start_char), int(end_char))
+    return doc
+
+
+async def _set_ann_params(db: AsyncSession, fetch: int, filtered: bool):
+    ef_search = max(HNSW_EF_SEARCH, fetch)
+    if filtered and not await set_local_iterative_scan(db):
+        # No iterative scans: the index stops after ef_search rows and the
+        # filter is applied afterwards, so search as wide as pgvector allows
+        ef_search = HNSW_MAX_EF_SEARCH
+    await set_local_ef_search(db, ef_search)
+
+
+async def _chunk_candidates(
+    db: AsyncSession,
+    query_vec: np.ndarray,
+    limit: int,
+    filter_sql: str,
+    filter_params: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """
+    Best chunk per video for up to `limit` videos. The nearest-chunk window
+    grows while it is full but collapses to fewer than `limit` videos.
+    """
+    fetch = min(limit * CHUNKS_PER_VIDEO, MAX_CHUNK_CANDIDATES)
+    stmt = sql_text(_CHUNK_SQL.format(filters=filter_sql))
+    while True:
+        await _set_ann_params(db, fetch, bool(filter_sql))
+        rows = (await db.execute(
+            stmt, {**filter_params, "query_vec": query_vec, "limit": limit, "chunk_limit": fetch}
+        )).fetchall()
+        nearest_chunks = rows[0][-1] if rows else 0
+        if len(rows) >= limit or nearest_chunks < fetch or fetch >= MAX_CHUNK_CANDIDATES:
+            return [_row_to_doc(tuple(row)[:-1]) for row in rows]
+        widened = min(fetch * max(2, CHUNKS_PER_VIDEO), MAX_CHUNK_CANDIDATES)
+        print(f"[search] Chunk window {fetch} gave {len(rows)}/{limit} videos, widening to {widened}")
+        fetch = widened
+
+
+async def _vector_candidates(
+    db: AsyncSession,
+    query_vec: np.ndarray,
+    limit: int,
+    mode: str,
+    filters: Optional[Dict[str, Any]] = None,
+    exclude_video_ids: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    column = "c.video_id" if mode == "chunks" else "t.video_id"
+    filter_sql, filter_params = _candidate_filter(filters, exclude_video_ids, column)
+
+    if mode != "chunks":
+        await _set_ann_params(db, limit, bool(filter_sql))
+        rows = (await db.execute(
+            sql_text(_DOCUMENT_SQL.format(filters=filter_sql)),
+            {**filter_params, "query_vec": query_vec, "limit": limit},
+        )).fetchall()
+        return [_row_to_doc(row) for row in rows]
+
+    docs = await _chunk_candidates(db, query_vec, limit, filter_sql, filter_params)
+    if len(docs) < limit:
+        # Chunk cap reached, or transcripts without chunks (not backfilled
+        # yet): fill the rest from document vectors, ranked after the chunks
+        found = [doc["video_id"] for doc in docs]
+        extra = await _vector_candidates(
+            db, query_vec, limit - len(docs), "document", filters, list(exclude_video_ids or []) + found
+        )
+        if extra:
+            print(f"[search] Chunk mode: {len(docs)} videos from chunks, {len(extra)} from document vectors")
+        docs += extra
+    return docs
+
+
+async def _lexical_candidates(
+    db: AsyncSession,
+    query: str,
+    query_vec: np.ndarray,
+    limit: int,
+    filters: Optional[Dict[str, Any]] = None,
+    exclude_video_ids: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    filter_sql, filter_params = _candidate_filter(filters, exclude_video_ids, "m.video_id")
+    rows = (await db.execute(
+        sql_text(_LEXICAL_SQL.format(filters=filter_sql)),
+        {**filter_params, "query": query, "query_vec": query_vec, "limit": limit},
+    )).fetchall()
+    return [_row_to_doc(row) for row in rows]
+
+
+def fuse_rrf(ranked_lists: Dict[str, List[Dict[str, Any]]], limit: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Reciprocal rank fusion: score(d) = sum over lists of 1 / (k + rank).
+
+    Args:
+        ranked_lists: {leg name: docs in rank order}; the first list a video
+                      appears in supplies its doc (put the vector leg first so
+                      chunk spans are kept)
+        limit: Number of fused docs to return
+        k: Damping constant (60 in the original RRF paper)
+
+    Returns:
+        Docs ordered by "rrf_score", each with a "<leg>_rank" (1-based) per
+        list it appeared in
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for leg, docs in ranked_lists.items():
+        for rank, doc in enumerate(docs, start=1):
+            entry = fused.setdefault(doc["video_id"], doc)
+            entry[f"{leg}_rank"] = rank
+            entry["rrf_score"] = entry.get("rrf_score", 0.0) + 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda d: d["rrf_score"], reverse=True)[:limit]
+
+
+async def _lexical_leg(
+    query: str,
+    query_vec: np.ndarray,
+    limit: int,
+    filters: Optional[Dict[str, Any]] = None,
+    exclude_video_ids: Optional[List[str]] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """_lexical_candidates on its own session; None if the leg failed."""
+    try:
+        async with AsyncSessionLocal() as db:
+            return await _lexical_candidates(db, query, query_vec, limit, filters, exclude_video_ids)
+    except Exception as e:
+        # Full-text columns missing or bad tsquery: degrade to vector-only
+        print(f"[search][WARN] Lexical leg failed, using vector results only: {e}")
+        return None
+
+
+async def retrieve_candidates(
+    db: AsyncSession,
+    query_embedding: List[float],
+    limit: int,
+    mode: str = "document",
+    query: str | None = None,
+    hybrid: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+    exclude_video_ids: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Retrieve up to `limit` candidate videos.
+
+    Vector-only retrieval returns docs ordered by vector distance. With
+    hybrid=True (requires `query`) the vector and lexical legs each fetch
+    `limit` videos and the fused top `limit` are returned in RRF order.
+    `filters` (see build_video_filter) and `exclude_video_ids` restrict
+    both legs in SQL, so up to `limit` eligible videos come back.
+
+    Returns docs ready for reranking: combined "text", "transcript_only",
+    "ann_distance", "vector_similarity" and, in chunk mode, "chunk_span".
+    """
+    query_vec = vector_param(query_embedding)
+    if not hybrid or not query or not query.strip():
+        return await _vector_candidates(db, query_vec, limit, mode, filters, exclude_video_ids)
+
+    # The legs are independent round trips: run them at once, the lexical
+    # one on its own session (an AsyncSession can't run two queries at once)
+    vector_docs, lexical_docs = await asyncio.gather(
+        _vector_candidates(db, query_vec, limit, mode, filters, exclude_video_ids),
+        _lexical_leg(query, query_vec, limit, filters, exclude_video_ids),
+    )
+    if lexical_docs is None:
+        return vector_docs
+
+    print(f"[search] Hybrid: {len(vector_docs)} vector + {len(lexical_docs)} lexical candidates")
+    return fuse_rrf({"ann": vector_docs, "lexical": lexical_docs}, limit)
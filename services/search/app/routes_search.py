@@ -5,18 +5,37 @@ Provides semantic search over video transcripts and AI-generated answers with ci
 """
 from __future__ import annotations
 
+import asyncio
 import json
+import os
 import re
-from typing import List, Optional, Dict, Any
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Literal, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import text as sql_text
-from sqlalchemy.orm import Session
-
-from .db import get_db
-from .embeddings import embed_text, combine_text_for_embedding
-from .reranker import rerank
+from sqlalchemy import text as sql_text, select, delete, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import vector_param
+from .db_async import AsyncSessionLocal, get_async_db
+from .embeddings import embed_query_async
+from .reranker import rerank_async
+from .retrieval import retrieve_candidates, HYBRID_ENABLED
+from .cascade import cascade_prefilter, CASCADE_ENABLED
+from .result_cache import get_corpus_version, get_cached_result, store_result, purge_result_cache
+from .llm import get_llm, LLM_BACKEND
+from .answer_cache import find_cached_answer, RAG_ANSWER_CACHE_ENABLED
+from .loaders import RequestLoaders
+from .context_builder import ContextSource, build_context
+from .knn import thresholded_knn
+from .pagination import (
+    PAGE_MAX_CANDIDATES, page_session_id, request_digest, encode_cursor, decode_cursor,
+    load_page_session, save_page_session,
+)
 from .models import Video, Transcript, RetrievalFeedback, Collection
 from .transcribe.gemini_client import GeminiTranscriber
 
@@ -25,10 +44,55 @@ router = APIRouter(prefix="/search", tags=["search"])
 
 # ========== Schemas ==========
 
+class SearchFilters(BaseModel):
+    sources: Optional[List[str]] = Field(default=None, description="Platforms to include, e.g. ['youtube', 'instagram']")
+    authors: Optional[List[str]] = Field(default=None, description="Creators to include (case-insensitive)")
+    hashtags: Optional[List[str]] = Field(default=None, description="Match videos with any of these hashtags ('#' optional)")
+    min_duration_sec: Optional[int] = Field(default=None, ge=0, description="Minimum video duration in seconds")
+    max_duration_sec: Optional[int] = Field(default=None, ge=0, description="Maximum video duration in seconds")
+    created_after: Optional[datetime] = Field(default=None, description="Only videos ingested at or after this time")
+    created_before: Optional[datetime] = Field(default=None, description="Only videos ingested before this time")
+
+    def to_sql_filters(self) -> Optional[Dict[str, Any]]:
+        """Non-empty fields for retrieval.build_video_filter (None if nothing is set)."""
+        filters = {k: v for k, v in self.model_dump().items() if v not in (None, [])}
+        return filters or None
+
+    def matches(self, video: Video) -> bool:
+        """Same predicate as the SQL filter, for videos that don't come from retrieval."""
+        def naive_utc(dt: datetime) -> datetime:
+            return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+        if self.sources and (video.source or "").lower() not in {s.strip().lower() for s in self.sources}:
+            return False
+        if self.authors and (video.author or "").lower() not in {a.strip().lower() for a in self.authors}:
+            return False
+        if self.hashtags:
+            wanted = {h.strip().lstrip("#").lower() for h in self.hashtags}
+            if not wanted & {str(h).lstrip("#").lower() for h in (video.hashtags or [])}:
+                return False
+        if self.min_duration_sec is not None and (video.duration_sec is None or video.duration_sec < self.min_duration_sec):
+            return False
+        if self.max_duration_sec is not None and (video.duration_sec is None or video.duration_sec > self.max_duration_sec):
+            return False
+        if self.created_after is not None and (video.created_at is None or video.created_at < naive_utc(self.created_after)):
+            return False
+        if self.created_before is not None and (video.created_at is None or video.created_at >= naive_utc(self.created_before)):
+            return False
+        return True
+
+
 class SearchRequest(BaseModel):
     query: str = Field(..., description="Search query text")
     k: int = Field(default=10, ge=1, le=100, description="Number of final results to return")
     k_ann: int = Field(default=50, ge=1, le=200, description="Number of candidates for ANN search (before reranking)")
+    mode: Literal["document", "chunks"] = Field(default="document", description="'document' (one vector per transcript) or 'chunks' (max-sim over transcript chunks)")
+    rerank_mode: Optional[Literal["document", "passage"]] = Field(default=None, description="Cross-encoder mode: 'document' or 'passage' (max over token windows); defaults to RERANK_MODE")
+    cascade: Optional[bool] = Field(default=None, description="Prefilter ANN candidates before the cross-encoder; defaults to CASCADE_ENABLED")
+    hybrid: Optional[bool] = Field(default=None, description="Fuse full-text and vector candidates with RRF; defaults to HYBRID_SEARCH")
+    filters: Optional[SearchFilters] = Field(default=None, description="Restrict results by source, author, duration, hashtags or date (applied in the ANN query)")
+    cursor: Optional[str] = Field(default=None, description="next_cursor from a previous response; returns the following k results")
+    exclude_video_ids: List[str] = Field(default=[], description="Videos to leave out of retrieval (applied in the ANN query)")
 
 
 class SearchHit(BaseModel):
@@ -43,10 +107,18 @@ class SearchHit(BaseModel):
     description: str | None = None
 
 
+class StageStat(BaseModel):
+    stage: str
+    candidates: int = Field(description="Candidates leaving this stage")
+    ms: float = Field(description="Wall time spent in this stage")
+
+
 class SearchResponse(BaseModel):
     query: str
     hits: List[SearchHit]
     total: int
+    stages: List[StageStat] = Field(default=[], description="Per-stage candidate counts and timings")
+    next_cursor: Optional[str] = Field(default=None, description="Pass as 'cursor' (same query and parameters) for the next page; null when there are no more results")
 
 
 class RAGRequest(BaseModel):
@@ -54,6 +126,8 @@ class RAGRequest(BaseModel):
     k_ann: int = Field(default=20, ge=1, le=100, description="Number of candidates to retrieve")
     k_final: int = Field(default=5, ge=1, le=20, description="Number of sources to use in final answer")
     similar_collection_ids: List[str] = Field(default=[], description="IDs of similar collections to pull feedback from")
+    filters: Optional[SearchFilters] = Field(default=None, description="Restrict sources by source, author, duration, hashtags or date")
+    use_answer_cache: Optional[bool] = Field(default=None, description="Reuse a saved collection's answer for a near-identical query; defaults to RAG_ANSWER_CACHE")
 
 
 class RAGSource(BaseModel):
@@ -74,138 +148,183 @@ class ExcludedVideo(BaseModel):
     source_reference: str | None = Field(default=None, description="Reference to collection or feedback source")
 
 
+class AnswerCacheHit(BaseModel):
+    collection_id: str
+    query: str = Field(description="Saved query the answer was generated for")
+    similarity: float = Field(description="Cosine similarity between the saved and the new query")
+    saved_at: str | None = None
+
+
 class RAGResponse(BaseModel):
     query: str
     answer: str = Field(description="AI-generated answer with inline citations")
     sources: List[RAGSource] = Field(description="Source videos used to generate the answer")
     excluded_videos: List[ExcludedVideo] = Field(default=[], description="Videos excluded from search (liked/disliked in collections)")
+    stages: List[StageStat] = Field(default=[], description="Per-stage timings (collection_feedback and similar_queries run concurrently, then search and hydrate)")
+    answer_cache: Optional[AnswerCacheHit] = Field(default=None, description="Set when the answer was reused from a saved collection (no LLM call)")
+
+
+# ========== Streaming Helpers ==========
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _ndjson(event: str, data: Dict[str, Any]) -> str:
+    return json.dumps({"event": event, **data}) + "\n"
+
+
+# Disable proxy buffering (nginx gateway) so events reach the client immediately
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 
 # ========== Search Endpoint ==========
 
-@router.post("/query", response_model=SearchResponse)
-def search_videos(payload: SearchRequest, db: Session = Depends(get_db)):
+def _record_stage(stages: List[StageStat], name: str, started: float, candidates: int):
+    stages.append(StageStat(stage=name, candidates=candidates, ms=(time.perf_counter() - started) * 1000.0))
+
+
+def _doc_to_hit(doc: Dict[str, Any], query: str, score: float) -> SearchHit:
+    # Use transcript_only for snippet generation (not the combined text),
+    # focused on the reranker's best passage or the best matching chunk
+    snippet = _generate_snippet(
+        doc.get("transcript_only", ""), query, max_length=200, span=_transcript_span(doc)
+    )
+    return SearchHit(
+        video_id=doc["video_id"],
+        title=doc["title"],
+        author=doc["author"],
+        url=doc["url"],
+        source=doc["source"],
+        description=doc["description"],
+        media_path=doc["media_path"],
+        score=score,
+        snippet=snippet
+    )
+
+
+async def _lookup_search_cache(payload: SearchRequest, db: AsyncSession) -> Tuple[Dict[str, Any], Optional[int], Optional[SearchResponse]]:
+    """Result cache lookup, tagged with the current corpus version."""
+    t0 = time.perf_counter()
+    cache_payload = payload.model_dump()
+    corpus_version = await get_corpus_version(db, "search")
+    cached = await get_cached_result("query", cache_payload, corpus_version)
+    if cached is None:
+        return cache_payload, corpus_version, None
+    response = SearchResponse(**cached)
+    response.stages = [StageStat(stage="cache", candidates=len(response.hits), ms=(time.perf_counter() - t0) * 1000.0)]
+    print(f"[search] Result cache hit (corpus v{corpus_version}), returning {len(response.hits)} results")
+    return cache_payload, corpus_version, response
+
+
+async def _retrieve_stage(
+    payload: SearchRequest,
+    db: AsyncSession,
+    stages: List[StageStat],
+    query_embedding: Optional[List[float]] = None,
+    k_ann: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], List[float]]:
     """
-    Two-stage semantic search: ANN retrieval → Cross-encoder reranking
+    Stage 1: embed the query and retrieve k_ann candidates (ANN or hybrid).
     
-    Process:
-    1. Stage 1 (ANN): Embed query and retrieve k_ann candidates using pgvector
-    2. Stage 2 (Rerank): Use cross-encoder to precisely rerank candidates
-    3. Return top-k final results with snippets
+    Returns:
+        (candidate docs, query embedding); pass the embedding back in to
+        skip re-embedding, and k_ann to retrieve deeper than payload.k_ann
     """
-    print(f"[search] ========== NEW SEARCH ==========")
-    print(f"[search] Query: '{payload.query}'")
-    print(f"[search] k_ann={payload.k_ann}, k_final={payload.k}")
-    
-    if not payload.query.strip():
-        return SearchResponse(query=payload.query, hits=[], total=0)
-    
-    # Stage 1: Generate query embedding
-    try:
-        print(f"[search] Stage 1: Generating query embedding...")
-        query_embedding = embed_text(payload.query)
-        print(f"[search] Embedding generated successfully")
-    except Exception as e:
-        print(f"[search][ERROR] Embedding failed: {e}")
-        raise HTTPException(500, f"Failed to generate query embedding: {e}")
+    if query_embedding is None:
+        t0 = time.perf_counter()
+        try:
+            print(f"[search] Stage 1: Generating query embedding...")
+            query_embedding = await embed_query_async(payload.query)
+            print(f"[search] Embedding generated successfully")
+        except Exception as e:
+            print(f"[search][ERROR] Embedding failed: {e}")
+            raise HTTPException(500, f"Failed to generate query embedding: {e}")
+        _record_stage(stages, "embed", t0, 0)
     
     # Stage 1: ANN search using pgvector (retrieve k_ann candidates)
-    print(f"[search] Stage 1: Performing ANN search for {payload.k_ann} candidates...")
-    sql = sql_text("""
-        SELECT 
-            t.video_id,
-            v.title,
-            v.author,
-            v.url,
-            v.source,
-            v.description,
-            v.media_path,
-            t.text,
-            (t.embedding <=> :query_vec) AS ann_distance,
-            1 - (t.embedding <=> :query_vec) AS similarity_score
-        FROM transcripts t
-        JOIN videos v ON t.video_id = v.id
-        WHERE t.embedding IS NOT NULL
-        ORDER BY t.embedding <=> :query_vec
-        LIMIT :limit
-    """)
-    
+    k_ann = k_ann or payload.k_ann
+    use_hybrid = HYBRID_ENABLED if payload.hybrid is None else payload.hybrid
+    filters = payload.filters.to_sql_filters() if payload.filters else None
+    print(f"[search] Stage 1: Performing ANN search for {k_ann} candidates (mode={payload.mode}, hybrid={use_hybrid}, "
+          f"filters={filters}, excluded={len(payload.exclude_video_ids)})...")
+    t0 = time.perf_counter()
     try:
-        # Optional: Set HNSW search parameter for better recall
-        try:
-            db.execute(sql_text("SET hnsw.ef_search = 80"))
-        except:
-            pass  # Ignore if HNSW not configured
-        
-        result = db.execute(
-            sql,
-            {"query_vec": json.dumps(query_embedding), "limit": payload.k_ann}
-        ).fetchall()
+        docs = await retrieve_candidates(
+            db, query_embedding, k_ann, mode=payload.mode,
+            query=payload.query, hybrid=use_hybrid, filters=filters,
+            exclude_video_ids=payload.exclude_video_ids,
+        )
     except Exception as e:
         print(f"[search][ERROR] Database query failed: {e}")
         raise HTTPException(500, f"Database search failed: {e}")
-    
-    print(f"[search] Stage 1: Retrieved {len(result)} candidates from ANN search")
-    
-    if not result:
-        print(f"[search] No results found")
-        return SearchResponse(query=payload.query, hits=[], total=0)
-    
-    # Convert to documents for reranking
-    docs = []
-    for row in result:
-        video_id, title, author, url, source, description, media_path, text, ann_dist, sim_score = row
-        
-        # Combine title, description, and transcript for better reranking
-        combined_text = ""
-        if title:
-            combined_text += f"Title: {title}\n\n"
-        if description:
-            combined_text += f"Description: {description}\n\n"
-        if text:
-            combined_text += f"Transcript: {text}"
-        
-        docs.append({
-            "video_id": video_id,
-            "title": title,
-            "author": author,
-            "url": url,
-            "source": source,
-            "description": description,
-            "media_path": media_path,
-            "text": combined_text,  # Use combined text for reranking
-            "transcript_only": text or "",  # Keep original transcript for snippets
-            "ann_distance": float(ann_dist),
-            "vector_similarity": float(sim_score)
-        })
+    _record_stage(stages, "hybrid" if use_hybrid else "ann", t0, len(docs))
+    
+    print(f"[search] Stage 1: Retrieved {len(docs)} candidates from ANN search")
+    return docs, query_embedding
+
+
+async def _rerank_docs(
+    payload: SearchRequest,
+    docs: List[Dict[str, Any]],
+    stages: List[StageStat],
+    cascade: Optional[bool] = None,
+) -> List[Dict[str, Any]]:
+    """Cascade prefilter and cross-encoder rerank; docs come back sorted with raw "rerank_score"."""
+    # Cascade: decide how many candidates are worth the cross-encoder
+    rerank_input = docs
+    use_cascade = CASCADE_ENABLED if payload.cascade is None else payload.cascade
+    if cascade is not None:
+        use_cascade = cascade
+    if use_cascade:
+        t0 = time.perf_counter()
+        rerank_input, cascade_stats = cascade_prefilter(payload.query, docs, payload.k)
+        _record_stage(stages, "cascade", t0, len(rerank_input))
+        print(f"[search] Cascade: kept {cascade_stats['kept']}/{cascade_stats['input']} candidates "
+              f"(gap_cut={cascade_stats['gap_cut']}, lexical_rescued={cascade_stats['lexical_rescued']})")
     
     # Stage 2: Cross-Encoder Reranking
     print(f"[search] Stage 2: Cross-encoder reranking...")
-    ranked_docs = rerank(payload.query, docs, text_key="text")
+    t0 = time.perf_counter()
+    ranked_docs = await rerank_async(payload.query, rerank_input, text_key="text", mode=payload.rerank_mode)
+    _record_stage(stages, "rerank", t0, len(ranked_docs))
     print(f"[search] Stage 2: Reranking complete")
+    return ranked_docs
+
+
+def _apply_softmax(ranked_docs: List[Dict[str, Any]], norm: Optional[float] = None) -> float:
+    """
+    Replace raw rerank scores with softmax scores (in place).
     
-    # Apply softmax to scores for better distribution
-    if ranked_docs:
-        import math
-        raw_scores = [d.get("rerank_score", 0.0) for d in ranked_docs]
-        
-        print(f"[search] Applying softmax to scores: raw range [{min(raw_scores):.4f}, {max(raw_scores):.4f}]")
-        
-        # Softmax: exp(score) / sum(exp(all_scores))
-        exp_scores = [math.exp(s) for s in raw_scores]
-        sum_exp = sum(exp_scores)
-        
-        for doc, exp_score in zip(ranked_docs, exp_scores):
-            raw_score = doc.get("rerank_score", 0.0)
-            softmax_score = exp_score / sum_exp
-            doc["rerank_score"] = softmax_score
-            print(f"[search]   video_id={doc['video_id'][:16]}: raw={raw_score:.4f} -> softmax={softmax_score:.4f} ({softmax_score*100:.1f}%)")
+    Args:
+        ranked_docs: Output of _rerank_docs
+        norm: Softmax denominator to reuse; later pages pass the first
+              page's so scores stay comparable across pages
+    
+    Returns:
+        The denominator used
+    """
+    if not ranked_docs:
+        return norm or 1.0
+    import math
+    raw_scores = [d.get("rerank_score", 0.0) for d in ranked_docs]
+    
+    print(f"[search] Applying softmax to scores: raw range [{min(raw_scores):.4f}, {max(raw_scores):.4f}]")
     
-    # Convert to SearchHit objects and take top-k
+    # Softmax: exp(score) / sum(exp(all_scores))
+    exp_scores = [math.exp(s) for s in raw_scores]
+    sum_exp = norm if norm else sum(exp_scores)
+    
+    for doc, exp_score in zip(ranked_docs, exp_scores):
+        doc["rerank_score"] = min(1.0, exp_score / sum_exp)
+    return sum_exp
+
+
+def _hits_stage(payload: SearchRequest, ranked_docs: List[Dict[str, Any]], stages: List[StageStat], limit: int) -> List[SearchHit]:
+    """Top `limit` ranked docs as SearchHits with snippets."""
+    t0 = time.perf_counter()
     hits = []
-    for i, doc in enumerate(ranked_docs[:payload.k], 1):
-        # Use transcript_only for snippet generation (not the combined text)
-        snippet = _generate_snippet(doc.get("transcript_only", ""), payload.query, max_length=200)
+    for i, doc in enumerate(ranked_docs[:limit], 1):
         rerank_score = doc.get("rerank_score", 0.0)
         
         title = doc.get('title') or 'Untitled'
@@ -213,118 +332,397 @@ def search_videos(payload: SearchRequest, db: Session = Depends(get_db)):
         
         print(f"[search] Result #{i}: video_id={doc['video_id'][:16]}..., rerank_score={rerank_score:.4f}, title={title_display}")
         
-        hits.append(SearchHit(
-            video_id=doc["video_id"],
-            title=doc["title"],
-            author=doc["author"],
-            url=doc["url"],
-            source=doc["source"],
-            description=doc["description"],
-            media_path=doc["media_path"],
-            score=rerank_score,  # Use rerank score as the final score
-            snippet=snippet
-        ))
+        hits.append(_doc_to_hit(doc, payload.query, rerank_score))  # Use rerank score as the final score
     
-    print(f"[search] Returning {len(hits)} final results")
-    print(f"[search] ========== SEARCH COMPLETE ==========\n")
+    _record_stage(stages, "snippets", t0, len(hits))
+    return hits
+
+
+# ========== Pagination ==========
+
+def _page_request(payload: SearchRequest) -> Dict[str, Any]:
+    """Request fields that define a page session (page size and cursor don't)."""
+    return payload.model_dump(exclude={"k", "cursor"})
+
+
+_RECORD_FIELDS = ("video_id", "title", "author", "url", "source", "description", "media_path")
+
+
+def _ranked_record(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Page session entry for a reranked doc: hit fields, score and snippet span (no transcript)."""
+    record = {field: doc.get(field) for field in _RECORD_FIELDS}
+    record["score"] = doc.get("rerank_score", 0.0)
+    record["span"] = _transcript_span(doc)
+    return record
+
+
+async def _build_page_session(
+    payload: SearchRequest,
+    db: AsyncSession,
+    stages: List[StageStat],
+    docs: Optional[List[Dict[str, Any]]] = None,
+    query_embedding: Optional[List[float]] = None,
+) -> Tuple[Dict[str, Any], List[SearchHit]]:
+    """
+    Run (or finish) the first-page pipeline and keep every reranked doc.
+    Snippets are built for the first page only.
     
+    Returns:
+        (page session, first page of hits)
+    """
+    if docs is None:
+        docs, query_embedding = await _retrieve_stage(payload, db, stages)
+    ranked_docs = await _rerank_docs(payload, docs, stages) if docs else []
+    score_norm = _apply_softmax(ranked_docs)
+    session = {
+        "query": payload.query,
+        "request": request_digest(_page_request(payload)),
+        "embedding": [float(x) for x in query_embedding] if query_embedding is not None else None,
+        "ranked": [_ranked_record(doc) for doc in ranked_docs],
+        "total": len(docs),
+        "score_norm": score_norm,
+        "ann_fetched": len(docs),
+        # Candidates the cascade dropped aren't ranked yet; extending the
+        # session reranks every retrieved doc that isn't, so keep it open
+        "exhausted": len(docs) < payload.k_ann and len(ranked_docs) == len(docs),
+    }
+    return session, _hits_stage(payload, ranked_docs, stages, payload.k)
+
+
+async def _extend_page_session(payload: SearchRequest, db: AsyncSession, session: Dict[str, Any], stages: List[StageStat]):
+    """Fetch the next ANN page, rerank the candidates not ranked yet and append them."""
+    depth = min(session["ann_fetched"] + payload.k_ann, PAGE_MAX_CANDIDATES)
+    docs, embedding = await _retrieve_stage(payload, db, stages, query_embedding=session["embedding"], k_ann=depth)
+    ranked_ids = {record["video_id"] for record in session["ranked"]}
+    unseen = [doc for doc in docs if doc["video_id"] not in ranked_ids]
+    print(f"[search] Page extend: ANN depth {session['ann_fetched']} -> {depth}, {len(unseen)} unranked candidates")
+    
+    if unseen:
+        # Explicitly requested results: no cascade cut on follow-up pages
+        ranked_docs = await _rerank_docs(payload, unseen, stages, cascade=False)
+        _apply_softmax(ranked_docs, norm=session["score_norm"])
+        session["ranked"].extend(_ranked_record(doc) for doc in ranked_docs)
+    
+    session["embedding"] = session["embedding"] or [float(x) for x in embedding]
+    session["total"] = max(session["total"], len(docs))
+    session["exhausted"] = len(docs) < depth or depth >= PAGE_MAX_CANDIDATES
+    session["ann_fetched"] = depth
+
+
+async def _session_page_hits(
+    payload: SearchRequest,
+    db: AsyncSession,
+    session: Dict[str, Any],
+    offset: int,
+    stages: List[StageStat],
+) -> List[SearchHit]:
+    """SearchHits for one page of a session; loads only that page's transcripts for snippets."""
+    t0 = time.perf_counter()
+    page = session["ranked"][offset:offset + payload.k]
+    transcripts = await RequestLoaders(db).transcripts.load_many([record["video_id"] for record in page])
+    hits = []
+    for i, record in enumerate(page, offset + 1):
+        transcript = transcripts.get(record["video_id"])
+        snippet = _generate_snippet(
+            (transcript.text if transcript else None) or "", payload.query, max_length=200,
+            span=tuple(record["span"]) if record["span"] else None,
+        )
+        print(f"[search] Result #{i}: video_id={record['video_id'][:16]}..., rerank_score={record['score']:.4f}")
+        hits.append(SearchHit(**{field: record[field] for field in _RECORD_FIELDS}, score=record["score"], snippet=snippet))
+    _record_stage(stages, "snippets", t0, len(hits))
+    return hits
+
+
+def _page_response(
+    payload: SearchRequest,
+    session_id: str,
+    session: Dict[str, Any],
+    offset: int,
+    hits: List[SearchHit],
+    stages: List[StageStat],
+) -> SearchResponse:
+    next_offset = offset + len(hits)
+    has_more = next_offset < len(session["ranked"]) or not session["exhausted"]
     return SearchResponse(
         query=payload.query,
         hits=hits,
-        total=len(result)
+        total=session["total"],
+        stages=stages,
+        next_cursor=encode_cursor(session_id, next_offset) if hits and has_more else None,
     )
 
 
-# ========== RAG Endpoint ==========
+async def _search_page(payload: SearchRequest, db: AsyncSession) -> SearchResponse:
+    """Serve a follow-up page from its page session, extending it as needed."""
+    try:
+        session_id, offset = decode_cursor(payload.cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    
+    stages: List[StageStat] = []
+    t0 = time.perf_counter()
+    session = await load_page_session(session_id)
+    if session is not None and session["request"] != request_digest(_page_request(payload)):
+        raise HTTPException(400, "Cursor belongs to a different query or search parameters")
+    if session is None:
+        print(f"[search] Page session {session_id[:8]} expired, rebuilding")
+        session, _ = await _build_page_session(payload, db, stages)
+    else:
+        _record_stage(stages, "page_cache", t0, len(session["ranked"]))
+    
+    while offset + payload.k > len(session["ranked"]) and not session["exhausted"]:
+        await _extend_page_session(payload, db, session, stages)
+    await save_page_session(session_id, session)
+    
+    hits = await _session_page_hits(payload, db, session, offset, stages)
+    print(f"[search] Page offset={offset}: {len(hits)} results, {len(session['ranked'])} ranked in session")
+    return _page_response(payload, session_id, session, offset, hits, stages)
 
-@router.post("/rag", response_model=RAGResponse)
-def rag_answer(payload: RAGRequest, db: Session = Depends(get_db)):
+
+@router.post("/query", response_model=SearchResponse)
+async def search_videos(payload: SearchRequest, db: AsyncSession = Depends(get_async_db)):
     """
-    Retrieval-Augmented Generation: Answer questions using video transcripts.
+    Two-stage semantic search: ANN retrieval → Cross-encoder reranking
     
-    Enhanced with collection feedback:
-    1. Pull liked videos from similar collections automatically
-    2. Exclude both liked and disliked videos from new searches (optimization)
-    3. Mark sources with their origin (search/collection/feedback)
-    4. Track excluded videos for transparency
-    5. Generate answer with Gemini using combined sources
+    Process:
+    1. Stage 1 (ANN): Embed query and retrieve k_ann candidates using pgvector
+    1b. Cascade: cheap lexical/distance-gap prefilter decides how many go on
+    2. Stage 2 (Rerank): Use cross-encoder to precisely rerank candidates
+    3. Return top-k final results with snippets
     """
-    print(f"[rag] ========== NEW RAG REQUEST ==========")
-    print(f"[rag] Query: '{payload.query}'")
-    print(f"[rag] k_ann={payload.k_ann}, k_final={payload.k_final}")
-    print(f"[rag] Similar collections: {len(payload.similar_collection_ids)}")
+    print(f"[search] ========== NEW SEARCH ==========")
+    print(f"[search] Query: '{payload.query}'")
+    print(f"[search] k_ann={payload.k_ann}, k_final={payload.k}")
     
     if not payload.query.strip():
-        raise HTTPException(400, "Query cannot be empty")
+        return SearchResponse(query=payload.query, hits=[], total=0)
     
-    # Step 0: Embed query for feedback search
-    query_embedding = embed_text(payload.query)
+    if payload.cursor:
+        return await _search_page(payload, db)
     
-    # Step 1: Process similar collections to get liked/disliked videos
-    liked_from_collections = {}  # video_id -> collection_query
-    disliked_from_collections = {}  # video_id -> collection_query
-    excluded_videos_list = []
+    cache_payload, corpus_version, cached = await _lookup_search_cache(payload, db)
+    if cached is not None:
+        return cached
     
-    if payload.similar_collection_ids:
-        print(f"[rag] Step 1: Processing {len(payload.similar_collection_ids)} similar collections for feedback...")
+    stages: List[StageStat] = []
+    docs, query_embedding = await _retrieve_stage(payload, db, stages)
+    if not docs:
+        print(f"[search] No results found")
+        return SearchResponse(query=payload.query, hits=[], total=0, stages=stages)
+    
+    # Every reranked candidate goes into the page session; the first k are returned
+    session, hits = await _build_page_session(payload, db, stages, docs, query_embedding)
+    session_id = page_session_id(_page_request(payload), corpus_version)
+    await save_page_session(session_id, session)
+    
+    print(f"[search] Returning {len(hits)} final results")
+    print(f"[search] Stages: " + ", ".join(f"{st.stage}={st.candidates}/{st.ms:.1f}ms" for st in stages))
+    print(f"[search] ========== SEARCH COMPLETE ==========\n")
+    
+    response = _page_response(payload, session_id, session, 0, hits, stages)
+    await store_result("query", cache_payload, corpus_version, response.model_dump())
+    return response
+
+
+@router.post("/query/stream")
+async def search_videos_stream(
+    payload: SearchRequest,
+    stream_format: Literal["ndjson", "sse"] = Query(default="ndjson", alias="format"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Progressive search: same pipeline as /search/query, streamed in two steps.
+    
+    Events (NDJSON lines {"event": ..., ...} or SSE "event:" frames):
+    - "ann":      top-k candidates in retrieval order, scored by vector
+                  similarity, sent as soon as pgvector returns
+    - "reranked": the final SearchResponse (cross-encoder order and scores),
+                  identical to /search/query's, including next_cursor
+    - "error":    {"detail": ...} if reranking fails
+    A result-cache hit or a request with a cursor (served from the page
+    session like /search/query) sends only "reranked".
+    """
+    emit = _sse if stream_format == "sse" else _ndjson
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    
+    def respond(events):
+        return StreamingResponse(events, media_type=media_type, headers=SSE_HEADERS)
+    
+    async def single(response: SearchResponse):
+        yield emit("reranked", response.model_dump())
+    
+    print(f"[search-stream] Query: '{payload.query}' (format={stream_format})")
+    if not payload.query.strip():
+        return respond(single(SearchResponse(query=payload.query, hits=[], total=0)))
+    
+    if payload.cursor:
+        return respond(single(await _search_page(payload, db)))
+    
+    # DB work happens before streaming starts; only reranking runs in the stream
+    cache_payload, corpus_version, cached = await _lookup_search_cache(payload, db)
+    if cached is not None:
+        return respond(single(cached))
+    
+    stages: List[StageStat] = []
+    docs, query_embedding = await _retrieve_stage(payload, db, stages)
+    if not docs:
+        return respond(single(SearchResponse(query=payload.query, hits=[], total=0, stages=stages)))
+    
+    async def events():
+        ann_hits = [_doc_to_hit(doc, payload.query, doc["vector_similarity"]) for doc in docs[:payload.k]]
+        yield emit("ann", {
+            "query": payload.query,
+            "hits": [hit.model_dump() for hit in ann_hits],
+            "total": len(docs),
+            "stages": [st.model_dump() for st in stages],
+        })
         
-        for collection_id in payload.similar_collection_ids:
-            collection = db.get(Collection, collection_id)
-            if not collection:
-                continue
-            
-            collection_query = collection.query
-            print(f"[rag]   Collection: '{collection_query}'")
-            
-            # Get all feedback for this collection's query
-            feedback_records = db.query(RetrievalFeedback).filter(
-                RetrievalFeedback.query == collection_query
-            ).all()
-            
-            for fb in feedback_records:
-                video_id = fb.video_id
-                feedback_type = fb.feedback
-                
-                if feedback_type == 'good':
-                    liked_from_collections[video_id] = collection_query
-                    print(f"[rag]     ✓ Liked: {video_id[:16]}...")
-                elif feedback_type == 'bad':
-                    disliked_from_collections[video_id] = collection_query
-                    print(f"[rag]     ✗ Disliked: {video_id[:16]}...")
-    
-    # Step 2: Also get feedback from similar queries (original logic)
-    print(f"[rag] Step 2: Finding similar past queries...")
-    similar_queries_result = find_similar_queries(
-        SearchRequest(query=payload.query, k=payload.k_final, k_ann=payload.k_ann),
-        db
-    )
+        try:
+            # Same page session as /search/query, so the shared cache entry
+            # carries a next_cursor either way
+            session, hits = await _build_page_session(payload, db, stages, docs, query_embedding)
+        except Exception as e:
+            print(f"[search-stream][ERROR] Reranking failed: {e}")
+            yield emit("error", {"detail": f"Reranking failed: {e}"})
+            return
+        
+        session_id = page_session_id(_page_request(payload), corpus_version)
+        await save_page_session(session_id, session)
+        response = _page_response(payload, session_id, session, 0, hits, stages)
+        await store_result("query", cache_payload, corpus_version, response.model_dump())
+        print(f"[search-stream] Stages: " + ", ".join(f"{st.stage}={st.candidates}/{st.ms:.1f}ms" for st in stages))
+        yield emit("reranked", response.model_dump())
+    
+    return respond(events())
+
+
+# ========== RAG Endpoint ==========
+
+NO_SOURCES_ANSWER = "I couldn't find any relevant information in the video database to answer your question."
+
+
+async def _timed(coro) -> Tuple[Any, float]:
+    """Await coro and return (result, elapsed ms)."""
+    t0 = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - t0) * 1000.0
+
+
+async def _collection_feedback(collection_ids: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Liked and disliked videos from similar collections, on its own session.
+    
+    Returns:
+        ({video_id: collection query} liked, {video_id: collection query} disliked)
+    """
+    liked: Dict[str, str] = {}
+    disliked: Dict[str, str] = {}
+    if not collection_ids:
+        return liked, disliked
+    
+    async with AsyncSessionLocal() as db:
+        collections = await RequestLoaders(db).collections.load_many(collection_ids)
+        collection_queries = [c.query for c in collections.values() if c is not None]
+        
+        # All feedback for these collections' queries in one round trip
+        feedback_by_query: Dict[str, List[RetrievalFeedback]] = {}
+        if collection_queries:
+            feedback_rows = (await db.execute(
+                select(RetrievalFeedback).where(RetrievalFeedback.query == any_(
+                    bindparam("queries", collection_queries, type_=ARRAY(String))
+                ))
+            )).scalars().all()
+            for fb in feedback_rows:
+                feedback_by_query.setdefault(fb.query, []).append(fb)
+    
+    # Walk collections in request order so later collections win, as before
+    for collection_id in collection_ids:
+        collection = collections.get(collection_id)
+        if not collection:
+            continue
+        
+        collection_query = collection.query
+        print(f"[rag]   Collection: '{collection_query}'")
+        
+        for fb in feedback_by_query.get(collection_query, []):
+            if fb.feedback == 'good':
+                liked[fb.video_id] = collection_query
+                print(f"[rag]     ✓ Liked: {fb.video_id[:16]}...")
+            elif fb.feedback == 'bad':
+                disliked[fb.video_id] = collection_query
+                print(f"[rag]     ✗ Disliked: {fb.video_id[:16]}...")
+    return liked, disliked
+
+
+async def _similar_query_feedback(payload: RAGRequest) -> Tuple[List[str], List[str]]:
+    """
+    Liked and disliked video ids from similar past queries, on its own session.
     
-    liked_from_queries = set()
-    disliked_from_queries = set()
+    Returns:
+        (liked, disliked) without duplicates, most similar query's videos first
+    """
+    async with AsyncSessionLocal() as db:
+        similar_queries_result = await find_similar_queries(
+            SearchRequest(query=payload.query, k=payload.k_final, k_ann=payload.k_ann),
+            db
+        )
     
+    liked: Dict[str, None] = {}
+    disliked: Dict[str, None] = {}
     for sim_query in similar_queries_result.similar_queries:
         print(f"[rag]   Similar query: '{sim_query.query}' (similarity={sim_query.similarity:.4f})")
-        liked_from_queries.update(sim_query.good_video_ids)
-        disliked_from_queries.update(sim_query.bad_video_ids)
+        liked.update(dict.fromkeys(sim_query.good_video_ids))
+        disliked.update(dict.fromkeys(sim_query.bad_video_ids))
+    return list(liked), list(disliked)
+
+
+async def _hydrate_feedback_videos(video_ids: set, transcript_ids: set) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, int]]:
+    """Videos (for titles) and transcripts (for liked sources) of feedback videos, on its own session."""
+    async with AsyncSessionLocal() as db:
+        loaders = RequestLoaders(db)
+        loaders.videos.prime(video_ids)
+        loaders.transcripts.prime(transcript_ids)
+        videos = await loaders.videos.load_many(video_ids)
+        transcripts = await loaders.transcripts.load_many(transcript_ids)
+    return videos, transcripts, loaders.stats()
+
+
+RAGFeedback = Tuple[Tuple[Dict[str, str], Dict[str, str]], Tuple[List[str], List[str]], List[StageStat]]
+
+
+async def _feedback_stage(payload: RAGRequest) -> RAGFeedback:
+    """
+    Feedback from similar collections and from similar past queries,
+    concurrently on separate sessions (both only depend on the query).
     
-    # Combine all exclusions (optimization: don't search for videos we already know about)
-    exclude_video_ids = (
-        set(liked_from_collections.keys()) | 
-        set(disliked_from_collections.keys()) |
-        liked_from_queries |
-        disliked_from_queries
+    Returns:
+        ((liked, disliked) from _collection_feedback,
+         (liked, disliked) from _similar_query_feedback, their StageStats)
+    """
+    print(f"[rag] Stage A: Collection feedback ({len(payload.similar_collection_ids)} collections) + similar queries...")
+    (collection_feedback, collections_ms), (query_feedback, queries_ms) = await asyncio.gather(
+        _timed(_collection_feedback(payload.similar_collection_ids)),
+        _timed(_similar_query_feedback(payload)),
     )
-    
-    print(f"[rag] Total exclusions from search: {len(exclude_video_ids)}")
-    print(f"[rag]   Liked from collections: {len(liked_from_collections)}")
-    print(f"[rag]   Disliked from collections: {len(disliked_from_collections)}")
-    print(f"[rag]   Liked from queries: {len(liked_from_queries)}")
-    print(f"[rag]   Disliked from queries: {len(disliked_from_queries)}")
-    
-    # Build excluded videos list for response
+    (liked_c, disliked_c), (liked_q, disliked_q) = collection_feedback, query_feedback
+    stages = [
+        StageStat(stage="collection_feedback", candidates=len(liked_c) + len(disliked_c), ms=collections_ms),
+        StageStat(stage="similar_queries", candidates=len(set(liked_q)) + len(set(disliked_q)), ms=queries_ms),
+    ]
+    return collection_feedback, query_feedback, stages
+
+
+def _excluded_videos(
+    liked_from_collections: Dict[str, str],
+    disliked_from_collections: Dict[str, str],
+    disliked_query_order: List[str],
+    videos: Dict[str, Any],
+) -> List[ExcludedVideo]:
+    """Videos kept out of the new search, with the feedback that excluded them."""
+    excluded = []
     for video_id, collection_query in liked_from_collections.items():
-        video = db.get(Video, video_id)
-        excluded_videos_list.append(ExcludedVideo(
+        video = videos.get(video_id)
+        excluded.append(ExcludedVideo(
             video_id=video_id,
             title=video.title if video else None,
             reason="liked_in_collection",
@@ -332,39 +730,110 @@ def rag_answer(payload: RAGRequest, db: Session = Depends(get_db)):
         ))
     
     for video_id, collection_query in disliked_from_collections.items():
-        video = db.get(Video, video_id)
-        excluded_videos_list.append(ExcludedVideo(
+        video = videos.get(video_id)
+        excluded.append(ExcludedVideo(
             video_id=video_id,
             title=video.title if video else None,
             reason="disliked_in_collection",
             source_reference=collection_query
         ))
     
-    for video_id in disliked_from_queries:
+    for video_id in disliked_query_order:
         if video_id not in disliked_from_collections:  # Avoid duplicates
-            video = db.get(Video, video_id)
-            excluded_videos_list.append(ExcludedVideo(
+            video = videos.get(video_id)
+            excluded.append(ExcludedVideo(
                 video_id=video_id,
                 title=video.title if video else None,
                 reason="bad_feedback",
                 source_reference="similar_query"
             ))
+    return excluded
+
+
+async def _prepare_rag(
+    payload: RAGRequest,
+    db: AsyncSession,
+    feedback: Optional[RAGFeedback] = None,
+) -> Tuple[Optional[str], List[RAGSource], List[ExcludedVideo], List[StageStat]]:
+    """
+    Resolve sources and build the generation prompt for a RAG request.
     
-    # Step 3: Perform new search (excluding already-known videos)
-    print(f"[rag] Step 3: Performing search (excluding {len(exclude_video_ids)} videos)...")
-    search_req = SearchRequest(query=payload.query, k=payload.k_final * 2, k_ann=payload.k_ann)
-    search_result = search_videos(search_req, db)
+    Enhanced with collection feedback:
+    1. Pull liked videos from similar collections automatically
+    2. Exclude both liked and disliked videos from new searches (optimization)
+    3. Mark sources with their origin (search/collection/feedback)
+    4. Track excluded videos for transparency
+    
+    Collection feedback and similar-query feedback run concurrently on
+    separate sessions; the search (which needs their exclusions) then runs
+    next to the hydration of the feedback videos. Sources are merged in
+    the same priority order as before. `feedback` is _feedback_stage's
+    result when the caller already has it (answer cache miss).
+    
+    Returns:
+        (prompt, sources, excluded videos, per-stage timings); prompt is
+        None when no sources were found
+    """
+    print(f"[rag] ========== NEW RAG REQUEST ==========")
+    print(f"[rag] Query: '{payload.query}'")
+    print(f"[rag] k_ann={payload.k_ann}, k_final={payload.k_final}")
+    print(f"[rag] Similar collections: {len(payload.similar_collection_ids)}")
+    
+    if not payload.query.strip():
+        raise HTTPException(400, "Query cannot be empty")
+    
+    # Stage A (concurrent, separate sessions): feedback from similar collections
+    # and from similar past queries
+    collection_feedback, query_feedback, feedback_stages = feedback or await _feedback_stage(payload)
+    stages: List[StageStat] = list(feedback_stages)
+    liked_from_collections, disliked_from_collections = collection_feedback  # video_id -> collection_query
+    # Ordered lists keep the merge below deterministic; sets for membership
+    liked_query_order, disliked_query_order = query_feedback
+    liked_from_queries, disliked_from_queries = set(liked_query_order), set(disliked_query_order)
+    
+    # Combine all exclusions (optimization: don't search for videos we already know about)
+    exclude_video_ids = (
+        set(liked_from_collections.keys()) | 
+        set(disliked_from_collections.keys()) |
+        liked_from_queries |
+        disliked_from_queries
+    )
+    
+    print(f"[rag] Total exclusions from search: {len(exclude_video_ids)}")
+    print(f"[rag]   Liked from collections: {len(liked_from_collections)}")
+    print(f"[rag]   Disliked from collections: {len(disliked_from_collections)}")
+    print(f"[rag]   Liked from queries: {len(liked_from_queries)}")
+    print(f"[rag]   Disliked from queries: {len(disliked_from_queries)}")
+    
+    # Stage B (concurrent): new search (excluded videos are dropped inside the ANN
+    # query, so the reranker only scores eligible candidates and k_final of them
+    # come back) and hydration of the feedback videos on a separate session
+    print(f"[rag] Stage B: Search (excluding {len(exclude_video_ids)} videos) + feedback hydration...")
+    search_req = SearchRequest(
+        query=payload.query, k=payload.k_final, k_ann=payload.k_ann,
+        filters=payload.filters, exclude_video_ids=sorted(exclude_video_ids),
+    )
+    (search_result, search_ms), ((videos, transcripts, hydrate_stats), hydrate_ms) = await asyncio.gather(
+        _timed(search_videos(search_req, db)),
+        _timed(_hydrate_feedback_videos(exclude_video_ids, liked_from_collections.keys() | liked_from_queries)),
+    )
+    stages.append(StageStat(stage="search", candidates=len(search_result.hits), ms=search_ms))
+    stages.append(StageStat(stage="hydrate", candidates=len(videos), ms=hydrate_ms))
     
-    # Filter out excluded videos
     filtered_hits = [hit for hit in search_result.hits if hit.video_id not in exclude_video_ids]
-    print(f"[rag]   Filtered to {len(filtered_hits)} new results (from {len(search_result.hits)} original)")
+    print(f"[rag]   {len(filtered_hits)} new results from search")
+    
+    loaders = RequestLoaders(db)
+    
+    # Build excluded videos list for response
+    excluded_videos_list = _excluded_videos(liked_from_collections, disliked_from_collections, disliked_query_order, videos)
     
     # Step 4: Fetch liked videos from collections to include in context
     sources_from_collections = []
     for video_id, collection_query in liked_from_collections.items():
-        video = db.get(Video, video_id)
-        transcript = db.get(Transcript, video_id)
-        if video and transcript:
+        video = videos.get(video_id)
+        transcript = transcripts.get(video_id)
+        if video and transcript and (not payload.filters or payload.filters.matches(video)):
             transcript_text = transcript.text or ''
             snippet = transcript_text[:200] + "..." if len(transcript_text) > 200 else transcript_text
             sources_from_collections.append({
@@ -387,12 +856,12 @@ def rag_answer(payload: RAGRequest, db: Session = Depends(get_db)):
     
     # Step 5: Fetch liked videos from similar queries
     sources_from_queries = []
-    for video_id in liked_from_queries:
+    for video_id in liked_query_order:
         if video_id in liked_from_collections:
             continue  # Already included
-        video = db.get(Video, video_id)
-        transcript = db.get(Transcript, video_id)
-        if video and transcript:
+        video = videos.get(video_id)
+        transcript = transcripts.get(video_id)
+        if video and transcript and (not payload.filters or payload.filters.matches(video)):
             transcript_text = transcript.text or ''
             snippet = transcript_text[:200] + "..." if len(transcript_text) > 200 else transcript_text
             sources_from_queries.append({
@@ -437,20 +906,20 @@ def rag_answer(payload: RAGRequest, db: Session = Depends(get_db)):
     
     if not top_sources:
         print(f"[rag] No results found after filtering")
-        return RAGResponse(
-            query=payload.query,
-            answer="I couldn't find any relevant information in the video database to answer your question.",
-            sources=[],
-            excluded_videos=excluded_videos_list
-        )
+        return None, [], excluded_videos_list, stages
     
     print(f"[rag] Using {len(top_sources)} sources for answer generation")
     print(f"[rag]   From collections: {len(sources_from_collections)}")
     print(f"[rag]   From queries: {len(sources_from_queries)}")
     print(f"[rag]   From new search: {len([s for s in top_sources if s['source_type'] == 'search'])}")
     
-    # Step 6: Build context with numbered sources
-    context_parts = []
+    # Step 6: Build context with numbered sources (feedback transcripts are already hydrated)
+    t0 = time.perf_counter()
+    top_transcripts = dict(transcripts)
+    top_transcripts.update(await loaders.transcripts.load_many(
+        src['hit'].video_id for src in top_sources if src['hit'].video_id not in top_transcripts
+    ))
+    context_sources = []
     rag_sources = []
     
     for idx, src_data in enumerate(top_sources, 1):
@@ -469,27 +938,21 @@ def rag_answer(payload: RAGRequest, db: Session = Depends(get_db)):
         
         print(f"[rag] Source [{idx}]: video_id={hit.video_id[:16]}..., score={hit.score:.4f}, title={title_display}, type={source_type}{source_marker}")
         
-        # Get full transcript
-        transcript_obj = db.get(Transcript, hit.video_id)
-        transcript_text = hit.snippet  # default (fallback if no transcript found)
-        
-        if transcript_obj:
-            text_val = getattr(transcript_obj, 'text', None)
-            if text_val is not None:
-                transcript_text = str(text_val)
-                print(f"[rag]   Using full transcript ({len(transcript_text)} chars)")
-            else:
-                print(f"[rag]   WARNING: Transcript object exists but has no text, using snippet ({len(transcript_text)} chars)")
-        else:
-            print(f"[rag]   WARNING: No transcript found for video {hit.video_id[:16]}..., using snippet ({len(transcript_text)} chars)")
-        
-        # Truncate very long transcripts
-        original_len = len(transcript_text)
-        if len(transcript_text) > 3000:
-            transcript_text = transcript_text[:3000] + "..."
-            print(f"[rag]   Truncated transcript from {original_len} to 3000 chars")
+        # Summary + transcript for the context builder; the snippet is the fallback
+        transcript_obj = top_transcripts.get(hit.video_id)
+        summary = getattr(transcript_obj, 'summary', None) if transcript_obj else None
+        text_val = getattr(transcript_obj, 'text', None) if transcript_obj else None
+        if transcript_obj is None:
+            print(f"[rag]   WARNING: No transcript found for video {hit.video_id[:16]}..., using snippet ({len(hit.snippet)} chars)")
+        elif text_val is None and not summary:
+            print(f"[rag]   WARNING: Transcript object exists but has no text, using snippet ({len(hit.snippet)} chars)")
         
-        context_parts.append(f"[Source {idx}] {hit.title or 'Untitled'}\n{transcript_text}\n")
+        context_sources.append(ContextSource(
+            title=hit.title,
+            summary=summary,
+            transcript=str(text_val) if text_val is not None else None,
+            fallback=hit.snippet,
+        ))
         
         rag_sources.append(RAGSource(
             video_id=hit.video_id,
@@ -502,16 +965,19 @@ def rag_answer(payload: RAGRequest, db: Session = Depends(get_db)):
             source_reference=reference
         ))
     
-    context = "\n\n".join(context_parts)
-    print(f"[rag] Built context with {len(context)} characters from {len(rag_sources)} sources")
+    context, context_stats = build_context(payload.query, context_sources)
+    print(f"[rag] Built context with ~{context_stats['tokens']} tokens ({len(context)} chars) from {len(rag_sources)} sources: "
+          f"{context_stats['summaries']} summaries, {context_stats['passages']} passages")
+    _record_stage(stages, "context", t0, len(rag_sources))
+    print(f"[rag] Loader round trips: hydrate={hydrate_stats}, context={loaders.stats()}")
+    print(f"[rag] Stages: " + ", ".join(f"{st.stage}={st.candidates}/{st.ms:.1f}ms" for st in stages))
     
-    # Step 7: Generate answer with Gemini
-    print(f"[rag] Generating answer with Gemini...")
+    # Step 7: Prompt for answer generation
     prompt = f"""You are a helpful assistant that answers questions based on video transcripts.
 
 Question: {payload.query}
 
-Context (from video transcripts):
+Context (video summaries and relevant transcript excerpts):
 {context}
 
 Instructions:
@@ -522,22 +988,115 @@ Instructions:
 - Use natural language and proper formatting
 
 Answer:"""
+    return prompt, rag_sources, excluded_videos_list, stages
+
+
+CachedRAGAnswer = Tuple[str, List[RAGSource], List[ExcludedVideo], AnswerCacheHit, List[StageStat]]
+
+
+async def _cached_rag_answer(payload: RAGRequest, db: AsyncSession) -> Tuple[Optional[CachedRAGAnswer], Optional[RAGFeedback]]:
+    """
+    Stored answer of a saved collection for a near-identical query.
+    
+    Returns:
+        ((answer, sources, excluded videos, cache hit, stages) or None on a
+        miss, stale or disliked sources or fewer sources than k_final;
+        _feedback_stage's result, to pass on to _prepare_rag, or None).
+        (None, None) when the cache is disabled or the request is filtered.
+    """
+    use_cache = RAG_ANSWER_CACHE_ENABLED if payload.use_answer_cache is None else payload.use_answer_cache
+    if not use_cache or payload.filters or not payload.query.strip():
+        return None, None
     
+    t0 = time.perf_counter()
+    feedback = None
     try:
-        # Use Gemini for generation (reuse existing client)
-        import os
-        if not os.getenv("GEMINI_API_KEY"):
-            raise HTTPException(500, "GEMINI_API_KEY not set")
-        
-        from google import genai
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+        # The feedback is needed either way: it vetoes cached sources here
+        # and feeds _prepare_rag on a miss
+        query_embedding, feedback = await asyncio.gather(
+            embed_query_async(payload.query),
+            _feedback_stage(payload),
         )
-        
-        answer = getattr(response, "text", None) or "Failed to generate answer."
+        (liked_from_collections, disliked_from_collections), (_, disliked_query_order), feedback_stages = feedback
+        cached = await find_cached_answer(
+            db,
+            query_embedding,
+            min_sources=payload.k_final,
+            disliked_video_ids=set(disliked_from_collections) | set(disliked_query_order),
+        )
+    except Exception as e:
+        print(f"[rag][WARN] Answer cache lookup failed: {e}")
+        await db.rollback()
+        return None, feedback
+    if cached is None:
+        return None, feedback
+    
+    # Cited videos in citation order; snippets and scores as saved with the collection
+    saved_sources = {s.get("video_id"): s for s in cached["sources"] if isinstance(s, dict)}
+    videos = await RequestLoaders(db).videos.load_many(
+        set(cached["video_ids"]) | set(liked_from_collections) | set(disliked_from_collections) | set(disliked_query_order)
+    )
+    rag_sources = []
+    for video_id in cached["video_ids"]:
+        video = videos.get(video_id)
+        saved = saved_sources.get(video_id, {})
+        rag_sources.append(RAGSource(
+            video_id=video_id,
+            title=video.title if video else saved.get("title"),
+            author=video.author if video else saved.get("author"),
+            url=video.url if video else saved.get("url") or "",
+            snippet=saved.get("snippet") or "",
+            score=float(saved["score"]) if saved.get("score") is not None else 1.0,
+            source_type="collection",
+            source_reference=cached["query"],
+        ))
+    excluded = _excluded_videos(liked_from_collections, disliked_from_collections, disliked_query_order, videos)
+    
+    hit = AnswerCacheHit(
+        collection_id=cached["collection_id"],
+        query=cached["query"],
+        similarity=cached["similarity"],
+        saved_at=cached["created_at"].isoformat() if cached["created_at"] else None,
+    )
+    stages = list(feedback_stages)
+    stages.append(StageStat(stage="answer_cache", candidates=len(rag_sources), ms=(time.perf_counter() - t0) * 1000.0))
+    return (cached["answer"], rag_sources, excluded, hit, stages), feedback
+
+
+@router.post("/rag", response_model=RAGResponse)
+async def rag_answer(payload: RAGRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieval-Augmented Generation: Answer questions using video transcripts.
+    Sources come from collection feedback, similar-query feedback and a new
+    search (see _prepare_rag); the answer is generated with LLM_BACKEND.
+    """
+    cached, feedback = await _cached_rag_answer(payload, db)
+    if cached is not None:
+        answer, rag_sources, excluded_videos_list, cache_hit, stages = cached
+        print(f"[rag] Answer cache hit: reusing collection '{cache_hit.query}' ({len(rag_sources)} sources, no LLM call)")
+        return RAGResponse(
+            query=payload.query,
+            answer=answer,
+            sources=rag_sources,
+            excluded_videos=excluded_videos_list,
+            stages=stages,
+            answer_cache=cache_hit
+        )
+    
+    prompt, rag_sources, excluded_videos_list, stages = await _prepare_rag(payload, db, feedback)
+    if prompt is None:
+        return RAGResponse(
+            query=payload.query,
+            answer=NO_SOURCES_ANSWER,
+            sources=[],
+            excluded_videos=excluded_videos_list,
+            stages=stages
+        )
+    
+    print(f"[rag] Generating answer with {LLM_BACKEND}...")
+    t0 = time.perf_counter()
+    try:
+        answer = await get_llm().generate(prompt) or "Failed to generate answer."
         print(f"[rag] Answer generated successfully ({len(answer)} chars)")
         
     except Exception as e:
@@ -546,6 +1105,8 @@ Answer:"""
         traceback.print_exc()
         raise HTTPException(500, f"Failed to generate answer: {e}")
     
+    _record_stage(stages, "generate", t0, len(rag_sources))
+    
     print(f"[rag] Returning answer with {len(rag_sources)} sources and {len(excluded_videos_list)} excluded videos")
     print(f"[rag] ========== RAG COMPLETE ==========\n")
     
@@ -553,20 +1114,134 @@ Answer:"""
         query=payload.query,
         answer=answer,
         sources=rag_sources,
-        excluded_videos=excluded_videos_list
+        excluded_videos=excluded_videos_list,
+        stages=stages
     )
 
 
+_CITATION_RE = re.compile(r"\[(\d+)\]")
+
+
+def _citation_map(answer: str, sources: List[RAGSource]) -> Dict[str, Dict[str, Any]]:
+    """Map each [n] cited in the answer to its source (1-based, like the prompt)."""
+    cited = {}
+    for match in _CITATION_RE.finditer(answer):
+        n = int(match.group(1))
+        if 1 <= n <= len(sources) and str(n) not in cited:
+            src = sources[n - 1]
+            cited[str(n)] = {"video_id": src.video_id, "title": src.title, "url": src.url}
+    return cited
+
+
+@router.post("/rag/stream")
+async def rag_answer_stream(payload: RAGRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Streaming RAG over Server-Sent Events.
+    
+    Events, in order:
+    - "sources": resolved sources and excluded videos (before generation starts)
+    - "token":   {"text": ...} answer fragments as the model produces them
+    - "done":    {"answer": full text, "citations": {"1": {video_id, title, url}, ...}}
+    - "error":   {"detail": ...} if generation fails mid-stream
+    An answer cache hit sends the stored answer as a single "token" and sets
+    "answer_cache" on "sources" and "done".
+    """
+    # All DB work happens here, before the response starts streaming
+    cached, feedback = await _cached_rag_answer(payload, db)
+    if cached is not None:
+        answer, rag_sources, excluded_videos_list, cache_hit, stages = cached
+        
+        async def cached_events():
+            yield _sse("sources", {
+                "query": payload.query,
+                "sources": [s.model_dump() for s in rag_sources],
+                "excluded_videos": [e.model_dump() for e in excluded_videos_list],
+                "stages": [st.model_dump() for st in stages],
+                "answer_cache": cache_hit.model_dump(),
+            })
+            yield _sse("token", {"text": answer})
+            yield _sse("done", {
+                "answer": answer,
+                "citations": _citation_map(answer, rag_sources),
+                "answer_cache": cache_hit.model_dump(),
+            })
+        
+        print(f"[rag-stream] Answer cache hit: reusing collection '{cache_hit.query}'")
+        return StreamingResponse(cached_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+    
+    prompt, rag_sources, excluded_videos_list, stages = await _prepare_rag(payload, db, feedback)
+    
+    async def events():
+        yield _sse("sources", {
+            "query": payload.query,
+            "sources": [s.model_dump() for s in rag_sources],
+            "excluded_videos": [e.model_dump() for e in excluded_videos_list],
+            "stages": [st.model_dump() for st in stages],
+        })
+        if prompt is None:
+            yield _sse("token", {"text": NO_SOURCES_ANSWER})
+            yield _sse("done", {"answer": NO_SOURCES_ANSWER, "citations": {}})
+            return
+        
+        parts = []
+        try:
+            async for token in get_llm().stream(prompt):
+                parts.append(token)
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            print(f"[rag-stream][ERROR] Generation failed: {e}")
+            yield _sse("error", {"detail": f"Failed to generate answer: {e}"})
+            return
+        
+        answer = "".join(parts)
+        print(f"[rag-stream] Streamed answer ({len(answer)} chars, {len(parts)} chunks)")
+        yield _sse("done", {"answer": answer, "citations": _citation_map(answer, rag_sources)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 # ========== Helper Functions ==========
 
-def _generate_snippet(text: str, query: str, max_length: int = 200) -> str:
+def _transcript_span(doc: Dict[str, Any]) -> Optional[tuple]:
+    """
+    Best-matching region of doc["transcript_only"] as (start, end), if known.
+
+    Prefers the reranker's best passage window (offsets into the combined
+    text, shifted by transcript_offset), then the best ANN chunk.
+    """
+    if doc.get("best_window"):
+        offset = doc.get("transcript_offset", 0)
+        start, end = doc["best_window"]
+        start, end = max(0, start - offset), max(0, end - offset)
+        if end > start:
+            return (start, end)
+    if doc.get("chunk_span"):
+        return tuple(doc["chunk_span"])
+    return None
+
+
+def _generate_snippet(text: str, query: str, max_length: int = 200, span: Optional[tuple] = None) -> str:
     """
     Extract a relevant snippet from text based on query terms.
     Tries to find text around query keywords.
+
+    If span=(start, end) is given (e.g. the reranker's best passage), the
+    snippet is taken from that region of the text.
     """
     if not text:
         return ""
     
+    if span:
+        start, end = span
+        region = text[start:end].strip()
+        if region:
+            snippet = _generate_snippet(region, query, max_length)
+            if start > 0 and not snippet.startswith("..."):
+                snippet = "..." + snippet
+            if end < len(text.rstrip()) and not snippet.endswith("..."):
+                snippet = snippet + "..."
+            return snippet
+    
     # Clean text
     text = text.strip()
     if len(text) <= max_length:
@@ -668,8 +1343,62 @@ class SimilarQueriesResponse(BaseModel):
     similar_queries: List[SimilarQuery]
 
 
+_REFRESH_PROFILE_SQL = sql_text("""
+    INSERT INTO query_feedback_profile (query, query_embedding, good_video_ids, bad_video_ids, updated_at)
+    SELECT
+        :query,
+        CAST(:query_vec AS vector),
+        COALESCE(array_agg(video_id) FILTER (WHERE feedback = 'good'), '{}'),
+        COALESCE(array_agg(video_id) FILTER (WHERE feedback = 'bad'), '{}'),
+        CURRENT_TIMESTAMP
+    FROM (
+        SELECT DISTINCT ON (video_id) video_id, feedback
+        FROM retrieval_feedback
+        WHERE query = :query
+        ORDER BY video_id, created_at DESC
+    ) latest
+    ON CONFLICT (query) DO UPDATE SET
+        query_embedding = COALESCE(EXCLUDED.query_embedding, query_feedback_profile.query_embedding),
+        good_video_ids = EXCLUDED.good_video_ids,
+        bad_video_ids = EXCLUDED.bad_video_ids,
+        updated_at = EXCLUDED.updated_at
+""")
+
+_PRUNE_PROFILE_SQL = sql_text("""
+    DELETE FROM query_feedback_profile
+    WHERE query = :query
+        AND cardinality(good_video_ids) = 0
+        AND cardinality(bad_video_ids) = 0
+""")
+
+
+async def _lock_feedback_query(db: AsyncSession, query: str):
+    """
+    Serialize feedback writes for one query until the transaction ends.
+    
+    Taken before the feedback row is written, so a concurrent save for the
+    same query waits for this commit and its profile recompute then sees
+    both rows (otherwise the last commit overwrites the other's video).
+    """
+    await db.execute(sql_text("SELECT pg_advisory_xact_lock(hashtext(:query))"), {"query": query})
+
+
+async def _refresh_feedback_profile(db: AsyncSession, query: str, query_embedding: Optional[List[float]] = None):
+    """
+    Recompute one query's row in query_feedback_profile from its feedback.
+    Runs in the caller's transaction, after the feedback write is flushed;
+    the caller must hold _lock_feedback_query for the query.
+    """
+    await db.flush()
+    await db.execute(_REFRESH_PROFILE_SQL, {
+        "query": query,
+        "query_vec": vector_param(query_embedding) if query_embedding is not None else None,
+    })
+    await db.execute(_PRUNE_PROFILE_SQL, {"query": query})
+
+
 @router.post("/feedback", status_code=201)
-def save_retrieval_feedback(payload: FeedbackRequest, db: Session = Depends(get_db)):
+async def save_retrieval_feedback(payload: FeedbackRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Save feedback (good/bad) for a retrieved source.
     This helps the system learn which sources are relevant for specific queries.
@@ -682,17 +1411,20 @@ def save_retrieval_feedback(payload: FeedbackRequest, db: Session = Depends(get_
     
     # Generate query embedding
     try:
-        query_embedding = embed_text(payload.query)
+        query_embedding = await embed_query_async(payload.query)
     except Exception as e:
         print(f"[feedback][ERROR] Failed to generate query embedding: {e}")
         raise HTTPException(500, f"Failed to generate query embedding: {e}")
     
     # Check if feedback already exists for this query+video combination
     try:
-        existing_feedback = db.query(RetrievalFeedback).filter(
-            RetrievalFeedback.query == payload.query,
-            RetrievalFeedback.video_id == payload.video_id
-        ).first()
+        await _lock_feedback_query(db, payload.query)
+        existing_feedback = (await db.execute(
+            select(RetrievalFeedback).where(
+                RetrievalFeedback.query == payload.query,
+                RetrievalFeedback.video_id == payload.video_id
+            )
+        )).scalars().first()
         
         if existing_feedback:
             # Update existing feedback
@@ -710,11 +1442,12 @@ def save_retrieval_feedback(payload: FeedbackRequest, db: Session = Depends(get_
             )
             db.add(feedback)
         
-        db.commit()
+        await _refresh_feedback_profile(db, payload.query, query_embedding)
+        await db.commit()
         print(f"[feedback] Feedback saved successfully")
         return {"status": "success", "message": "Feedback saved"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"[feedback][ERROR] Failed to save feedback: {e}")
         import traceback
         traceback.print_exc()
@@ -727,7 +1460,7 @@ class DeleteFeedbackRequest(BaseModel):
 
 
 @router.delete("/feedback", status_code=200)
-def delete_retrieval_feedback(payload: DeleteFeedbackRequest, db: Session = Depends(get_db)):
+async def delete_retrieval_feedback(payload: DeleteFeedbackRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Delete feedback for a specific query+video combination.
     Used when user wants to unselect/remove their feedback.
@@ -735,13 +1468,17 @@ def delete_retrieval_feedback(payload: DeleteFeedbackRequest, db: Session = Depe
     print(f"[feedback-delete] Deleting feedback: query='{payload.query}', video_id={payload.video_id}")
     
     try:
+        await _lock_feedback_query(db, payload.query)
         # Find and delete the feedback
-        deleted_count = db.query(RetrievalFeedback).filter(
-            RetrievalFeedback.query == payload.query,
-            RetrievalFeedback.video_id == payload.video_id
-        ).delete()
+        deleted_count = (await db.execute(
+            delete(RetrievalFeedback).where(
+                RetrievalFeedback.query == payload.query,
+                RetrievalFeedback.video_id == payload.video_id
+            )
+        )).rowcount
         
-        db.commit()
+        await _refresh_feedback_profile(db, payload.query)
+        await db.commit()
         
         if deleted_count > 0:
             print(f"[feedback-delete] Successfully deleted {deleted_count} feedback record(s)")
@@ -750,7 +1487,7 @@ def delete_retrieval_feedback(payload: DeleteFeedbackRequest, db: Session = Depe
             print(f"[feedback-delete] No feedback found to delete")
             return {"status": "success", "message": "No feedback found", "deleted": 0}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"[feedback-delete][ERROR] Failed to delete feedback: {e}")
         import traceback
         traceback.print_exc()
@@ -773,7 +1510,7 @@ class GetFeedbackResponse(BaseModel):
 
 
 @router.post("/feedback/get", response_model=GetFeedbackResponse)
-def get_retrieval_feedback(payload: GetFeedbackRequest, db: Session = Depends(get_db)):
+async def get_retrieval_feedback(payload: GetFeedbackRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Get existing feedback for specific videos and query.
     Returns list of video IDs with their feedback status.
@@ -793,10 +1530,10 @@ def get_retrieval_feedback(payload: GetFeedbackRequest, db: Session = Depends(ge
             ORDER BY video_id, created_at DESC
         """)
         
-        result = db.execute(
+        result = (await db.execute(
             sql,
             {"query": payload.query, "video_ids": payload.video_ids}
-        ).fetchall()
+        )).fetchall()
         
         feedback_list = [
             VideoFeedback(video_id=video_id, feedback=feedback)
@@ -812,7 +1549,7 @@ def get_retrieval_feedback(payload: GetFeedbackRequest, db: Session = Depends(ge
 
 
 @router.post("/similar-queries", response_model=SimilarQueriesResponse)
-def find_similar_queries(payload: SearchRequest, db: Session = Depends(get_db)):
+async def find_similar_queries(payload: SearchRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Find similar past queries based on semantic similarity.
     Returns queries with their good/bad source feedback.
@@ -824,28 +1561,23 @@ def find_similar_queries(payload: SearchRequest, db: Session = Depends(get_db)):
     
     # Generate query embedding
     try:
-        query_embedding = embed_text(payload.query)
+        query_embedding = await embed_query_async(payload.query)
     except Exception as e:
         print(f"[similar-queries][ERROR] Failed to generate query embedding: {e}")
         raise HTTPException(500, f"Failed to generate query embedding: {e}")
     
-    # Find similar queries (similarity > 0.85 threshold)
-    sql = sql_text("""
-        SELECT DISTINCT
-            query,
-            1 - (query_embedding <=> :query_vec) AS similarity
-        FROM retrieval_feedback
-        WHERE query_embedding IS NOT NULL
-            AND 1 - (query_embedding <=> :query_vec) > 0.85
-        ORDER BY similarity DESC
-        LIMIT 5
-    """)
-    
+    # Find similar queries (similarity > 0.85 threshold): one index-ordered
+    # kNN over the per-query feedback profiles, which carry the good/bad ids
     try:
-        result = db.execute(
-            sql,
-            {"query_vec": json.dumps(query_embedding)}
-        ).fetchall()
+        result = await thresholded_knn(
+            db,
+            table="query_feedback_profile",
+            embedding_column="query_embedding",
+            columns=["query", "good_video_ids", "bad_video_ids"],
+            query_vec=vector_param(query_embedding),
+            min_similarity=0.85,
+            limit=5,
+        )
     except Exception as e:
         print(f"[similar-queries][ERROR] Database query failed: {e}")
         raise HTTPException(500, f"Failed to find similar queries: {e}")
@@ -854,28 +1586,18 @@ def find_similar_queries(payload: SearchRequest, db: Session = Depends(get_db)):
     
     similar_queries = []
     for row in result:
-        query_text, similarity = row
+        query_text, similarity = row["query"], row["similarity"]
+        good_video_ids, bad_video_ids = row["good_video_ids"], row["bad_video_ids"]
         
         # Skip if it's the exact same query
         if query_text.strip().lower() == payload.query.strip().lower():
             continue
         
-        # Get good and bad sources for this query
-        feedback_sql = sql_text("""
-            SELECT video_id, feedback
-            FROM retrieval_feedback
-            WHERE query = :query
-        """)
-        feedback_result = db.execute(feedback_sql, {"query": query_text}).fetchall()
-        
-        good_video_ids = [vid for vid, fb in feedback_result if fb == 'good']
-        bad_video_ids = [vid for vid, fb in feedback_result if fb == 'bad']
-        
         similar_queries.append(SimilarQuery(
             query=query_text,
             similarity=float(similarity),
-            good_video_ids=good_video_ids,
-            bad_video_ids=bad_video_ids
+            good_video_ids=list(good_video_ids or []),
+            bad_video_ids=list(bad_video_ids or [])
         ))
     
     return SimilarQueriesResponse(
@@ -914,7 +1636,7 @@ class SimilarCollectionsResponse(BaseModel):
 
 
 @router.post("/similar-collections", response_model=SimilarCollectionsResponse)
-def find_similar_collections(payload: SearchRequest, db: Session = Depends(get_db)):
+async def find_similar_collections(payload: SearchRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Find similar past collections based on semantic similarity of queries.
     Returns full collection details including AI answers and source videos.
@@ -925,44 +1647,47 @@ def find_similar_collections(payload: SearchRequest, db: Session = Depends(get_d
     if not payload.query.strip():
         return SimilarCollectionsResponse(query=payload.query, collections=[])
     
+    cache_payload = {"query": payload.query}  # Only the query affects this endpoint
+    corpus_version = await get_corpus_version(db, "collections")
+    cached = await get_cached_result("similar-collections", cache_payload, corpus_version)
+    if cached is not None:
+        print(f"[similar-collections] Result cache hit (corpus v{corpus_version})")
+        return SimilarCollectionsResponse(**cached)
+    
     # Generate query embedding
     try:
-        query_embedding = embed_text(payload.query)
+        query_embedding = await embed_query_async(payload.query)
     except Exception as e:
         print(f"[similar-collections][ERROR] Failed to generate query embedding: {e}")
         raise HTTPException(500, f"Failed to generate query embedding: {e}")
     
     # Find similar collections (similarity > 0.50 threshold)
-    sql = sql_text("""
-        SELECT 
-            id,
-            query,
-            ai_answer,
-            video_ids,
-            metadata_json,
-            created_at,
-            1 - (query_embedding <=> :query_vec) AS similarity
-        FROM collections
-        WHERE query_embedding IS NOT NULL
-            AND 1 - (query_embedding <=> :query_vec) > 0.50
-        ORDER BY similarity DESC
-        LIMIT 10
-    """)
-    
     try:
-        result = db.execute(
-            sql,
-            {"query_vec": json.dumps(query_embedding)}
-        ).fetchall()
+        result = await thresholded_knn(
+            db,
+            table="collections",
+            embedding_column="query_embedding",
+            columns=["id", "query", "ai_answer", "video_ids", "metadata_json", "created_at"],
+            query_vec=vector_param(query_embedding),
+            min_similarity=0.50,
+            limit=10,
+        )
     except Exception as e:
         print(f"[similar-collections][ERROR] Database query failed: {e}")
         raise HTTPException(500, f"Failed to find similar collections: {e}")
     
     print(f"[similar-collections] Found {len(result)} similar collections")
     
+    # Videos for every collection in one round trip
+    loaders = RequestLoaders(db)
+    for row in result:
+        loaders.videos.prime(row["video_ids"] or [])
+    
     similar_collections = []
     for row in result:
-        collection_id, query_text, ai_answer, video_ids, metadata_json, created_at, similarity = row
+        collection_id, query_text, ai_answer = row["id"], row["query"], row["ai_answer"]
+        video_ids, metadata_json, created_at = row["video_ids"], row["metadata_json"], row["created_at"]
+        similarity = row["similarity"]
         
         # Skip if it's the exact same query
         if query_text.strip().lower() == payload.query.strip().lower():
@@ -971,10 +1696,8 @@ def find_similar_collections(payload: SearchRequest, db: Session = Depends(get_d
         # Fetch video details for this collection
         videos_data = []
         if video_ids:
-            videos = db.query(Video).filter(Video.id.in_(video_ids)).all()
-            
-            # Create a mapping to preserve order and include scores from metadata
-            video_map = {v.id: v for v in videos}
+            # Mapping to preserve order and include scores from metadata
+            video_map = {vid: v for vid, v in (await loaders.videos.load_many(video_ids)).items() if v is not None}
             
             # Get scores from metadata if available
             scores_map = {}
@@ -1007,9 +1730,29 @@ def find_similar_collections(payload: SearchRequest, db: Session = Depends(get_d
         ))
     
     print(f"[similar-collections] Returning {len(similar_collections)} collections")
-    return SimilarCollectionsResponse(
+    response = SimilarCollectionsResponse(
         query=payload.query,
         collections=similar_collections
     )
+    await store_result("similar-collections", cache_payload, corpus_version, response.model_dump())
+    return response
+
+
+# ========== Cache Admin ==========
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+@router.delete("/cache", status_code=200)
+async def purge_search_cache(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Drop all cached search results (in-process and Redis tiers).
+    Requires the X-Admin-Token header when ADMIN_TOKEN is configured.
+    """
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(403, "Invalid admin token")
+    removed = await purge_result_cache()
+    print(f"[search] Result cache purged ({removed} entries)")
+    return {"removed": removed}
 
 
@@ -0,0 +1,55 @@
+-- Monotonic corpus versions used to tag cached search results. Statement-level
+-- triggers bump the version of every scope a table feeds, so any write to the
+-- corpus makes older cache entries unreachable. UPDATE triggers list only the
+-- columns a scope's cached responses depend on, so unrelated writes (summaries,
+-- OCR, clip counts) don't invalidate the caches.
+CREATE TABLE IF NOT EXISTS corpus_versions (
+    scope VARCHAR PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO corpus_versions (scope) VALUES ('search'), ('collections')
+ON CONFLICT (scope) DO NOTHING;
+
+-- The scope rows are locked in scope order before they are bumped, so two
+-- transactions bumping overlapping scopes queue up instead of deadlocking.
+CREATE OR REPLACE FUNCTION bump_corpus_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE corpus_versions cv
+    SET version = cv.version + 1, updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT scope FROM corpus_versions
+        WHERE scope = ANY(TG_ARGV)
+        ORDER BY scope
+        FOR UPDATE
+    ) locked
+    WHERE cv.scope = locked.scope;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- search: transcript text and embeddings, and chunks
+DROP TRIGGER IF EXISTS transcripts_bump_corpus_version ON transcripts;
+CREATE TRIGGER transcripts_bump_corpus_version
+AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF text, embedding ON transcripts
+FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_version('search');
+
+DROP TRIGGER IF EXISTS transcript_chunks_bump_corpus_version ON transcript_chunks;
+CREATE TRIGGER transcript_chunks_bump_corpus_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON transcript_chunks
+FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_version('search');
+
+-- videos feed both scopes: search hits and filters, and the video details
+-- embedded in similar-collection results
+DROP TRIGGER IF EXISTS videos_bump_corpus_version ON videos;
+CREATE TRIGGER videos_bump_corpus_version
+AFTER INSERT OR DELETE OR TRUNCATE
+    OR UPDATE OF source, url, title, description, author, duration_sec, media_path, hashtags, created_at
+ON videos
+FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_version('collections', 'search');
+
+DROP TRIGGER IF EXISTS collections_bump_corpus_version ON collections;
+CREATE TRIGGER collections_bump_corpus_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON collections
+FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_version('collections');
@@ -0,0 +1,4 @@
+-- Content hash of the exact text last embedded for a transcript, plus the
+-- model id used, so the embedding worker can skip redundant re-embeds
+ALTER TABLE transcripts ADD COLUMN IF NOT EXISTS embedding_hash VARCHAR(64);
+ALTER TABLE transcripts ADD COLUMN IF NOT EXISTS embedding_model VARCHAR;
@@ -0,0 +1,37 @@
+-- One row per distinct feedback query: its embedding plus the current good /
+-- bad video ids (latest feedback per video). Maintained by the feedback
+-- endpoints so similar-query lookups are a single kNN over this table.
+CREATE TABLE IF NOT EXISTS query_feedback_profile (
+    query TEXT PRIMARY KEY,
+    query_embedding vector(384),
+    good_video_ids VARCHAR[] NOT NULL DEFAULT '{}',
+    bad_video_ids VARCHAR[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS query_feedback_profile_embedding_hnsw
+ON query_feedback_profile USING hnsw (query_embedding vector_cosine_ops);
+
+-- Backfill from existing feedback (no-op once profiles exist)
+INSERT INTO query_feedback_profile (query, query_embedding, good_video_ids, bad_video_ids)
+SELECT g.query, e.query_embedding, g.good_video_ids, g.bad_video_ids
+FROM (
+    SELECT
+        query,
+        COALESCE(array_agg(video_id) FILTER (WHERE feedback = 'good'), '{}') AS good_video_ids,
+        COALESCE(array_agg(video_id) FILTER (WHERE feedback = 'bad'), '{}') AS bad_video_ids
+    FROM (
+        SELECT DISTINCT ON (query, video_id) query, video_id, feedback
+        FROM retrieval_feedback
+        ORDER BY query, video_id, created_at DESC
+    ) latest
+    GROUP BY query
+) g
+JOIN LATERAL (
+    SELECT rf.query_embedding
+    FROM retrieval_feedback rf
+    WHERE rf.query = g.query AND rf.query_embedding IS NOT NULL
+    ORDER BY rf.created_at DESC
+    LIMIT 1
+) e ON true
+ON CONFLICT (query) DO NOTHING;
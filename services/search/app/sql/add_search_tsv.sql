@@ -0,0 +1,16 @@
+-- Full-text search columns for the lexical retrieval leg (hybrid search).
+-- Title and hashtags weigh most, then description, then transcript text.
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS search_tsv tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(jsonb_to_tsvector('english', coalesce(hashtags, '[]'::jsonb), '["string"]'), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B')
+) STORED;
+
+ALTER TABLE transcripts ADD COLUMN IF NOT EXISTS search_tsv tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(text, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS videos_search_tsv_gin ON videos USING gin (search_tsv);
+CREATE INDEX IF NOT EXISTS transcripts_search_tsv_gin ON transcripts USING gin (search_tsv);
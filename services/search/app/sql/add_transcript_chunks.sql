@@ -0,0 +1,19 @@
+-- Chunk-level transcript embeddings (overlapping, token-bounded windows)
+CREATE TABLE IF NOT EXISTS transcript_chunks (
+    id SERIAL PRIMARY KEY,
+    video_id VARCHAR NOT NULL REFERENCES transcripts(video_id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    start_char INTEGER NOT NULL,
+    end_char INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    embedding vector(384),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (video_id, chunk_index)
+);
+
+-- ANN index for chunk retrieval
+CREATE INDEX IF NOT EXISTS transcript_chunks_embedding_hnsw
+ON transcript_chunks USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 200);
+
+CREATE INDEX IF NOT EXISTS transcript_chunks_video_idx ON transcript_chunks(video_id);
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: text (JSON) vs binary (numpy) vector parameters.
+
+Runs the same kNN query and the same batch insert twice, once binding the
+vector as a '[0.1, ...]' string that Postgres has to parse, once as a
+float32 numpy array sent in pgvector's binary format by the adapter
+registered in app.db. Prints the mean latency of each.
+
+Usage (from services/search, with DATABASE_URL pointing at the database):
+    python bench_vector_params.py [iterations]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from sqlalchemy import text
+
+from app.db import engine, vector_param
+
+DIM = 384
+INSERT_BATCH = 100
+
+KNN_SQL = text(
+    "SELECT video_id, embedding <=> :query_vec AS distance FROM transcripts "
+    "WHERE embedding IS NOT NULL ORDER BY embedding <=> :query_vec LIMIT 50"
+)
+
+
+def _time_knn(conn, query_vec, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        conn.execute(KNN_SQL, {"query_vec": query_vec}).fetchall()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def _time_insert(conn, rows, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        conn.execute(text("INSERT INTO bench_vectors (embedding) VALUES (:embedding)"), rows)
+    elapsed = (time.perf_counter() - start) * 1000 / iterations
+    conn.execute(text("TRUNCATE bench_vectors"))
+    return elapsed
+
+
+def main() -> int:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rng = np.random.default_rng(0)
+    vectors = rng.uniform(-1, 1, size=(INSERT_BATCH, DIM)).astype(np.float32)
+
+    print(f"🔗 Connecting to: {engine.url}")
+    print(f"   {iterations} iterations, dim={DIM}, insert batch={INSERT_BATCH}\n")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TEMP TABLE bench_vectors (embedding vector({DIM}))"))
+
+        results = {}
+        for label, encode in (("text", lambda v: json.dumps(v.tolist())), ("binary", vector_param)):
+            knn_ms = _time_knn(conn, encode(vectors[0]), iterations)
+            insert_ms = _time_insert(conn, [{"embedding": encode(v)} for v in vectors], iterations)
+            results[label] = (knn_ms, insert_ms)
+            print(f"{label:>6}: kNN {knn_ms:8.2f} ms/query   insert {insert_ms:8.2f} ms/batch")
+
+    (knn_text, ins_text), (knn_bin, ins_bin) = results["text"], results["binary"]
+    print(f"\nbinary vs text: kNN {knn_text / max(knn_bin, 1e-9):.2f}x, insert {ins_text / max(ins_bin, 1e-9):.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
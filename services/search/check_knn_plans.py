@@ -0,0 +1,84 @@
+"""
+EXPLAIN check for the kNN statements built by app.knn.
+
+For every vector column the search service queries, verifies that the
+index-ordered statement from build_knn_sql() is served by its HNSW index,
+and shows that the legacy "1 - (x <=> q) > t ORDER BY similarity" form is
+not. Exits non-zero if any index-ordered statement misses its index.
+
+Usage (from services/search, with DATABASE_URL pointing at the database):
+    python check_knn_plans.py
+"""
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+
+from app.db import engine
+from app.knn import build_knn_sql
+
+# (table, embedding column, selected columns, expected index)
+KNN_TARGETS = [
+    ("query_feedback_profile", "query_embedding", ["query"], "query_feedback_profile_embedding_hnsw"),
+    ("collections", "query_embedding", ["id", "query"], "collections_query_embedding_idx"),
+    ("transcripts", "embedding", ["video_id"], "transcripts_embedding_hnsw"),
+    ("transcript_chunks", "embedding", ["video_id"], "transcript_chunks_embedding_hnsw"),
+]
+
+
+def _plan_indexes(plan: dict) -> set:
+    """All index names used anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    found = set()
+    if plan.get("Index Name"):
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+def _explain(conn, sql: str, params: dict) -> set:
+    raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    return _plan_indexes(plan[0]["Plan"])
+
+
+def main() -> int:
+    query_vec = json.dumps([random.uniform(-1, 1) for _ in range(384)])
+    failures = 0
+
+    print(f"🔗 Connecting to: {engine.url}\n")
+    for table, column, columns, index in KNN_TARGETS:
+        knn_sql = build_knn_sql(table, column, columns)
+        legacy_sql = (
+            f"SELECT {', '.join(columns)}, 1 - ({column} <=> :query_vec) AS similarity "
+            f"FROM {table} WHERE {column} IS NOT NULL AND 1 - ({column} <=> :query_vec) > 0.5 "
+            f"ORDER BY similarity DESC LIMIT 10"
+        )
+        with engine.begin() as conn:
+            # Small dev tables make a seq scan cheapest; disable it to check
+            # whether the index *can* serve each statement shape
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            try:
+                knn_indexes = _explain(conn, knn_sql, {"query_vec": query_vec, "n": 10})
+                legacy_indexes = _explain(conn, legacy_sql, {"query_vec": query_vec})
+            except Exception as e:
+                print(f"⚠️  {table}.{column}: EXPLAIN failed ({e})")
+                failures += 1
+                continue
+
+        ok = index in knn_indexes
+        failures += 0 if ok else 1
+        print(f"{'✅' if ok else '❌'} {table}.{column}")
+        print(f"    index-ordered kNN uses: {sorted(knn_indexes) or 'no index'}")
+        print(f"    legacy threshold form uses: {sorted(legacy_indexes) or 'no index'}")
+
+    print(f"\n{'All kNN statements use their HNSW index' if not failures else f'{failures} check(s) failed'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+LLM gateway tests against a local fake Gemini server.
+
+The gateway is pointed at a stdlib HTTP server (GEMINI_BASE_URL) that
+answers generateContent requests, so retries, backoff, accounting and the
+concurrency cap are exercised through the real genai client without
+network access or an API key.
+
+Usage (from services/search):
+    python -m pytest tests
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import llm_gateway
+
+RESPONSE_BODY = {
+    "candidates": [{"content": {"role": "model", "parts": [{"text": "hello"}]}, "finishReason": "STOP"}],
+    "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 3, "totalTokenCount": 15},
+}
+STREAM_CHUNKS = ["hel", "lo"]
+
+
+class FakeGemini(BaseHTTPRequestHandler):
+    """Answers every POST with the next queued status (200 when the queue is empty)."""
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            status = server.statuses.pop(0) if server.statuses else 200
+        try:
+            time.sleep(server.delay_sec)
+            if status == 200 and "streamGenerateContent" in self.path:
+                self._send_stream()
+                return
+            if status == 200:
+                body = json.dumps(RESPONSE_BODY).encode("utf-8")
+            else:
+                body = json.dumps({"error": {"code": status, "message": "slow down", "status": "RESOURCE_EXHAUSTED"}}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send_stream(self):
+        """Server-sent events, one chunk per STREAM_CHUNKS entry."""
+        events = []
+        for text in STREAM_CHUNKS:
+            chunk = dict(RESPONSE_BODY, candidates=[{"content": {"role": "model", "parts": [{"text": text}]}}])
+            events.append(f"data: {json.dumps(chunk)}\r\n\r\n")
+        body = "".join(events).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GatewayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGemini)
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.statuses = []
+        self.server.delay_sec = 0.0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        patches = [
+            mock.patch.dict(os.environ, {"GEMINI_API_KEY": "test-key", "GEMINI_BASE_URL": base_url}),
+            mock.patch.object(llm_gateway, "GEMINI_BASE_URL", base_url),
+            mock.patch.object(llm_gateway, "LLM_BACKOFF_BASE_SEC", 0.01),
+            mock.patch.object(llm_gateway, "_client", None),
+            mock.patch.object(llm_gateway, "_stats", {}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries_429_honouring_retry_after(self):
+        self.server.statuses = [429]
+        delays = []
+        backoff_delay = llm_gateway.backoff_delay
+
+        def record_delay(attempt, exc=None):
+            delays.append(backoff_delay(attempt, exc))
+            return delays[-1]
+
+        with mock.patch.object(llm_gateway, "backoff_delay", record_delay):
+            started = time.perf_counter()
+            text = llm_gateway.generate("hi", purpose="test")
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(text, "hello")
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(len(delays), 1)
+        self.assertGreaterEqual(delays[0], 1.0)  # Retry-After: 1, base backoff is 0.01s
+        self.assertGreaterEqual(elapsed, 1.0)
+
+        stats = llm_gateway.get_llm_stats()
+        self.assertEqual(stats["base_url"], llm_gateway.GEMINI_BASE_URL)
+        call_stats = stats["calls"]["test"]
+        self.assertEqual(call_stats["calls"], 1)
+        self.assertEqual(call_stats["retries"], 1)
+        self.assertEqual(call_stats["errors"], 0)
+        self.assertEqual(call_stats["prompt_tokens"], 12)
+        self.assertEqual(call_stats["output_tokens"], 3)
+        self.assertGreaterEqual(call_stats["latency_ms_max"], 1000.0)
+        self.assertAlmostEqual(call_stats["latency_ms_avg"], call_stats["latency_ms_total"])
+
+    def test_gives_up_after_max_retries(self):
+        self.server.statuses = [500] * 10
+        with mock.patch.object(llm_gateway, "LLM_MAX_RETRIES", 2):
+            with self.assertRaises(Exception):
+                llm_gateway.generate("hi", purpose="test")
+        self.assertEqual(self.server.requests, 3)
+        call_stats = llm_gateway.get_llm_stats()["calls"]["test"]
+        self.assertEqual((call_stats["calls"], call_stats["errors"], call_stats["retries"]), (1, 1, 2))
+
+    def test_sync_concurrency_cap(self):
+        self.server.delay_sec = 0.2
+        with mock.patch.object(llm_gateway, "_sync_slots", threading.BoundedSemaphore(2)):
+            threads = [threading.Thread(target=llm_gateway.generate, args=("hi",)) for _ in range(6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(self.server.requests, 6)
+        self.assertEqual(self.server.max_in_flight, 2)
+        self.assertEqual(llm_gateway.get_llm_stats()["calls"]["generate"]["calls"], 6)
+
+    def test_async_concurrency_cap(self):
+        self.server.delay_sec = 0.2
+
+        async def run():
+            with mock.patch.object(llm_gateway, "_async_slots", asyncio.Semaphore(2)):
+                return await asyncio.gather(*(llm_gateway.agenerate("hi", purpose="rag_answer") for _ in range(6)))
+
+        self.assertEqual(asyncio.run(run()), ["hello"] * 6)
+        self.assertEqual(self.server.max_in_flight, 2)
+        call_stats = llm_gateway.get_llm_stats()["calls"]["rag_answer"]
+        self.assertEqual((call_stats["calls"], call_stats["prompt_tokens"], call_stats["output_tokens"]), (6, 72, 18))
+
+    def test_stream_releases_slot_before_consumer_finishes(self):
+        async def run():
+            with mock.patch.object(llm_gateway, "_async_slots", asyncio.Semaphore(1)):
+                stream = llm_gateway.astream("hi", purpose="rag_stream")
+                first = await stream.__anext__()
+                # The consumer is still mid-stream; the only slot must be free again
+                answer = await asyncio.wait_for(llm_gateway.agenerate("hi"), timeout=5)
+                rest = [text async for text in stream]
+                return [first] + rest, answer
+
+        texts, answer = asyncio.run(run())
+        self.assertEqual(texts, STREAM_CHUNKS)
+        self.assertEqual(answer, "hello")
+        call_stats = llm_gateway.get_llm_stats()["calls"]["rag_stream"]
+        self.assertEqual((call_stats["calls"], call_stats["errors"]), (1, 0))
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(llm_gateway, "_stats", {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_non_idempotent_call_not_retried_after_timeout(self):
+        fn = mock.Mock(side_effect=TimeoutError("read timed out"))
+        with self.assertRaises(TimeoutError):
+            llm_gateway.call(fn, "upload", idempotent=False)
+        self.assertEqual(fn.call_count, 1)
+
+    def test_idempotent_call_retried_after_timeout(self):
+        fn = mock.Mock(side_effect=[TimeoutError("read timed out"), "ok"])
+        with mock.patch.object(llm_gateway, "LLM_BACKOFF_BASE_SEC", 0.01):
+            self.assertEqual(llm_gateway.call(fn, "delete_file"), "ok")
+        self.assertEqual(fn.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+/search/rag/stream event order with the offline FakeLLM.
+
+Retrieval and the answer cache are patched out, so the route only runs its
+SSE framing around FakeLLM's token stream; no database, embedder or API key
+is needed.
+
+Usage (from services/search):
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import routes_search
+from app.db_async import get_async_db
+from app.llm import FakeLLM
+
+SOURCES = [
+    routes_search.RAGSource(video_id="v1", title="Knife skills", author="chef", url="https://example.com/v1", snippet="dice", score=0.9),
+    routes_search.RAGSource(video_id="v2", title="Stock basics", author="chef", url="https://example.com/v2", snippet="simmer", score=0.7),
+]
+PROMPT = "Question: how do I cook?\n\n[Source 1] Knife skills\ndice\n\n[Source 2] Stock basics\nsimmer\n"
+
+
+def parse_sse(body: str):
+    """[(event, data), ...] from a text/event-stream body."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class RAGStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        async def no_db():
+            yield None
+
+        async def no_cached_answer(payload, db):
+            return None, None
+
+        async def prepare_rag(payload, db, feedback=None):
+            return PROMPT, SOURCES, [], [routes_search.StageStat(stage="search", candidates=len(SOURCES), ms=1.0)]
+
+        patches = [
+            mock.patch.object(routes_search, "_cached_rag_answer", no_cached_answer),
+            mock.patch.object(routes_search, "_prepare_rag", prepare_rag),
+            mock.patch.object(routes_search, "get_llm", lambda: FakeLLM(token_delay_ms=0)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+        app = FastAPI()
+        app.include_router(routes_search.router)
+        app.dependency_overrides[get_async_db] = no_db
+        self.client = TestClient(app)
+
+    def test_sources_then_tokens_then_done(self):
+        response = self.client.post("/search/rag/stream", json={"query": "how do I cook?"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+
+        events = parse_sse(response.text)
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], "sources")
+        self.assertEqual(names[-1], "done")
+        self.assertGreater(len(names), 3)
+        self.assertEqual(set(names[1:-1]), {"token"})
+
+        sources = events[0][1]
+        self.assertEqual([s["video_id"] for s in sources["sources"]], ["v1", "v2"])
+
+        done = events[-1][1]
+        streamed = "".join(data["text"] for name, data in events if name == "token")
+        self.assertEqual(done["answer"], streamed)
+        self.assertEqual(streamed, FakeLLM()._answer(PROMPT))
+        self.assertEqual({n: c["video_id"] for n, c in done["citations"].items()}, {"1": "v1", "2": "v2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
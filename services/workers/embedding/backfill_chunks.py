@@ -0,0 +1,68 @@
+# services/workers/embedding/backfill_chunks.py
+"""
+Backfill script: chunk embeddings for existing transcripts.
+
+Transcripts embedded before chunk-level retrieval have a document vector
+but no rows in transcript_chunks, so mode="chunks" searches can only reach them
+through the document-vector top-up. Run this once (in the embedding worker
+container) to chunk and embed them:
+
+    docker compose exec embedding-worker python backfill_chunks.py
+"""
+from sqlalchemy import text
+
+from db import SessionLocal
+from tasks import replace_chunks
+
+_MISSING_CHUNKS_SQL = text("""
+    SELECT t.video_id
+    FROM transcripts t
+    WHERE t.text IS NOT NULL AND t.text <> ''
+      AND NOT EXISTS (SELECT 1 FROM transcript_chunks c WHERE c.video_id = t.video_id)
+    ORDER BY t.video_id
+""")
+
+_TRANSCRIPT_TEXT_SQL = text("SELECT text FROM transcripts WHERE video_id = :video_id")
+
+
+def backfill_chunks():
+    """Generate chunk embeddings for every transcript that has none."""
+    db = SessionLocal()
+    
+    try:
+        video_ids = db.execute(_MISSING_CHUNKS_SQL).scalars().all()
+        
+        if not video_ids:
+            print("✅ All transcripts already have chunk embeddings!")
+            return
+        
+        print(f"📊 Found {len(video_ids)} transcripts without chunk embeddings")
+        print("🔄 Generating chunk embeddings...\n")
+        
+        done = 0
+        for idx, video_id in enumerate(video_ids, 1):
+            try:
+                transcript_text = db.execute(_TRANSCRIPT_TEXT_SQL, {"video_id": video_id}).scalar()
+                if not transcript_text:
+                    print(f"⚠️  [{idx}/{len(video_ids)}] No text for transcript {video_id}, skipping")
+                    continue
+                
+                chunk_count = replace_chunks(db, video_id, transcript_text)
+                db.commit()
+                done += 1
+                print(f"✅ [{idx}/{len(video_ids)}] {video_id}: {chunk_count} chunks")
+                
+            except Exception as e:
+                print(f"❌ [{idx}/{len(video_ids)}] Error processing {video_id}: {e}")
+                db.rollback()
+                continue
+        
+        print(f"\n✅ Done! Generated chunk embeddings for {done}/{len(video_ids)} transcripts")
+        
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    print("🚀 Starting chunk embedding backfill...")
+    print("⏳ This may take a few minutes for large databases...\n")
+    backfill_chunks()
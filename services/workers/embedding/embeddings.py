@@ -3,29 +3,43 @@
 Embedding service using sentence-transformers for semantic search.
 Uses 384-dim model to match the Vector(384) column in the database.
 """
+import hashlib
 import os
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import numpy as np
 
+from encoder_backends import EMBEDDING_BACKEND, load_sentence_encoder, check_parity
+
 # Lazy import to avoid loading model at import time
 _model = None
 _MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"  # 384 dimensions
 
+# Transcript chunking: token-bounded windows that fit MiniLM's 256-token limit
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+MAX_CHUNKS_PER_TRANSCRIPT = int(os.getenv("MAX_CHUNKS_PER_TRANSCRIPT", "512"))
+
+# Identifies everything that affects the stored vectors; a change forces a re-embed
+EMBEDDING_MODEL_ID = f"{_MODEL_NAME}|{EMBEDDING_BACKEND}|chunks={CHUNK_TOKENS}/{CHUNK_OVERLAP_TOKENS}"
+
+# Verify non-torch backends against the torch output before serving with them
+EMBEDDING_PARITY_CHECK = os.getenv("EMBEDDING_PARITY_CHECK", "1").lower() in ("1", "true", "yes")
+
 
 def get_embedding_model():
-    """Lazy-load the embedding model."""
+    """Lazy-load the embedding model with the configured backend (EMBEDDING_BACKEND)."""
     global _model
     if _model is None:
-        try:
-            from sentence_transformers import SentenceTransformer
-            print(f"[embeddings] Loading model: {_MODEL_NAME}")
-            _model = SentenceTransformer(_MODEL_NAME)
-            print(f"[embeddings] Model loaded successfully")
-        except ImportError:
-            raise RuntimeError(
-                "sentence-transformers not installed. "
-                "Run: pip install sentence-transformers"
-            )
+        print(f"[embeddings] Loading model: {_MODEL_NAME} (backend={EMBEDDING_BACKEND})")
+        model = load_sentence_encoder(_MODEL_NAME, EMBEDDING_BACKEND)
+        if EMBEDDING_BACKEND != "torch" and EMBEDDING_PARITY_CHECK:
+            report = check_parity(_MODEL_NAME, model)
+            print(f"[embeddings] Parity check vs torch: {report}")
+            if not report["passed"]:
+                print("[embeddings][WARNING] Parity check failed; falling back to torch backend")
+                model = load_sentence_encoder(_MODEL_NAME, "torch")
+        _model = model
+        print(f"[embeddings] Model loaded successfully")
     return _model
 
 
@@ -101,6 +115,64 @@ def combine_text_for_embedding(transcript: Optional[str], caption: Optional[str]
     return combined
 
 
+def chunk_transcript(
+    text: Optional[str],
+    max_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> List[Tuple[int, int, str]]:
+    """
+    Split a transcript into overlapping, token-bounded chunks.
+
+    Windows are measured with the embedding model's own tokenizer so each
+    chunk is seen in full by the encoder (no silent truncation).
+
+    Args:
+        text: The full transcript text
+        max_tokens: Tokens per chunk (must stay below the model's max_seq_length)
+        overlap_tokens: Tokens shared between consecutive chunks
+
+    Returns:
+        List of (start_char, end_char, chunk_text) with offsets into text
+    """
+    if not text or not text.strip():
+        return []
+
+    tokenizer = get_embedding_model().tokenizer
+    encoding = tokenizer(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        truncation=False,
+        verbose=False,
+    )
+    offsets = encoding["offset_mapping"]
+    if not offsets:
+        return []
+
+    stride = max(1, max_tokens - overlap_tokens)
+    chunks = []
+    for start_tok in range(0, len(offsets), stride):
+        end_tok = min(start_tok + max_tokens, len(offsets))
+        start_char = offsets[start_tok][0]
+        end_char = offsets[end_tok - 1][1]
+        chunk_text = text[start_char:end_char].strip()
+        if chunk_text:
+            chunks.append((start_char, end_char, chunk_text))
+        if end_tok >= len(offsets) or len(chunks) >= MAX_CHUNKS_PER_TRANSCRIPT:
+            break
+
+    return chunks
+
+
+def embedding_content_hash(*texts: str) -> str:
+    """sha256 over the exact texts that get embedded (stored on the transcript row)."""
+    h = hashlib.sha256()
+    for t in texts:
+        h.update((t or "").encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """
     Calculate cosine similarity between two vectors.
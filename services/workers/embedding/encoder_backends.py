@@ -0,0 +1,142 @@
+"""
+Pluggable inference backends for the MiniLM sentence encoder.
+
+Selected with EMBEDDING_BACKEND:
+- "torch"     : PyTorch SentenceTransformer (default)
+- "onnx"      : same model through ONNX Runtime, fp32
+- "onnx-int8" : ONNX Runtime with a dynamically quantized int8 graph (CPU)
+
+Any non-torch backend can be validated against the torch output with
+check_parity(); run `python encoder_backends.py` for a report.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+# Pre-quantized graph shipped in the hub repo; override per CPU (avx512, arm64...)
+ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+# Quantization config used when the pre-quantized file isn't available
+ONNX_INT8_QCONFIG = os.getenv("EMBEDDING_ONNX_QCONFIG", "avx2")
+ONNX_CACHE_DIR = os.getenv("EMBEDDING_ONNX_CACHE_DIR", "/root/.cache/huggingface/vidsense-onnx")
+
+PARITY_MIN_COSINE = float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", "0.98"))
+
+# Fixed corpus for backend parity checks: short queries and transcript-like text
+PARITY_CORPUS: List[str] = [
+    "how to make sourdough bread at home",
+    "best exercises for lower back pain",
+    "python list comprehension tutorial",
+    "Caption: Quick pasta recipe #food #dinner\n\nTranscript: Boil the water, add salt, "
+    "cook the spaghetti for nine minutes and toss it with garlic and olive oil.",
+    "Transcript: Today we're reviewing the new camera. The autofocus is fast, the battery "
+    "lasts about four hundred shots and low light performance is surprisingly good.",
+    "travel tips for visiting Japan in winter",
+    "what is the difference between a roth and a traditional IRA",
+    "Transcript: Start with your feet shoulder width apart, keep your back straight and "
+    "push through your heels as you stand up. Do three sets of ten.",
+]
+
+
+def _load_torch(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _load_onnx(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, backend="onnx")
+
+
+def _load_onnx_int8(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    try:
+        return SentenceTransformer(
+            model_name, backend="onnx", model_kwargs={"file_name": ONNX_INT8_FILE}
+        )
+    except Exception as e:
+        print(f"[encoder] Pre-quantized graph '{ONNX_INT8_FILE}' unavailable ({e}); quantizing locally")
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    local_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{ONNX_INT8_QCONFIG}.onnx"
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        fp32 = SentenceTransformer(model_name, backend="onnx")
+        fp32.save(local_dir)
+        export_dynamic_quantized_onnx_model(
+            fp32, ONNX_INT8_QCONFIG, local_dir, file_suffix=f"qint8_{ONNX_INT8_QCONFIG}"
+        )
+    return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+_LOADERS = {
+    "torch": _load_torch,
+    "onnx": _load_onnx,
+    "onnx-int8": _load_onnx_int8,
+}
+
+
+def load_sentence_encoder(model_name: str, backend: Optional[str] = None):
+    """Load model_name with the requested backend (defaults to EMBEDDING_BACKEND)."""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend not in _LOADERS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {BACKENDS}")
+    try:
+        return _LOADERS[backend](model_name)
+    except ImportError as e:
+        raise RuntimeError(
+            f"Embedding backend '{backend}' is missing dependencies ({e}). "
+            "Run: pip install sentence-transformers optimum[onnxruntime]"
+        )
+
+
+def check_parity(
+    model_name: str,
+    candidate: Any,
+    reference: Any = None,
+    min_cosine: float = PARITY_MIN_COSINE,
+    corpus: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Compare a candidate encoder against the torch reference on a fixed corpus.
+
+    Both outputs are L2-normalized, so the row-wise dot product is the cosine.
+    The check passes when every sentence stays above min_cosine.
+    """
+    corpus = corpus or PARITY_CORPUS
+    if reference is None:
+        reference = _load_torch(model_name)
+
+    ref = reference.encode(corpus, normalize_embeddings=True, show_progress_bar=False)
+    got = candidate.encode(corpus, normalize_embeddings=True, show_progress_bar=False)
+    cosines = np.sum(np.asarray(ref) * np.asarray(got), axis=1)
+
+    return {
+        "passed": bool(cosines.min() >= min_cosine),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "threshold": min_cosine,
+        "n": len(corpus),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    name = sys.argv[1] if len(sys.argv) > 1 else "sentence-transformers/all-MiniLM-L6-v2"
+    reference = _load_torch(name)
+    for backend in BACKENDS[1:]:
+        model = load_sentence_encoder(name, backend)
+        report = check_parity(name, model, reference=reference)
+        start = time.perf_counter()
+        for text in PARITY_CORPUS:
+            model.encode(text, normalize_embeddings=True)
+        per_query_ms = (time.perf_counter() - start) * 1000 / len(PARITY_CORPUS)
+        print(f"{backend:10s} {report} single-query={per_query_ms:.2f}ms")
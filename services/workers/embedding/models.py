@@ -27,8 +27,21 @@ class Transcript(Base):
     ocr_json = Column(JSONB, default=list)
     summary = Column(Text, nullable=True)
     embedding = Column(Vector(384))
+    embedding_hash = Column(String(64), nullable=True)  # sha256 of the text last embedded
+    embedding_model = Column(String, nullable=True)  # model id used for that embedding
     updated_at = Column(DateTime, onupdate=func.now(), server_default=func.now())
 
+class TranscriptChunk(Base):
+    __tablename__ = 'transcript_chunks'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    video_id = Column(String, nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    start_char = Column(Integer, nullable=False)  # Offsets into transcripts.text
+    end_char = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    embedding = Column(Vector(384))
+    created_at = Column(DateTime, server_default=func.now())
+
 class Collection(Base):
     __tablename__ = 'collections'
     id = Column(String, primary_key=True)
@@ -1,9 +1,21 @@
 import os
 from celery import Celery
 from sqlalchemy.orm import Session
-from db import SessionLocal
-from models import Video, Transcript
-from embeddings import embed_text, combine_text_for_embedding
+from sqlalchemy import text as sql_text
+from db import SessionLocal, vector_param
+from models import Video, Transcript, TranscriptChunk
+from embeddings import (
+    embed_text,
+    embed_texts_batch,
+    combine_text_for_embedding,
+    chunk_transcript,
+    embedding_content_hash,
+    EMBEDDING_MODEL_ID,
+)
+
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+# Must match the key used by the ingestion service when coalescing enqueues
+PENDING_KEY = 'embed:pending:{video_id}'
 
 # Celery app
 celery_app = Celery(
@@ -12,9 +24,55 @@ celery_app = Celery(
     backend=os.getenv('REDIS_URL', 'redis://redis:6379/0')
 )
 
+_UPDATE_TRANSCRIPT_SQL = sql_text("""
+    UPDATE transcripts
+    SET embedding = :embedding, embedding_hash = :embedding_hash,
+        embedding_model = :embedding_model, updated_at = CURRENT_TIMESTAMP
+    WHERE video_id = :video_id
+""")
+
+_INSERT_CHUNK_SQL = sql_text("""
+    INSERT INTO transcript_chunks (video_id, chunk_index, start_char, end_char, text, embedding)
+    VALUES (:video_id, :chunk_index, :start_char, :end_char, :text, :embedding)
+""")
+
+
+def _clear_pending(video_id: str):
+    """Release the coalescing marker so edits made from now on enqueue a new task."""
+    try:
+        import redis
+        redis.Redis.from_url(REDIS_URL).delete(PENDING_KEY.format(video_id=video_id))
+    except Exception as e:
+        print(f"Warning: could not clear pending marker for {video_id}: {e}")
+
+def replace_chunks(db: Session, video_id: str, transcript_text: str) -> int:
+    """
+    Embed the transcript's chunks and replace the video's rows in
+    transcript_chunks (caller commits). Returns the number of chunks.
+    """
+    chunks = chunk_transcript(transcript_text)
+    chunk_embeddings = embed_texts_batch([c[2] for c in chunks])
+    db.query(TranscriptChunk).filter(TranscriptChunk.video_id == video_id).delete()
+    if chunks:
+        db.execute(_INSERT_CHUNK_SQL, [
+            {
+                "video_id": video_id,
+                "chunk_index": idx,
+                "start_char": start_char,
+                "end_char": end_char,
+                "text": chunk_text,
+                "embedding": vector_param(chunk_emb),
+            }
+            for idx, ((start_char, end_char, chunk_text), chunk_emb) in enumerate(zip(chunks, chunk_embeddings))
+        ])
+    return len(chunks)
+
 @celery_app.task(name='generate_embeddings')
 def generate_embeddings_task(video_id: str):
     """Generate embeddings for video transcript"""
+    # Clear the marker before reading the DB: any save that happens after this
+    # point schedules its own task, so no edit is lost to coalescing.
+    _clear_pending(video_id)
     db: Session = SessionLocal()
     
     try:
@@ -35,14 +93,35 @@ def generate_embeddings_task(video_id: str):
         # Generate embedding for transcript + description
         desc_str = video.description or ""
         combined_text = combine_text_for_embedding(transcript.text, desc_str)
+        
+        # Skip before loading/encoding if this exact text was already embedded
+        # (the document vector sees combined_text, the chunks the full transcript)
+        content_hash = embedding_content_hash(combined_text, transcript.text)
+        if (
+            transcript.embedding is not None
+            and transcript.embedding_hash == content_hash
+            and transcript.embedding_model == EMBEDDING_MODEL_ID
+        ):
+            print(f"⏭️  Embedding up to date for video {video_id}, skipping")
+            return
+        
         embedding = embed_text(combined_text)
         
-        # Update transcript with embedding
-        transcript.embedding = embedding
+        # Update transcript with embedding (numpy params go over the wire as
+        # binary vectors via the pgvector adapter registered in db.py)
+        db.execute(_UPDATE_TRANSCRIPT_SQL, {
+            "video_id": video_id,
+            "embedding": vector_param(embedding),
+            "embedding_hash": content_hash,
+            "embedding_model": EMBEDDING_MODEL_ID,
+        })
+        
+        # Chunk-level embeddings (replace any previous chunks for this video)
+        chunk_count = replace_chunks(db, video_id, transcript.text)
         
         db.commit()
         
-        print(f"✅ Generated embedding for video {video_id}")
+        print(f"✅ Generated embedding and {chunk_count} chunk embeddings for video {video_id}")
         
     except Exception as e:
         print(f"❌ Embedding generation failed for video {video_id}: {e}")
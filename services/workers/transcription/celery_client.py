@@ -0,0 +1,62 @@
+# services/workers/transcription/celery_client.py
+# Copy of services/ingestion/app/celery_client.py (each service has its own
+# build context); keep enqueue_embeddings and its debounce keys in sync.
+import os
+from celery import Celery
+
+# Celery client for sending tasks to workers
+celery_app = Celery(
+    'tasks',
+    broker=os.getenv('REDIS_URL', 'redis://redis:6379/0'),
+    backend=os.getenv('REDIS_URL', 'redis://redis:6379/0')
+)
+
+# Configure to not require results for fire-and-forget tasks
+celery_app.conf.update(
+    task_ignore_result=True,
+    task_track_started=False,
+)
+
+# Coalescing of embedding tasks: saves within EMBED_DEBOUNCE_SEC of a pending
+# task for the same video don't enqueue another one. The embedding worker
+# clears the marker when the task starts, before it reads the transcript.
+EMBED_DEBOUNCE_SEC = int(os.getenv('EMBED_DEBOUNCE_SEC', '10'))
+PENDING_KEY = 'embed:pending:{video_id}'
+# Safety margin so a lost task can't block re-embedding forever
+_PENDING_TTL_MARGIN_SEC = 300
+
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://redis:6379/0'))
+    return _redis
+
+
+def enqueue_embeddings(video_id: str) -> bool:
+    """
+    Schedule generate_embeddings for a video, debounced per video.
+
+    Returns True if a new task was sent, False if one was already pending.
+    Falls back to an immediate send if Redis can't be reached.
+    """
+    try:
+        claimed = _get_redis().set(
+            PENDING_KEY.format(video_id=video_id),
+            '1',
+            nx=True,
+            ex=EMBED_DEBOUNCE_SEC + _PENDING_TTL_MARGIN_SEC,
+        )
+    except Exception as e:
+        print(f"[celery_client] warning: debounce unavailable ({e}); sending immediately")
+        celery_app.send_task('generate_embeddings', args=[video_id])
+        return True
+
+    if not claimed:
+        return False
+
+    celery_app.send_task('generate_embeddings', args=[video_id], countdown=EMBED_DEBOUNCE_SEC)
+    return True
@@ -0,0 +1,284 @@
+"""
+LLM gateway: the one place services talk to Gemini.
+
+- One process-wide genai.Client, so HTTP connections are pooled across
+  requests and tasks instead of a new client per call
+- At most LLM_MAX_CONCURRENCY calls in flight per process (sync and async
+  callers are capped separately)
+- Retries on 429, 5xx, timeouts and connection errors with jittered
+  exponential backoff (honours Retry-After). Non-idempotent calls (file
+  uploads, paid video transcription) are only retried when the server
+  rejected them outright (429/503), never after a timeout
+- LLM_TIMEOUT_SEC caps the short text calls (agenerate/astream) per
+  request; the client itself has no timeout, so uploads and long-video
+  transcription are not cut off
+- Per-call token and latency accounting, grouped by purpose (get_llm_stats)
+- GEMINI_BASE_URL points the client at another endpoint, e.g. a local fake
+  Gemini server for tests
+
+This file is copied verbatim into every service that calls Gemini (search,
+ingestion, transcription worker); keep the copies identical.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "").strip() or None
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SEC = float(os.getenv("LLM_BACKOFF_BASE_SEC", "1.0"))
+LLM_BACKOFF_MAX_SEC = float(os.getenv("LLM_BACKOFF_MAX_SEC", "30.0"))
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "120"))  # text generation only
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Rejected before any work was done: safe to resend even non-idempotent calls
+REJECTED_STATUS = {429, 503}
+
+_client = None
+_client_lock = threading.Lock()
+_sync_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_async_slots: Optional[asyncio.Semaphore] = None
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def get_client(api_key: Optional[str] = None):
+    """Shared genai.Client (created on first use)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                key = api_key or os.getenv("GEMINI_API_KEY")
+                if not key:
+                    raise RuntimeError("GEMINI_API_KEY not set")
+                from google import genai
+                from google.genai import types
+                _client = genai.Client(api_key=key, http_options=types.HttpOptions(base_url=GEMINI_BASE_URL))
+                print(f"[llm] Gemini client ready (base_url={GEMINI_BASE_URL or 'default'}, "
+                      f"max_concurrency={LLM_MAX_CONCURRENCY})")
+    return _client
+
+
+def _get_async_slots() -> asyncio.Semaphore:
+    global _async_slots
+    if _async_slots is None:
+        _async_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _async_slots
+
+
+# ========== Retry policy ==========
+
+def _status_code(exc: Exception) -> Optional[int]:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc: Exception, idempotent: bool = True) -> bool:
+    """
+    429 / 5xx API errors, timeouts and dropped connections. For
+    non-idempotent calls only 429/503 (request rejected, nothing done).
+    """
+    status = _status_code(exc)
+    if not idempotent:
+        return status in REJECTED_STATUS
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    try:
+        import httpx
+        if isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+            return True
+    except ImportError:
+        pass
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def backoff_delay(attempt: int, exc: Optional[Exception] = None) -> float:
+    """Full-jitter exponential backoff; a Retry-After header sets the minimum."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX_SEC, LLM_BACKOFF_BASE_SEC * (2 ** attempt)))
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after") or headers.get("Retry-After") or 0)
+    except (TypeError, ValueError):
+        retry_after = 0.0
+    return min(max(delay, retry_after), LLM_BACKOFF_MAX_SEC)
+
+
+# ========== Accounting ==========
+
+def _record(purpose: str, started: float, attempts: int, usage: Any = None, error: bool = False):
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    with _stats_lock:
+        stats = _stats.setdefault(purpose, {
+            "calls": 0, "errors": 0, "retries": 0,
+            "prompt_tokens": 0, "output_tokens": 0,
+            "latency_ms_total": 0.0, "latency_ms_max": 0.0,
+        })
+        stats["calls"] += 1
+        stats["errors"] += 1 if error else 0
+        stats["retries"] += max(0, attempts - 1)
+        stats["prompt_tokens"] += getattr(usage, "prompt_token_count", None) or 0
+        stats["output_tokens"] += getattr(usage, "candidates_token_count", None) or 0
+        stats["latency_ms_total"] += elapsed_ms
+        stats["latency_ms_max"] = max(stats["latency_ms_max"], elapsed_ms)
+    tokens = ""
+    if usage is not None:
+        tokens = f", tokens in/out={getattr(usage, 'prompt_token_count', None)}/{getattr(usage, 'candidates_token_count', None)}"
+    print(f"[llm] {purpose}: {'failed' if error else 'ok'} in {elapsed_ms:.0f}ms (attempts={attempts}{tokens})")
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        by_purpose = {
+            purpose: dict(stats, latency_ms_avg=stats["latency_ms_total"] / stats["calls"] if stats["calls"] else 0.0)
+            for purpose, stats in _stats.items()
+        }
+    return {
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "base_url": GEMINI_BASE_URL,
+        "calls": by_purpose,
+    }
+
+
+# ========== Calls ==========
+
+def call(fn: Callable[[], Any], purpose: str, idempotent: bool = True) -> Any:
+    """
+    Run a blocking client call under the concurrency cap with retries.
+
+    Args:
+        fn: Zero-argument callable doing one request with get_client()
+        purpose: Accounting label, e.g. "transcribe" or "upload"
+        idempotent: False for calls that must not be resent after a
+                    timeout or server error (uploads, paid generations)
+
+    Returns:
+        Whatever fn returns
+    """
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with _sync_slots:
+                result = fn()
+            _record(purpose, started, attempt, getattr(result, "usage_metadata", None))
+            return result
+        except Exception as e:
+            if attempt > LLM_MAX_RETRIES or not is_retryable(e, idempotent):
+                _record(purpose, started, attempt, error=True)
+                raise
+            delay = backoff_delay(attempt - 1, e)
+            print(f"[llm] {purpose}: {e.__class__.__name__} ({_status_code(e)}), retry {attempt}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _text_config():
+    """Per-request timeout for short text generations (LLM_TIMEOUT_SEC)."""
+    from google.genai import types
+    return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=int(LLM_TIMEOUT_SEC * 1000)))
+
+
+def generate(contents: Any, model: Optional[str] = None, purpose: str = "generate") -> str:
+    """Blocking generate_content; returns the response text ("" if none)."""
+    response = call(
+        lambda: get_client().models.generate_content(
+            model=model or GEMINI_MODEL, contents=contents, config=_text_config()
+        ),
+        purpose,
+    )
+    return getattr(response, "text", None) or ""
+
+
+async def agenerate(contents: Any, model: Optional[str] = None, purpose: str = "generate") -> str:
+    """Async generate_content under the async concurrency cap, with retries."""
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            async with _get_async_slots():
+                response = await get_client().aio.models.generate_content(
+                    model=model or GEMINI_MODEL, contents=contents, config=_text_config()
+                )
+            _record(purpose, started, attempt, getattr(response, "usage_metadata", None))
+            return getattr(response, "text", None) or ""
+        except Exception as e:
+            if attempt > LLM_MAX_RETRIES or not is_retryable(e):
+                _record(purpose, started, attempt, error=True)
+                raise
+            delay = backoff_delay(attempt - 1, e)
+            print(f"[llm] {purpose}: {e.__class__.__name__} ({_status_code(e)}), retry {attempt}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+_STREAM_END = object()
+
+
+async def _pump_stream(queue: asyncio.Queue, contents: Any, model: Optional[str]) -> None:
+    """
+    Read one upstream stream into `queue` under an async slot. The slot is
+    held only while Gemini is sending, so a slow SSE consumer never keeps
+    other callers waiting; ends with _STREAM_END or the exception raised.
+    """
+    try:
+        async with _get_async_slots():
+            stream = await get_client().aio.models.generate_content_stream(
+                model=model or GEMINI_MODEL, contents=contents, config=_text_config()
+            )
+            async for chunk in stream:
+                queue.put_nowait(chunk)
+        queue.put_nowait(_STREAM_END)
+    except Exception as e:
+        queue.put_nowait(e)
+
+
+async def astream(contents: Any, model: Optional[str] = None, purpose: str = "stream") -> AsyncIterator[str]:
+    """
+    Async token stream. Retries only until the first chunk arrives; after
+    that an error is raised to the caller (text was already emitted).
+    Chunks are buffered between the upstream reader and the caller, so the
+    concurrency slot is released as soon as the upstream response is read.
+    """
+    started = time.perf_counter()
+    attempt = 0
+    usage = None
+    emitted = False
+    while True:
+        attempt += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        reader = asyncio.create_task(_pump_stream(queue, contents, model))
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _STREAM_END:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = getattr(chunk, "text", None)
+                if text:
+                    emitted = True
+                    yield text
+            _record(purpose, started, attempt, usage)
+            return
+        except Exception as e:
+            if emitted or attempt > LLM_MAX_RETRIES or not is_retryable(e):
+                _record(purpose, started, attempt, usage, error=True)
+                raise
+            delay = backoff_delay(attempt - 1, e)
+            print(f"[llm] {purpose}: {e.__class__.__name__} ({_status_code(e)}), retry {attempt}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        finally:
+            # Consumer went away mid-stream: stop reading and free the slot
+            if not reader.done():
+                reader.cancel()
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from db import SessionLocal
 from models import Video, Transcript
 from transcribe.gemini_client import GeminiTranscriber
+from celery_client import enqueue_embeddings
 
 # Celery app
 celery_app = Celery(
@@ -41,9 +42,8 @@ def transcribe_video_task(video_id: str):
         
         print(f"✅ Transcription complete for video {video_id}")
         
-        # Enqueue embedding generation
-        from celery import current_app
-        current_app.send_task('generate_embeddings', args=[video_id])
+        # Enqueue embedding generation (debounced per video, like ingestion saves)
+        enqueue_embeddings(video_id)
         
     except Exception as e:
         print(f"❌ Transcription failed for video {video_id}: {e}")
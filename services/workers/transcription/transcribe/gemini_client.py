@@ -2,9 +2,10 @@ import os
 import re
 import time
 from typing import Optional, Dict, Any
-from google import genai
 from google.genai.errors import APIError
 
+from llm_gateway import GEMINI_MODEL, call, get_client
+
 PROMPT_TEMPLATE = (
     'Analyze the provided video. Integrate the external description. '
     'Return four sections in ENGLISH:\n'
@@ -16,31 +17,35 @@ PROMPT_TEMPLATE = (
 )
 
 class GeminiTranscriber:
-    def __init__(self, api_key: Optional[str] = None, model: str = 'gemini-2.5-flash'):
+    """Video transcription through the shared LLM gateway (pooled client, concurrency cap, retries)."""
+
+    def __init__(self, api_key: Optional[str] = None, model: str = GEMINI_MODEL):
         key = api_key or os.getenv('GEMINI_API_KEY')
         if not key:
             raise ValueError('GEMINI_API_KEY not set')
         print(f"[Gemini] Using model: {model}")
         print(f"[Gemini] API key present: {bool(key)}")
-        self.client = genai.Client(api_key=key)
+        self.client = get_client(key)
         self.model = model
 
     def transcribe(self, video_path: str, description_path: Optional[str] = None) -> Dict[str, Any]:
         print(f"[Gemini] Starting transcription for: {video_path}")
         prompt = self._build_prompt(description_path)
+        f = None
 
         try:
             print("[Gemini] Uploading file…")
-            f = self.client.files.upload(file=video_path)
+            f = call(lambda: self.client.files.upload(file=video_path), "upload", idempotent=False)
             print(f"[Gemini] Uploaded: {f.name} (state={getattr(f, 'state', '?')})")
 
             print("[Gemini] Waiting for file to become ACTIVE…")
             self._wait_active(f.name)
             print("[Gemini] File is ACTIVE, sending generation request…")
 
-            resp = self.client.models.generate_content(
-                model=self.model,
-                contents=[f, prompt],
+            resp = call(
+                lambda: self.client.models.generate_content(model=self.model, contents=[f, prompt]),
+                "transcribe",
+                idempotent=False,
             )
             print("[Gemini] Generation completed.")
             raw = getattr(resp, "text", None) or ""
@@ -54,12 +59,13 @@ class GeminiTranscriber:
             print(f"[Gemini] ERROR during transcription: {e.__class__.__name__}: {e}")
             raise
         finally:
-            try:
-                print("[Gemini] Cleaning up remote file…")
-                self.client.files.delete(name=f.name)
-                print("[Gemini] File deleted.")
-            except Exception as e:
-                print(f"[Gemini] Cleanup warning: {e}")
+            if f is not None:
+                try:
+                    print("[Gemini] Cleaning up remote file…")
+                    call(lambda: self.client.files.delete(name=f.name), "delete_file")
+                    print("[Gemini] File deleted.")
+                except Exception as e:
+                    print(f"[Gemini] Cleanup warning: {e}")
 
     def _wait_active(self, name: str, timeout_sec: int = 180):
         start = time.time()